@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Benchmark the page parsers offline against a corpus of pages.
+
+By default the parsers are benchmarked on the pages committed under
+tests/fixtures, trimmed pages of a regulation and an overtime game and of
+the schedule and teams pages, so the benchmark runs on any machine without
+network access. Runs are compared against the committed baseline,
+benchmarks/baseline.json, and fail when a parser regresses by more than the
+tolerance saved with the baseline. ::
+
+  python3 benchmarks/bench_parsers.py run
+  python3 benchmarks/bench_parsers.py run --save benchmarks/baseline.json
+
+Full pages of an early play-by-play era game, an overtime game and a recent
+game may also be recorded into a page cache directory, reusing pages
+already in the sportquery page cache, and benchmarked with ``--pages``.
+Recording requires network access (or the pages in the page cache), and
+runs fail if a page is not recorded so that results remain comparable. ::
+
+  python3 benchmarks/bench_parsers.py --pages benchmarks/pages record
+  python3 benchmarks/bench_parsers.py --pages benchmarks/pages run \\
+      --save recorded.json
+
+Each run reports for each parser its throughput, per-page latency
+percentiles and peak traced memory.
+
+"""
+import argparse
+import json
+from pathlib import Path
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from sportquery.cache import PageCache
+from sportquery.fetch import get_page
+from sportquery.nba import base_url
+from sportquery.nba.boxscore import boxscore_url, parse_boxscore
+from sportquery.nba.play_by_play import parse_play_by_play, play_by_play_url
+from sportquery.nba.plus_minus import parse_plus_minus, plus_minus_url
+from sportquery.nba.schedule import (
+    league_schedule_url, parse_league_schedule, parse_schedule)
+from sportquery.nba.teams import parse_teams
+
+fixtures_dir = Path(__file__).parent.parent / 'tests/fixtures'
+baseline_path = Path(__file__).parent / 'baseline.json'
+
+# allowed fractional regression of latency and memory saved with baselines,
+# loose enough for timings measured on another machine
+default_tolerance = 1.
+
+# (parser, label, fixture file name, parse function of the page text)
+fixture_corpus = [
+    (dataset, label, f'{dataset}_{game_id}.html',
+     lambda text, g=game_id, p=parse: p(text, g))
+    for dataset, parse, label, game_id in [
+        ('boxscore', parse_boxscore, 'regulation', '202102090SAS'),
+        ('play_by_play', parse_play_by_play, 'regulation', '202102090SAS'),
+        ('play_by_play', parse_play_by_play, 'overtime', '202102110SAS'),
+        ('plus_minus', parse_plus_minus, 'regulation', '202102090SAS')]
+] + [
+    ('schedule', 'current', 'schedule_BRK_2021.html',
+     lambda text: parse_schedule(text, 'BRK')),
+    ('league_schedule', 'current', 'league_schedule_2021_december.html',
+     parse_league_schedule),
+    ('teams', 'current', 'teams_2021.html', parse_teams)]
+
+# recorded game pages of an early play-by-play era game, a quadruple
+# overtime game and a recent game
+games = {
+    'old-era': '200210290LAL',
+    'overtime': '201903010CHI',
+    'current': '202410220BOS',
+}
+
+# (parser, label, url, parse function of the page text)
+recorded_corpus = [
+    (dataset, label, url(game_id),
+     lambda text, g=game_id, p=parse: p(text, g))
+    for dataset, url, parse in [
+        ('boxscore', boxscore_url, parse_boxscore),
+        ('play_by_play', play_by_play_url, parse_play_by_play),
+        ('plus_minus', plus_minus_url, parse_plus_minus)]
+    for label, game_id in games.items()
+] + [
+    ('schedule', label, f'{base_url}/teams/{team}/{season}_games.html',
+     lambda text, t=team: parse_schedule(text, t))
+    for label, team, season in [
+        ('old-era', 'LAL', 2003), ('current', 'BOS', 2025)]
+] + [
+    ('league_schedule', label, league_schedule_url(season, month),
+     parse_league_schedule)
+    for label, season, month in [
+        ('old-era', 2003, 'april'), ('current', 2025, 'january')]
+] + [
+    ('teams', label, f'{base_url}/leagues/NBA_{season}.html', parse_teams)
+    for label, season in [('old-era', 2003), ('current', 2025)]
+]
+
+
+def record(args):
+    """
+    Copy the recorded corpus pages into the `--pages` directory, fetching
+    the pages missing from the sportquery page cache
+
+    """
+    if args.pages is None:
+        sys.exit('record requires the --pages directory')
+
+    pages = PageCache(args.pages)
+
+    for dataset, label, url, _ in recorded_corpus:
+        if pages.get(url) is not None:
+            continue
+        print(f'recording {dataset} {label}: {url}')
+        pages.put(url, get_page(url))
+
+
+def measure(parse, text, repeat):
+    """
+    Latencies (seconds) of `repeat` parses of a page and the peak memory
+    (bytes) allocated while parsing it. Memory is traced with tracemalloc,
+    which sees python objects and numpy buffers but not the libxml2 tree.
+
+    """
+    parse(text)  # warm up
+
+    latencies = np.empty(repeat)
+    for i in range(repeat):
+        start = time.perf_counter()
+        parse(text)
+        latencies[i] = time.perf_counter() - start
+
+    # tracing slows allocations down, so memory is measured separately
+    tracemalloc.start()
+    parse(text)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return latencies, peak
+
+
+def compare(results, baseline, tolerance):
+    """
+    Regressions of `results` with respect to the results saved in
+    `baseline`: parsers whose median or 95th percentile latency, or peak
+    memory, grew by more than the `tolerance` fraction
+
+    """
+    regressions = []
+
+    for dataset, result in results.items():
+        if dataset not in baseline['results']:
+            continue
+        for metric in ['p50_ms', 'p95_ms', 'peak_mb']:
+            reference = baseline['results'][dataset][metric]
+            if result[metric] > reference * (1 + tolerance):
+                regressions.append(
+                    f'{dataset} {metric}: {result[metric]:.2f} > '
+                    f'{reference:.2f} (+{100 * tolerance:.0f}%)')
+
+    return regressions
+
+
+def corpus_pages(args):
+    """
+    Parse function and text of the pages of each benchmarked parser, read
+    from the fixtures or from the recorded `--pages` directory
+
+    """
+    pages, missing = {}, []
+
+    if args.pages is None:
+        for dataset, label, name, parse in fixture_corpus:
+            if not args.parsers or dataset in args.parsers:
+                pages.setdefault(dataset, []).append(
+                    (parse, (fixtures_dir / name).read_text()))
+        return pages
+
+    store = PageCache(args.pages)
+
+    for dataset, label, url, parse in recorded_corpus:
+        if args.parsers and dataset not in args.parsers:
+            continue
+        page = store.get(url)
+        if page is None:
+            missing.append(f'{dataset} {label}')
+            continue
+        pages.setdefault(dataset, []).append((parse, page.text))
+
+    if missing:
+        sys.exit(
+            f'pages not recorded: {", ".join(missing)}, run '
+            '`bench_parsers.py --pages DIR record` first')
+
+    return pages
+
+
+def run(args):
+    """
+    Benchmark each parser over its corpus pages
+
+    """
+    recorded = corpus_pages(args)
+
+    print(f'{"parser":<18}{"pages":>6}{"pages/s":>10}{"p50 (ms)":>10}'
+          f'{"p95 (ms)":>10}{"p99 (ms)":>10}{"peak (MB)":>11}')
+
+    results = {}
+    for dataset, pages in recorded.items():
+        measured = [measure(parse, text, args.repeat) for parse, text in pages]
+        latencies = np.concatenate([times for times, _ in measured])
+        peak = max(memory for _, memory in measured)
+
+        p50, p95, p99 = 1e3 * np.percentile(latencies, [50, 95, 99])
+        results[dataset] = {
+            'pages': len(pages),
+            'pages_per_sec': len(latencies) / latencies.sum(),
+            'p50_ms': p50,
+            'p95_ms': p95,
+            'p99_ms': p99,
+            'peak_mb': peak / 2**20}
+
+        result = results[dataset]
+        print(f'{dataset:<18}{result["pages"]:>6}'
+              f'{result["pages_per_sec"]:>10.1f}{p50:>10.2f}{p95:>10.2f}'
+              f'{p99:>10.2f}{result["peak_mb"]:>11.2f}')
+
+    tolerance = args.tolerance
+
+    if args.save:
+        Path(args.save).write_text(json.dumps({
+            'tolerance': default_tolerance if tolerance is None else tolerance,
+            'results': results}, indent=2))
+        return
+
+    # the committed baseline is measured on the fixtures
+    if args.baseline is None and args.pages is None:
+        args.baseline = baseline_path
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        if tolerance is None:
+            tolerance = baseline['tolerance']
+        regressions = compare(results, baseline, tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}', file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument(
+        '--pages', type=Path,
+        help='recorded pages directory, the fixtures by default')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('record', help='record the corpus pages')
+
+    run_parser = commands.add_parser('run', help='run the benchmark')
+    run_parser.add_argument(
+        'parsers', nargs='*', help='parsers to benchmark, all by default')
+    run_parser.add_argument(
+        '--repeat', type=int, default=20, help='timed parses of each page')
+    run_parser.add_argument('--save', help='save the results as json')
+    run_parser.add_argument(
+        '--baseline',
+        help='fail on regressions against saved results, by default the '
+        'committed baseline when benchmarking the fixtures')
+    run_parser.add_argument(
+        '--tolerance', type=float,
+        help='allowed fractional regression of latency and memory, by '
+        'default the tolerance saved with the baseline')
+
+    args = parser.parse_args()
+
+    {'record': record, 'run': run}[args.command](args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Benchmark the plus-minus page parser against the previous BeautifulSoup
+implementation and check that both produce the same output.
+
+Pages are read from html files or, for game ids, fetched once through the
+page cache and served locally afterwards. Requires bs4 for the reference
+implementation. ::
+
+  python3 benchmarks/bench_plus_minus.py 200210290LAL 202102090SAS
+
+"""
+import argparse
+from pathlib import Path
+import re
+import timeit
+
+from bs4 import BeautifulSoup
+import pandas as pd
+from unidecode import unidecode
+
+from sportquery.fetch import get_page
+from sportquery.nba.plus_minus import parse_plus_minus, plus_minus_url
+
+
+def _unpack_plus_minus(div):
+    width = int(re.search(r'\d+', div.get('style')).group())
+    numeric = re.search(r'[-+]?\d+', div.text)
+    points = int(numeric.group()) if numeric else None
+    return width, points
+
+
+def parse_plus_minus_reference(text, game_id):
+    """
+    Previous implementation: html.parser soup and one dataframe per player.
+    `DataFrame.append` (removed in pandas 2) is replaced by a single
+    `pd.concat`, which only flatters the reference timings.
+
+    """
+    soup = BeautifulSoup(text, 'html.parser')
+
+    all_players = [
+        unidecode(div.select_one('span').text).strip()
+        for div in soup.find_all('div', attrs={'class': 'player'})]
+
+    all_intervals = [[
+        _unpack_plus_minus(d) for d in div.find_all('div')]
+        for div in soup.find_all('div', attrs={'class': 'player-plusminus'})]
+
+    frames = []
+
+    for player, intervals in zip(all_players, all_intervals):
+        df = pd.DataFrame(intervals, columns=['duration', 'points'])
+        df.duration *= 48. / df.duration.sum()
+
+        df['player'] = player
+        df['subin_minute'] = df.duration.shift(1).cumsum().fillna(0)
+        df['subout_minute'] = df.duration.cumsum()
+        df['plus_minus'] = df.points
+
+        df.dropna(axis=0, inplace=True)
+        df.drop(columns=['duration', 'points'], inplace=True)
+
+        frames.append(df)
+
+    df_plus_minus = pd.concat(frames, axis=0)
+    df_plus_minus.insert(0, 'game_id', game_id)
+
+    return df_plus_minus.reset_index(drop=True)
+
+
+def load_pages(sources):
+    """
+    Map each source (html file path or game id) to a (game_id, html) pair
+
+    """
+    pages = []
+
+    for source in sources:
+        path = Path(source)
+        if path.is_file():
+            pages.append((path.stem, path.read_text()))
+        else:
+            pages.append((source, get_page(plus_minus_url(source))))
+
+    return pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument(
+        'sources', nargs='+', help='plus-minus html files or game ids')
+    parser.add_argument(
+        '--repeat', type=int, default=20, help='timed parses of each page')
+    args = parser.parse_args()
+
+    pages = load_pages(args.sources)
+
+    print(f'{"game":<16}{"reference (ms)":>16}{"fast (ms)":>12}{"speedup":>10}')
+
+    for game_id, text in pages:
+        pd.testing.assert_frame_equal(
+            parse_plus_minus(text, game_id),
+            parse_plus_minus_reference(text, game_id),
+            check_dtype=False)
+
+        reference = timeit.timeit(
+            lambda: parse_plus_minus_reference(text, game_id),
+            number=args.repeat) / args.repeat
+        fast = timeit.timeit(
+            lambda: parse_plus_minus(text, game_id),
+            number=args.repeat) / args.repeat
+
+        print(f'{game_id:<16}{1e3*reference:>16.2f}{1e3*fast:>12.2f}'
+              f'{reference/fast:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
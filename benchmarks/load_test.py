@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Run the NBA sync flow end to end against the local replay server.
+
+The replay server is started in a subprocess and the flow syncs a season
+from it into a fresh cache directory and database, so every page goes
+through the client, the parse processes and the database writer. Reports
+games per minute, request and retry counts on both sides and the time spent
+writing to the database. ::
+
+  python3 benchmarks/load_test.py 2021 --latency 0.2 --throttle 0.02
+
+"""
+import argparse
+import json
+import logging
+import os
+from pathlib import Path
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.request import urlopen
+
+
+def start_server(args):
+    """
+    Start the replay server in a subprocess listening on a free port
+
+    Returns:
+        tuple: server process and base url
+
+    """
+    command = [
+        sys.executable, str(Path(__file__).parent / 'replay_server.py'),
+        '--port', '0',
+        '--latency', str(args.latency),
+        '--throttle', str(args.throttle),
+        '--errors', str(args.errors)]
+    if args.pages:
+        command += ['--pages', str(args.pages)]
+    if args.bandwidth:
+        command += ['--bandwidth', str(args.bandwidth)]
+
+    server = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    url = server.stdout.readline().split()[-1]
+
+    return server, url
+
+
+def run_flow(args):
+    """
+    Run the sync flow with the sportquery environment set by `main`
+
+    Returns:
+        dict: flow metrics
+
+    """
+    # imported here, the environment configures sportquery at import time
+    import prefect
+    import sqlalchemy
+
+    from sportquery import client as client_module
+    from sportquery import metrics
+    from sportquery.nba.sync_database import flow, get_engine
+
+    logger = logging.getLogger('load_test')
+
+    start = time.perf_counter()
+    with prefect.context(logger=logger):
+        state = flow.run(
+            current_season=args.season,
+            start_season=args.first_season or args.season,
+            fetch_workers=args.fetch_workers,
+            parse_workers=args.parse_workers,
+            batch_size=args.batch_size)
+    elapsed = time.perf_counter() - start
+
+    games = get_engine('nba').execute(sqlalchemy.text(
+        "select count(distinct game_id) from sync_ledger "
+        "where status = 'ok'")).scalar()
+
+    return {
+        'state': type(state).__name__,
+        'games': games,
+        'seconds': elapsed,
+        'games_per_minute': 60 * games / elapsed,
+        'client': dict(client_module.client.stats),
+        'metrics': metrics.registry.summary()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('season', type=int, help='NBA season to sync')
+    parser.add_argument(
+        '--first-season', type=int,
+        help='first season to sync, only `season` by default')
+    parser.add_argument(
+        '--pages', type=Path,
+        help='recorded pages directory, the sportquery page cache by default')
+    parser.add_argument('--latency', type=float, default=0.)
+    parser.add_argument('--bandwidth', type=float)
+    parser.add_argument('--throttle', type=float, default=0.)
+    parser.add_argument('--errors', type=float, default=0.)
+    parser.add_argument(
+        '--rpm', type=float, default=6000, help='client requests per minute')
+    parser.add_argument('--fetch-workers', type=int, default=4)
+    parser.add_argument('--parse-workers', type=int)
+    parser.add_argument('--batch-size', type=int, default=25)
+    parser.add_argument(
+        '--db', help='database url, a sqlite file in the run directory '
+        'by default')
+    parser.add_argument('--json', help='write the metrics to a json file')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    server, url = start_server(args)
+
+    try:
+        with tempfile.TemporaryDirectory(prefix='sportquery-load-') as tmp:
+            os.environ.update({
+                'SPORTQUERY_NBA_URL': url,
+                'SPORTQUERY_CACHE': tmp,
+                'SPORTQUERY_RPM': str(args.rpm),
+                'PREFECT__LOGGING__LEVEL': 'WARNING'})
+            if args.db:
+                os.environ['SPORTQUERY_DB'] = args.db
+            else:
+                os.environ.pop('SPORTQUERY_DB', None)
+
+            metrics = run_flow(args)
+
+        with urlopen(f'{url}/_stats') as response:
+            metrics['server'] = json.load(response)
+    finally:
+        server.terminate()
+        server.wait()
+
+    client = metrics['client']
+    transactions = metrics['metrics'].get('transaction_seconds', {})
+    transactions = transactions.get('all', {'count': 0, 'sum': 0})
+    rows = sum(metrics['metrics'].get('rows_written_total', {}).values())
+    print(f'flow {metrics["state"]}: {metrics["games"]} games in '
+          f'{metrics["seconds"]:.1f}s ({metrics["games_per_minute"]:.1f} '
+          f'games/minute)')
+    print(f'client: {client.get("requests", 0)} requests, '
+          f'{client.get("retries", 0)} retries, '
+          f'{client.get("throttled", 0)} throttled')
+    print('server: ' + ', '.join(
+        f'{count} {key}' for key, count in sorted(metrics['server'].items())))
+    print(f'writer: {transactions["count"]} transactions, {rows:.0f} rows '
+          f'in {transactions["sum"]:.2f}s')
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(metrics, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Serve recorded pages at the url layout of basketball-reference.
+
+Pages are looked up in a page cache directory (the sportquery page cache by
+default, or e.g. the benchmarks/pages corpus) by their original url, so a
+client pointed at this server with SPORTQUERY_NBA_URL receives the pages it
+would have fetched from the real site. Latency, bandwidth, throttling (429)
+and server errors (500) may be simulated. Counters of the responses served
+are available as json at /_stats. ::
+
+  python3 benchmarks/replay_server.py --port 8000 --latency 0.2 --throttle 0.05
+  SPORTQUERY_NBA_URL=http://127.0.0.1:8000 python3 -m sportquery.nba.boxscore
+
+"""
+import argparse
+from collections import Counter
+import hashlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+from pathlib import Path
+import random
+import threading
+import time
+
+from sportquery import cachedir
+from sportquery.cache import PageCache
+
+origin = 'http://www.basketball-reference.com'
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    """
+    Request handler serving the pages of `server.pages`, with the network
+    conditions configured by the server attributes
+
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _count(self, key, value=1):
+        with self.server.lock:
+            self.server.stats[key] += value
+
+    def _send(self, status, body=b'', headers=None):
+        self._count(f'status_{status}')
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+
+        # send the body in chunks of a tenth of a second of bandwidth
+        bandwidth = self.server.bandwidth
+        chunk = max(int(bandwidth / 10), 1) if bandwidth else len(body) or 1
+        for i in range(0, len(body), chunk):
+            self.wfile.write(body[i:i + chunk])
+            if bandwidth:
+                time.sleep(len(body[i:i + chunk]) / bandwidth)
+
+        self._count('bytes', len(body))
+
+    def do_GET(self):
+        server = self.server
+
+        if self.path == '/_stats':
+            with server.lock:
+                body = json.dumps(server.stats).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        self._count('requests')
+
+        if server.latency:
+            time.sleep(random.uniform(0, 2 * server.latency))
+
+        draw = random.random()
+        if draw < server.throttle:
+            self._send(429, headers={'Retry-After': str(server.retry_after)})
+            return
+        if draw < server.throttle + server.errors:
+            self._send(500)
+            return
+
+        page = server.pages.get(f'{server.origin}{self.path}')
+        if page is None:
+            self._send(404)
+            return
+
+        body = page.text.encode('utf-8')
+        etag = f'"{hashlib.sha1(body).hexdigest()[:16]}"'
+
+        if self.headers.get('If-None-Match') == etag:
+            self._send(304, headers={'ETag': etag})
+            return
+
+        self._send(200, body, {
+            'Content-Type': 'text/html; charset=utf-8', 'ETag': etag})
+
+
+def replay_server(pages, port=0, latency=0., bandwidth=None, throttle=0.,
+                  errors=0., retry_after=1, host='127.0.0.1'):
+    """
+    Create a threaded replay server; call `serve_forever` to start serving
+
+    Args:
+        pages (pathlib.Path): page cache directory of the recorded pages
+        port (int, optional): listening port, any free port by default
+        latency (float, optional): mean response latency in seconds, drawn
+            uniformly between zero and twice the mean
+        bandwidth (float, optional): bytes per second of each response
+        throttle (float, optional): fraction of requests answered with 429
+        errors (float, optional): fraction of requests answered with 500
+        retry_after (int, optional): Retry-After seconds of 429 responses
+        host (str, optional): listening address
+
+    Returns:
+        http.server.ThreadingHTTPServer: replay server
+
+    """
+    server = ThreadingHTTPServer((host, port), ReplayHandler)
+    server.daemon_threads = True
+    server.pages = PageCache(Path(pages))
+    server.origin = origin
+    server.latency = latency
+    server.bandwidth = bandwidth
+    server.throttle = throttle
+    server.errors = errors
+    server.retry_after = retry_after
+    server.stats = Counter()
+    server.lock = threading.Lock()
+
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument(
+        '--pages', type=Path, default=cachedir / 'pages',
+        help='recorded pages directory')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument(
+        '--latency', type=float, default=0., help='mean latency (seconds)')
+    parser.add_argument(
+        '--bandwidth', type=float, help='bandwidth (bytes per second)')
+    parser.add_argument(
+        '--throttle', type=float, default=0.,
+        help='fraction of requests throttled with 429')
+    parser.add_argument(
+        '--errors', type=float, default=0.,
+        help='fraction of requests failed with 500')
+    parser.add_argument(
+        '--retry-after', type=int, default=1,
+        help='Retry-After seconds of throttled requests')
+    args = parser.parse_args()
+
+    server = replay_server(
+        args.pages, port=args.port, latency=args.latency,
+        bandwidth=args.bandwidth, throttle=args.throttle, errors=args.errors,
+        retry_after=args.retry_after)
+
+    host, port = server.server_address
+    print(f'serving {args.pages} on http://{host}:{port}', flush=True)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -6,4 +6,5 @@ from pathlib import Path
 __version__ = '0.1'
 
 homedir = Path(os.getenv('HOME'))
-cachedir = homedir / '.local/share/sportquery'
+cachedir = Path(
+    os.getenv('SPORTQUERY_CACHE', homedir / '.local/share/sportquery'))
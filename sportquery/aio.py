@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+""" Asyncio counterparts of the shared HTTP client and page fetching layer. """
+import asyncio
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+import random
+import time
+
+import requests
+
+from . import client as client_module
+from . import metrics
+from .cache import CachedPage, page_cache
+from .client import _retry_after, retry_status_codes
+from .fetch import _is_fresh, _validators
+
+# executor parsing pages off the event loop, see `set_executor`
+_executor = None
+
+Response = namedtuple('Response', ['status', 'reason', 'headers', 'content'])
+
+
+def _aiohttp():
+    """
+    Import aiohttp, which is an optional dependency
+
+    """
+    try:
+        import aiohttp
+    except ImportError:
+        raise ImportError(
+            'the asyncio scrapers require aiohttp, install it with '
+            '`pip install sportquery[aio]`')
+
+    return aiohttp
+
+
+class AsyncClient:
+    """
+    Non-blocking counterpart of `sportquery.client.Client`: requests are
+    sent over a pool of keep-alive connections of an aiohttp session and
+    retried with the same jittered exponential backoff. Coroutines waiting
+    for the rate limiter sleep on the event loop, so one loop may keep
+    hundreds of requests queued without a thread each.
+
+    By default the client spends the rate budget of the shared blocking
+    client, so the process stays within `SPORTQUERY_RPM` however the
+    requests are issued.
+
+    Args:
+        limiter (sportquery.client.RateLimiter, optional): rate limiter, the
+            limiter of the shared blocking client by default
+        max_retries (int, optional): number of retries before giving up
+        backoff (float, optional): base backoff delay in seconds
+        max_backoff (float, optional): maximum backoff delay in seconds
+        timeout (float, optional): total request timeout in seconds
+        pool_size (int, optional): maximum number of open connections
+
+    """
+    def __init__(self, limiter=None, max_retries=5, backoff=2.,
+                 max_backoff=120., timeout=30., pool_size=100):
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.session = None
+        self.loop = None
+
+    def _session(self):
+        """
+        Session of the running event loop, created on first use since
+        aiohttp sessions are bound to a loop
+
+        """
+        aiohttp = _aiohttp()
+        loop = asyncio.get_running_loop()
+
+        if (self.session is None or self.session.closed
+                or self.loop is not loop):
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                timeout=aiohttp.ClientTimeout(total=self.timeout))
+            self.loop = loop
+
+        return self.session
+
+    def _delay(self, attempt):
+        """
+        Full-jitter exponential backoff delay for the given attempt number
+
+        """
+        ceiling = min(self.max_backoff, self.backoff * 2**attempt)
+        return random.uniform(0, ceiling)
+
+    def _limiter(self):
+        """
+        Rate limiter spending the request budget of the client
+
+        """
+        if self.limiter is not None:
+            return self.limiter
+
+        return client_module.client.limiter
+
+    async def _acquire(self):
+        """
+        Wait on the event loop until the rate limiter grants a token
+
+        """
+        limiter = self._limiter()
+
+        while True:
+            wait = limiter.try_acquire()
+            if wait is None:
+                return
+
+            await asyncio.sleep(wait)
+
+    async def get(self, url, headers=None):
+        """
+        Issue a rate limited GET request, retrying connection errors,
+        timeouts, throttled (429) and server error (5xx) responses.
+
+        Args:
+            url (str): request url
+            headers (dict, optional): additional request headers
+
+        Returns:
+            Response: status, reason, headers and body of the response
+
+        """
+        aiohttp = _aiohttp()
+        session = self._session()
+
+        for attempt in range(self.max_retries + 1):
+            await self._acquire()
+
+            try:
+                async with session.get(url, headers=headers) as response:
+                    r = Response(
+                        response.status, response.reason, response.headers,
+                        await response.read())
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt == self.max_retries:
+                    raise
+                metrics.inc('http_retries_total', reason='connection')
+                await asyncio.sleep(self._delay(attempt))
+                continue
+
+            metrics.inc('http_responses_total', status=r.status)
+
+            if (r.status not in retry_status_codes
+                    or attempt == self.max_retries):
+                return r
+
+            metrics.inc('http_retries_total', reason=r.status)
+            delay = _retry_after(r)
+            delay = delay if delay is not None else self._delay(attempt)
+
+            if r.status == 429:
+                # slow down every request sharing the budget, not just this one
+                self._limiter().pause(delay)
+            else:
+                await asyncio.sleep(delay)
+
+    async def close(self):
+        """
+        Close the connections of the session
+
+        """
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+
+async_client = AsyncClient()
+
+
+def set_executor(executor):
+    """
+    Use `executor` to parse pages off the event loop, e.g. a process pool
+    shared with other parts of an application
+
+    Args:
+        executor (concurrent.futures.Executor): thread or process pool
+
+    """
+    global _executor
+    _executor = executor
+
+
+def get_executor():
+    """
+    Executor parsing pages off the event loop, a pool of one process per
+    cpu created on first use unless `set_executor` was called
+
+    Returns:
+        concurrent.futures.Executor: thread or process pool
+
+    """
+    global _executor
+
+    if _executor is None:
+        # spawn rather than fork, the event loop process may be multithreaded
+        _executor = ProcessPoolExecutor(
+            os.cpu_count(), mp_context=multiprocessing.get_context('spawn'))
+
+    return _executor
+
+
+async def run_parser(func, *args):
+    """
+    Call the picklable module-level function `func(*args)` in the parsing
+    executor without blocking the event loop. Measurements recorded with
+    `sportquery.metrics` by parse processes are merged into the registry of
+    the calling process.
+
+    Args:
+        func (callable): parser, e.g. `sportquery.nba.boxscore.parse_boxscore`
+        *args: arguments of `func`
+
+    Returns:
+        object: return value of `func`
+
+    """
+    loop = asyncio.get_running_loop()
+    executor = get_executor()
+
+    if not isinstance(executor, ProcessPoolExecutor):
+        return await loop.run_in_executor(executor, func, *args)
+
+    result, measurements = await loop.run_in_executor(
+        executor, metrics.measured, func, *args)
+    metrics.merge(measurements)
+
+    return result
+
+
+async def fetch_page(url, ttl=None, final_at=None):
+    """
+    Asyncio counterpart of `sportquery.fetch.fetch_page`, sharing its page
+    cache. Cache files are read and written in the default executor of the
+    event loop.
+
+    Args:
+        url (str): page url
+        ttl (float, optional): number of seconds a cached copy is considered
+            fresh, None if the page is immutable
+        final_at (float, optional): unix time from which the page no longer
+            changes
+
+    Returns:
+        CachedPage: page html and metadata
+
+    """
+    cached = await asyncio.to_thread(page_cache.get, url)
+
+    if cached is not None and _is_fresh(cached.fetched_at, ttl, final_at):
+        metrics.inc('cache_hits_total')
+        return cached
+
+    r = await async_client.get(url, headers=_validators(cached))
+
+    if r.status == 304 and cached is not None:
+        metrics.inc('cache_revalidated_total')
+        await asyncio.to_thread(page_cache.touch, url)
+        return cached._replace(fetched_at=time.time())
+
+    # the exception raised by the blocking fetch_page
+    if r.status >= 400:
+        raise requests.HTTPError(f'{r.status} {r.reason} for url: {url}')
+
+    metrics.inc('downloads_total')
+    metrics.inc('bytes_downloaded_total', len(r.content))
+
+    # decoded as the blocking client decodes response text
+    encoding = requests.utils.get_encoding_from_headers(r.headers) or 'utf-8'
+
+    page = CachedPage(
+        url, r.content.decode(encoding, errors='replace'),
+        r.headers.get('ETag'), r.headers.get('Last-Modified'), time.time())
+
+    await asyncio.to_thread(
+        page_cache.put, url, page.text, etag=page.etag,
+        last_modified=page.last_modified)
+
+    return page
+
+
+async def get_page(url, ttl=None, final_at=None):
+    """
+    Asyncio counterpart of `sportquery.fetch.get_page`
+
+    Args:
+        url (str): page url
+        ttl (float, optional): number of seconds a cached copy is considered
+            fresh, None if the page is immutable
+        final_at (float, optional): unix time from which the page no longer
+            changes
+
+    Returns:
+        str: page html
+
+    """
+    return (await fetch_page(url, ttl=ttl, final_at=final_at)).text
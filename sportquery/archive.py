@@ -0,0 +1,343 @@
+# -*- coding: utf-8 -*-
+""" Append-only archive of zstd compressed pages packed per partition. """
+import fcntl
+import hashlib
+import json
+import os
+from pathlib import Path
+import threading
+
+from .cache import CachedPage
+
+# size (bytes) of the compression dictionaries trained on sample pages
+dictionary_size = 112640
+
+
+def _zstandard():
+    """
+    Import zstandard, which is an optional dependency
+
+    """
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError(
+            'the page archive requires zstandard, install it with '
+            '`pip install sportquery[archive]`')
+
+    return zstandard
+
+
+def available():
+    """
+    Whether zstandard is installed and pages may be archived
+
+    """
+    try:
+        _zstandard()
+    except ImportError:
+        return False
+
+    return True
+
+
+class PageArchive:
+    """
+    Compact store of every version of every page fetched, for offline
+    re-parsing. Pages are compressed with zstd, using a dictionary trained
+    on sample pages once `train` has been called, and appended to one pack
+    file per partition (e.g. per season) along with a line of json in the
+    partition index recording the offset of the page in the pack, its HTTP
+    validators and a hash of its content. Appends are serialized across
+    threads and processes by a lock on the pack file, under which unchanged
+    pages are skipped.
+
+    Args:
+        root (pathlib.Path): archive directory
+        level (int, optional): zstd compression level
+
+    """
+    def __init__(self, root, level=12):
+        self.root = Path(root).expanduser()
+        self.level = level
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.indexes = {}  # partition -> (entries keyed by url, index size)
+
+    def _paths(self, partition):
+        """
+        Pack and index file paths of `partition`
+
+        """
+        return (self.root / f'{partition}.pack',
+                self.root / f'{partition}.index')
+
+    def _dictionary(self, dictionary_id):
+        """
+        Zstd dictionary with id `dictionary_id`
+
+        """
+        zstd = _zstandard()
+        data = (self.root / 'dictionaries' / str(dictionary_id)).read_bytes()
+
+        return zstd.ZstdCompressionDict(data)
+
+    def _current_dictionary(self):
+        """
+        Id of the dictionary used to compress new pages, 0 for none
+
+        """
+        try:
+            return int((self.root / 'dictionary').read_text())
+        except (OSError, ValueError):
+            return 0
+
+    def trained(self):
+        """
+        Whether a compression dictionary has been trained (see `train`)
+
+        Returns:
+            bool: whether new pages are compressed with a dictionary
+
+        """
+        return self._current_dictionary() != 0
+
+    def _compressor(self, dictionary_id):
+        """
+        Compressor of the calling thread for the dictionary `dictionary_id`
+
+        """
+        zstd = _zstandard()
+        compressors = self.local.__dict__.setdefault('compressors', {})
+
+        if dictionary_id not in compressors:
+            compressors[dictionary_id] = zstd.ZstdCompressor(
+                level=self.level,
+                dict_data=(
+                    self._dictionary(dictionary_id) if dictionary_id
+                    else None))
+
+        return compressors[dictionary_id]
+
+    def _decompressor(self, dictionary_id):
+        """
+        Decompressor of the calling thread for the dictionary
+        `dictionary_id`
+
+        """
+        zstd = _zstandard()
+        decompressors = self.local.__dict__.setdefault('decompressors', {})
+
+        if dictionary_id not in decompressors:
+            decompressors[dictionary_id] = zstd.ZstdDecompressor(
+                dict_data=(
+                    self._dictionary(dictionary_id) if dictionary_id
+                    else None))
+
+        return decompressors[dictionary_id]
+
+    def _index(self, partition):
+        """
+        Latest index entry of each url of `partition`, reading only the
+        entries appended since the index was last read
+
+        """
+        _, index_path = self._paths(partition)
+        entries, size = self.indexes.get(partition, ({}, 0))
+
+        try:
+            with open(index_path, 'rb') as f:
+                f.seek(size)
+                data = f.read()
+        except FileNotFoundError:
+            return entries
+
+        # a line may be partially written by a concurrent append
+        complete = data[:data.rfind(b'\n') + 1]
+        for line in complete.splitlines():
+            entry = json.loads(line)
+            entries[entry['url']] = entry
+
+        self.indexes[partition] = (entries, size + len(complete))
+
+        return entries
+
+    def partitions(self):
+        """
+        Names of the archive partitions
+
+        Returns:
+            list of str: sorted partition names
+
+        """
+        return sorted(path.stem for path in self.root.glob('*.index'))
+
+    def entries(self, partition):
+        """
+        Index entries of the latest version of each page of `partition`, in
+        pack order
+
+        Args:
+            partition (str): partition name
+
+        Returns:
+            list of dict: url, offset, size, validators and hash of each page
+
+        """
+        with self.lock:
+            entries = list(self._index(str(partition)).values())
+
+        return sorted(entries, key=lambda entry: entry['offset'])
+
+    def _archived(self, partition, url, content_hash):
+        """
+        Whether the latest archived version of `url` has the content hash
+        `content_hash`
+
+        """
+        latest = self._index(partition).get(url)
+
+        return latest is not None and latest['hash'] == content_hash
+
+    def put(self, partition, page):
+        """
+        Archive `page` unless its latest archived version has the same
+        content
+
+        Args:
+            partition (str): partition name, e.g. the season of the page
+            page (CachedPage): page text and metadata
+
+        Returns:
+            bool: whether the page was archived
+
+        """
+        partition = str(partition)
+        content = page.text.encode('utf-8')
+        content_hash = hashlib.sha1(content).hexdigest()
+
+        with self.lock:
+            if self._archived(partition, page.url, content_hash):
+                return False
+
+            dictionary_id = self._current_dictionary()
+            data = self._compressor(dictionary_id).compress(content)
+
+            pack_path, index_path = self._paths(partition)
+            self.root.mkdir(parents=True, exist_ok=True)
+
+            with open(pack_path, 'ab') as pack:
+                fcntl.flock(pack, fcntl.LOCK_EX)
+                try:
+                    # another process may have archived the page since the
+                    # check above, the index is complete while locked
+                    if self._archived(partition, page.url, content_hash):
+                        return False
+
+                    offset = pack.seek(0, os.SEEK_END)
+                    pack.write(data)
+                    pack.flush()
+
+                    entry = {
+                        'url': page.url,
+                        'offset': offset,
+                        'size': len(data),
+                        'dictionary': dictionary_id,
+                        'hash': content_hash,
+                        'etag': page.etag,
+                        'last_modified': page.last_modified,
+                        'fetched_at': page.fetched_at}
+
+                    with open(index_path, 'ab') as index:
+                        index.write(json.dumps(entry).encode() + b'\n')
+                finally:
+                    fcntl.flock(pack, fcntl.LOCK_UN)
+
+        return True
+
+    def _page(self, pack, entry):
+        """
+        Read and decompress the page of an index `entry` from an open pack
+
+        """
+        pack.seek(entry['offset'])
+        data = pack.read(entry['size'])
+        text = self._decompressor(entry['dictionary']).decompress(data)
+
+        return CachedPage(
+            entry['url'], text.decode('utf-8'), entry['etag'],
+            entry['last_modified'], entry['fetched_at'])
+
+    def get(self, partition, url):
+        """
+        Latest archived version of the page `url`
+
+        Args:
+            partition (str): partition name
+            url (str): page url
+
+        Returns:
+            CachedPage: page text and metadata, None if not archived
+
+        """
+        partition = str(partition)
+
+        with self.lock:
+            entry = self._index(partition).get(url)
+
+        if entry is None:
+            return None
+
+        with open(self._paths(partition)[0], 'rb') as pack:
+            return self._page(pack, entry)
+
+    def pages(self, partition, urls=None):
+        """
+        Iterate over the latest version of the archived pages of
+        `partition`, reading the pack sequentially
+
+        Args:
+            partition (str): partition name
+            urls (set of str, optional): pages to read, all by default
+
+        Yields:
+            CachedPage: page text and metadata
+
+        """
+        entries = self.entries(partition)
+
+        with open(self._paths(str(partition))[0], 'rb') as pack:
+            for entry in entries:
+                if urls is None or entry['url'] in urls:
+                    yield self._page(pack, entry)
+
+    def train(self, samples, size=dictionary_size):
+        """
+        Train a compression dictionary on sample pages and compress the
+        pages archived from now on with it. Pages already archived keep
+        their dictionary.
+
+        Args:
+            samples (list of str): sample page texts, ideally a few hundred
+                pages of each kind
+            size (int, optional): dictionary size in bytes
+
+        Returns:
+            int: dictionary id
+
+        """
+        zstd = _zstandard()
+
+        dictionary = zstd.train_dictionary(
+            size, [sample.encode('utf-8') for sample in samples])
+        dictionary_id = dictionary.dict_id()
+
+        directory = self.root / 'dictionaries'
+        directory.mkdir(parents=True, exist_ok=True)
+        (directory / str(dictionary_id)).write_bytes(dictionary.as_bytes())
+
+        tmp = self.root / f'.dictionary.{os.getpid()}.tmp'
+        tmp.write_text(str(dictionary_id))
+        os.replace(tmp, self.root / 'dictionary')
+
+        return dictionary_id
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+""" Persistent on-disk store of compressed web pages. """
+from collections import namedtuple
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+from . import cachedir
+
+CachedPage = namedtuple('CachedPage', [
+    'url', 'text', 'etag', 'last_modified', 'fetched_at'])
+
+
+class PageCache:
+    """
+    Gzip compressed page store keyed by url. Each page is saved as a
+    compressed body plus a small json sidecar holding the HTTP validators
+    (ETag and Last-Modified headers) and the time the page was last fetched
+    or revalidated.
+
+    Args:
+        root (pathlib.Path): directory in which pages are stored
+
+    """
+    def __init__(self, root):
+        self.root = root
+
+    def _paths(self, url):
+        """
+        Body and metadata file paths of the specified `url`
+
+        """
+        key = hashlib.sha1(url.encode()).hexdigest()
+        directory = self.root / key[:2]
+        return directory / f'{key}.html.gz', directory / f'{key}.json'
+
+    @staticmethod
+    def _write(path, data):
+        """
+        Atomically write `data` bytes to `path` so that concurrent readers
+        never observe a partially written file.
+
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(
+            f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+    def get(self, url):
+        """
+        Return the cached page for `url` or None if it is not in the cache
+
+        Args:
+            url (str): page url
+
+        Returns:
+            CachedPage: cached page text and metadata
+
+        """
+        body_path, meta_path = self._paths(url)
+
+        try:
+            meta = json.loads(meta_path.read_text())
+            text = gzip.decompress(body_path.read_bytes()).decode('utf-8')
+        except (OSError, ValueError, EOFError):
+            return None
+
+        return CachedPage(
+            url, text, meta.get('etag'), meta.get('last_modified'),
+            meta['fetched_at'])
+
+    def fetched_at(self, url):
+        """
+        Time at which the cached copy of `url` was last fetched or
+        revalidated, read without decompressing the page
+
+        Args:
+            url (str): page url
+
+        Returns:
+            float or None: unix time, None if the page is not in the cache
+
+        """
+        body_path, meta_path = self._paths(url)
+
+        try:
+            meta = json.loads(meta_path.read_text())
+        except (OSError, ValueError):
+            return None
+
+        return meta['fetched_at'] if body_path.exists() else None
+
+    def put(self, url, text, etag=None, last_modified=None):
+        """
+        Compress and store the page `text` downloaded from `url`
+
+        Args:
+            url (str): page url
+            text (str): page html
+            etag (str, optional): value of the response ETag header
+            last_modified (str, optional): value of the response Last-Modified
+                header
+
+        """
+        body_path, meta_path = self._paths(url)
+
+        self._write(body_path, gzip.compress(text.encode('utf-8'), 6))
+        self._write(meta_path, json.dumps({
+            'url': url,
+            'etag': etag,
+            'last_modified': last_modified,
+            'fetched_at': time.time()}).encode())
+
+    def touch(self, url):
+        """
+        Mark the cached copy of `url` as fresh after a successful
+        revalidation (HTTP 304 Not Modified).
+
+        Args:
+            url (str): page url
+
+        """
+        _, meta_path = self._paths(url)
+        meta = json.loads(meta_path.read_text())
+        meta['fetched_at'] = time.time()
+        self._write(meta_path, json.dumps(meta).encode())
+
+
+page_cache = PageCache(cachedir / 'pages')
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+""" Shared HTTP client with connection pooling, rate limiting and retries. """
+from collections import Counter
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import metrics
+
+# sports-reference sites block clients exceeding 20 requests per minute
+requests_per_minute = float(os.getenv('SPORTQUERY_RPM', 20))
+
+retry_status_codes = {429, 500, 502, 503, 504}
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket rate limiter. Tokens accrue at a fixed rate up
+    to a maximum `burst` and each request consumes one token.
+
+    Args:
+        requests_per_minute (float): sustained request rate
+        burst (int, optional): maximum number of tokens held in the bucket
+
+    """
+    def __init__(self, requests_per_minute, burst=1):
+        self.rate = requests_per_minute / 60.
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.
+        self.lock = threading.Lock()
+
+    def pause(self, seconds):
+        """
+        Stop issuing tokens for `seconds`, e.g. after the server asks all
+        clients to back off.
+
+        Args:
+            seconds (float): pause duration in seconds
+
+        """
+        with self.lock:
+            self.paused_until = max(
+                self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+
+    def try_acquire(self):
+        """
+        Consume a token if one is available, without blocking
+
+        Returns:
+            float: seconds until the next token is available, None if a
+                token was consumed
+
+        """
+        with self.lock:
+            now = time.monotonic()
+
+            if now < self.paused_until:
+                return self.paused_until - now
+
+            elapsed = now - max(self.updated, self.paused_until)
+            self.tokens = min(
+                self.burst, self.tokens + max(elapsed, 0) * self.rate)
+            self.updated = now
+
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return None
+
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self):
+        """
+        Block until a token is available and consume it
+
+        """
+        while True:
+            wait = self.try_acquire()
+            if wait is None:
+                return
+
+            time.sleep(wait)
+
+
+def _retry_after(response):
+    """
+    Seconds to wait according to the response Retry-After header, which is
+    either a number of seconds or an HTTP date. Returns None if the header is
+    absent or malformed.
+
+    """
+    value = response.headers.get('Retry-After')
+    if value is None:
+        return None
+
+    try:
+        return max(float(value), 0.)
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.)
+
+
+class Client:
+    """
+    HTTP client shared by all scrapers. Keeps alive a pool of connections,
+    spends a global requests-per-minute budget and retries throttled or
+    failed requests with jittered exponential backoff.
+
+    Args:
+        requests_per_minute (float): global request budget
+        max_retries (int, optional): number of retries before giving up
+        backoff (float, optional): base backoff delay in seconds
+        max_backoff (float, optional): maximum backoff delay in seconds
+        timeout (float, optional): connect and read timeout in seconds
+        pool_size (int, optional): maximum number of pooled connections
+
+    """
+    def __init__(self, requests_per_minute, max_retries=5, backoff=2.,
+                 max_backoff=120., timeout=30., pool_size=16):
+        self.limiter = RateLimiter(requests_per_minute)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.stats = Counter()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _delay(self, attempt):
+        """
+        Full-jitter exponential backoff delay for the given attempt number
+
+        """
+        ceiling = min(self.max_backoff, self.backoff * 2**attempt)
+        return random.uniform(0, ceiling)
+
+    def get(self, url, headers=None):
+        """
+        Issue a rate limited GET request, retrying connection errors,
+        timeouts, throttled (429) and server error (5xx) responses.
+
+        Args:
+            url (str): request url
+            headers (dict, optional): additional request headers
+
+        Returns:
+            requests.Response: server response
+
+        """
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            self.stats['requests'] += 1
+
+            try:
+                r = self.session.get(
+                    url, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+                self.stats['retries'] += 1
+                metrics.inc('http_retries_total', reason='connection')
+                time.sleep(self._delay(attempt))
+                continue
+
+            metrics.inc('http_responses_total', status=r.status_code)
+
+            if (r.status_code not in retry_status_codes
+                    or attempt == self.max_retries):
+                return r
+
+            self.stats['retries'] += 1
+            metrics.inc('http_retries_total', reason=r.status_code)
+            delay = _retry_after(r)
+
+            if r.status_code == 429:
+                self.stats['throttled'] += 1
+                # slow down every thread sharing the budget, not just this one
+                self.limiter.pause(
+                    delay if delay is not None else self._delay(attempt))
+            else:
+                time.sleep(delay if delay is not None else self._delay(attempt))
+
+
+client = Client(requests_per_minute)
@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+""" Single-parse html table extraction shared by all scrapers. """
+import re
+
+import lxml.etree
+import lxml.html
+from pandas.io.parsers import TextParser
+
+from . import metrics
+
+_whitespace = re.compile(r'[\r\n]+|\s{2,}')
+
+
+def _cell_text(cell):
+    """
+    Text content of a table cell with whitespace runs collapsed
+
+    """
+    return _whitespace.sub(' ', cell.text_content().strip())
+
+
+def _cell_href(cell):
+    """
+    Target of the first link inside a table cell, empty if it has none
+
+    """
+    hrefs = cell.xpath('.//a/@href')
+    return hrefs[0] if hrefs else ''
+
+
+def _cell_hrefs(cell):
+    """
+    Space separated targets of all links inside a table cell
+
+    """
+    return ' '.join(cell.xpath('.//a/@href'))
+
+
+def _expand_spans(rows, getter):
+    """
+    Convert a list of <tr> elements to a list of rows of cell values,
+    copying the value of each cell with a `colspan` or `rowspan` attribute
+    into every cell it spans (the same convention as `pd.read_html`).
+
+    Args:
+        rows (list of lxml.html.HtmlElement): table row elements
+        getter (callable): function mapping a cell element to its value
+
+    Returns:
+        list of list: cell values of each row
+
+    """
+    expanded = []
+    remainder = []  # (column index, value, rows left) spanning from above
+
+    for tr in rows:
+        values = []
+        next_remainder = []
+        index = 0
+
+        for cell in tr.xpath('./td|./th'):
+            while remainder and remainder[0][0] <= index:
+                prev_index, prev_value, prev_rowspan = remainder.pop(0)
+                values.append(prev_value)
+                if prev_rowspan > 1:
+                    next_remainder.append(
+                        (prev_index, prev_value, prev_rowspan - 1))
+                index += 1
+
+            value = getter(cell)
+            rowspan = int(cell.get('rowspan') or 1)
+            colspan = int(cell.get('colspan') or 1)
+
+            for _ in range(colspan):
+                values.append(value)
+                if rowspan > 1:
+                    next_remainder.append((index, value, rowspan - 1))
+                index += 1
+
+        for prev_index, prev_value, prev_rowspan in remainder:
+            values.append(prev_value)
+            if prev_rowspan > 1:
+                next_remainder.append(
+                    (prev_index, prev_value, prev_rowspan - 1))
+
+        expanded.append(values)
+        remainder = next_remainder
+
+    while remainder:
+        values = [value for _, value, _ in remainder]
+        remainder = [
+            (index, value, rowspan - 1)
+            for index, value, rowspan in remainder if rowspan > 1]
+        expanded.append(values)
+
+    return expanded
+
+
+def _sections(table):
+    """
+    Split a table element into header, body and footer row elements.
+    Tables without a <thead> use their leading all-<th> rows as the header.
+
+    """
+    head = table.xpath('.//thead/tr')
+    body = table.xpath('.//tbody//tr') + table.xpath('./tr')
+    foot = table.xpath('.//tfoot//tr')
+
+    if not head:
+        while body and all(
+                cell.tag == 'th' for cell in body[0].xpath('./td|./th')):
+            head.append(body.pop(0))
+
+    return head, body, foot
+
+
+class Document:
+    """
+    Html page parsed once into an element tree. Tables are looked up by id,
+    including tables which sports-reference sites hide inside html comments
+    and only render client-side. Comments are parsed lazily, the first time a
+    requested table is not found in the visible page.
+
+    Args:
+        text (str): raw page html
+
+    """
+    def __init__(self, text):
+        self.root = lxml.html.fromstring(text)
+        self._tables = {
+            table.get('id'): table
+            for table in self.root.iter('table') if table.get('id')}
+        self._comments_parsed = False
+
+    def _parse_comments(self):
+        """
+        Index tables contained in html comments
+
+        """
+        with metrics.timer('extract_comments_seconds', detailed=True):
+            for comment in self.root.iter(lxml.etree.Comment):
+                if comment.text and '<table' in comment.text:
+                    fragment = lxml.html.fragment_fromstring(
+                        comment.text, create_parent='div')
+                    for table in fragment.iter('table'):
+                        self._tables.setdefault(table.get('id'), table)
+
+        self._comments_parsed = True
+
+    def element(self, table_id):
+        """
+        Return the <table> element with the specified id
+
+        Args:
+            table_id (str): html id attribute of the table
+
+        Returns:
+            lxml.html.HtmlElement: table element
+
+        """
+        if table_id not in self._tables and not self._comments_parsed:
+            self._parse_comments()
+
+        try:
+            return self._tables[table_id]
+        except KeyError:
+            raise ValueError(f'No table found with id {table_id!r}')
+
+    def _read(self, table_id, getter, skip=0):
+        """
+        Convert a table to a dataframe with header labels taken from the
+        header cell text and values obtained by applying `getter` to each
+        body and footer cell, leaving out the first `skip` body rows.
+
+        """
+        head_rows, body_rows, foot_rows = _sections(self.element(table_id))
+        body_rows = body_rows[skip:]
+
+        with metrics.timer('extract_table_seconds', detailed=True):
+            head = _expand_spans(head_rows, _cell_text)
+            body = _expand_spans(body_rows, getter)
+            foot = _expand_spans(foot_rows, getter)
+
+        header = None
+        if head:
+            if len(head) == 1:
+                header = 0
+            else:
+                header = [i for i, row in enumerate(head) if any(row)]
+
+        rows = head + body + foot
+
+        # pad ragged rows
+        width = max(len(row) for row in rows)
+        for row in rows:
+            row += [''] * (width - len(row))
+
+        with TextParser(rows, header=header, thousands=',') as parser:
+            return parser.read()
+
+    def table(self, table_id, skip=0):
+        """
+        Return the table with the specified id as a pandas dataframe. Header
+        rows become (possibly multi-level) column labels and column types are
+        inferred, both following the conventions of `pd.read_html`.
+
+        Args:
+            table_id (str): html id attribute of the table
+            skip (int, optional): number of leading body rows left out, e.g.
+                rows already read from an earlier version of a page. Cells
+                spanning several rows must not cross the skipped rows.
+
+        Returns:
+            pd.DataFrame: table contents
+
+        """
+        return self._read(table_id, _cell_text, skip)
+
+    def links(self, table_id, first=True, skip=0):
+        """
+        Return the link targets of the table with the specified id: a
+        dataframe aligned with `table(table_id)` holding the href of the
+        first link in each cell, or NaN for cells without links.
+
+        Args:
+            table_id (str): html id attribute of the table
+            first (bool, optional): if False, hold the space separated hrefs
+                of all links in each cell instead of the first one
+            skip (int, optional): number of leading body rows left out
+
+        Returns:
+            pd.DataFrame: cell link targets
+
+        """
+        return self._read(
+            table_id, _cell_href if first else _cell_hrefs, skip)
+
+    def body_rows(self, table_id):
+        """
+        Number of body rows of the table with the specified id, the rows
+        which `table` may skip
+
+        Args:
+            table_id (str): html id attribute of the table
+
+        Returns:
+            int: number of body rows
+
+        """
+        return len(_sections(self.element(table_id))[1])
+
+    def tables(self, *table_ids):
+        """
+        Return each of the tables with the specified ids as a dataframe
+
+        Args:
+            *table_ids (str): html id attributes of the tables
+
+        Returns:
+            list of pd.DataFrame: table contents in the order requested
+
+        """
+        return [self.table(table_id) for table_id in table_ids]
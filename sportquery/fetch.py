@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+""" Shared page fetching layer backed by the on-disk page cache. """
+import time
+
+from . import metrics
+from .cache import CachedPage, page_cache
+
+
+def _is_fresh(fetched_at, ttl, final_at=None):
+    """
+    Whether a cached copy fetched or revalidated at `fetched_at` may be
+    served without contacting the server
+
+    """
+    if final_at is not None and fetched_at >= final_at:
+        return True
+
+    return ttl is None or time.time() - fetched_at < ttl
+
+
+def _validators(cached):
+    """
+    Conditional request headers revalidating the `cached` page
+
+    """
+    headers = {}
+    if cached is not None:
+        if cached.etag:
+            headers['If-None-Match'] = cached.etag
+        if cached.last_modified:
+            headers['If-Modified-Since'] = cached.last_modified
+
+    return headers
+
+
+def fetch_page(url, ttl=None, final_at=None):
+    """
+    Return the page located at `url` along with its HTTP validators.
+    Pages are served from the local page cache whenever the cached copy is
+    still fresh. Stale pages are revalidated with a conditional GET request
+    using the ETag and Last-Modified validators of the cached copy, so
+    unchanged pages are never downloaded twice.
+
+    Args:
+        url (str): page url
+        ttl (float, optional): number of seconds a cached copy is considered
+            fresh. The default, None, marks the page as immutable so that any
+            cached copy is served without contacting the server.
+        final_at (float, optional): unix time from which the page no longer
+            changes, e.g. the end of a game. Copies fetched or revalidated
+            after it are immutable, older copies are fresh for `ttl` seconds.
+
+    Returns:
+        CachedPage: page html and metadata
+
+    """
+    cached = page_cache.get(url)
+
+    if cached is not None and _is_fresh(cached.fetched_at, ttl, final_at):
+        metrics.inc('cache_hits_total')
+        return cached
+
+    # deferred so that requests is only imported once a page misses the cache
+    from .client import client
+
+    r = client.get(url, headers=_validators(cached))
+
+    if r.status_code == 304 and cached is not None:
+        metrics.inc('cache_revalidated_total')
+        page_cache.touch(url)
+        return cached._replace(fetched_at=time.time())
+
+    r.raise_for_status()
+
+    metrics.inc('downloads_total')
+    metrics.inc('bytes_downloaded_total', len(r.content))
+
+    page = CachedPage(
+        url, r.text, r.headers.get('ETag'), r.headers.get('Last-Modified'),
+        time.time())
+
+    page_cache.put(
+        url, page.text, etag=page.etag, last_modified=page.last_modified)
+
+    return page
+
+
+def get_page(url, ttl=None, final_at=None):
+    """
+    Return the html text located at `url`, served from the local page cache
+    when possible (see `fetch_page`).
+
+    Args:
+        url (str): page url
+        ttl (float, optional): number of seconds a cached copy is considered
+            fresh, None if the page is immutable
+        final_at (float, optional): unix time from which the page no longer
+            changes
+
+    Returns:
+        str: page html
+
+    """
+    return fetch_page(url, ttl=ttl, final_at=final_at).text
@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+""" Counters and latency histograms of the sync stages and their export. """
+import bisect
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+import json
+import os
+from pathlib import Path
+import threading
+import time
+
+from . import cachedir
+
+# 'off' disables instrumentation, 'basic' records per page and per batch
+# measurements only, cheap enough to stay on, and 'detailed' also times the
+# steps inside each page parse
+level = os.getenv('SPORTQUERY_METRICS', 'basic')
+
+# directory of the exported prometheus text file and json run summaries
+metrics_dir = os.getenv('SPORTQUERY_METRICS_DIR', cachedir / 'metrics')
+
+# upper bounds (seconds) of the latency histogram buckets
+buckets = (
+    .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1., 2.5, 5., 10., 30.,
+    60., float('inf'))
+
+_noop = nullcontext()
+
+
+def _key(name, labels):
+    """
+    Hashable identifier of the series `name` with `labels`. Label values
+    are converted to strings, so that series labeled e.g. with a status
+    code and with a text reason remain sortable.
+
+    """
+    return name, tuple(sorted(
+        (label, str(value)) for label, value in labels.items()))
+
+
+def _format_labels(labels, **extra):
+    """
+    Prometheus label set, e.g. `{dataset="boxscore"}`
+
+    """
+    labels = dict(labels, **extra)
+    if not labels:
+        return ''
+    return '{' + ','.join(
+        f'{name}="{value}"' for name, value in labels.items()) + '}'
+
+
+class Registry:
+    """
+    Thread-safe store of counters and histograms, each series identified by
+    a metric name and a set of labels. Registries of worker processes are
+    shipped to the parent as snapshots and merged.
+
+    """
+    def __init__(self):
+        self.counters = defaultdict(float)
+        self.histograms = {}  # key -> [bucket counts, sum]
+        self.lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        """
+        Add `value` to the counter `name`
+
+        """
+        with self.lock:
+            self.counters[_key(name, labels)] += value
+
+    def observe(self, name, value, **labels):
+        """
+        Record the measurement `value` in the histogram `name`
+
+        """
+        index = bisect.bisect_left(buckets, value)
+
+        with self.lock:
+            key = _key(name, labels)
+            if key not in self.histograms:
+                self.histograms[key] = [[0] * len(buckets), 0.]
+            histogram = self.histograms[key]
+            histogram[0][index] += 1
+            histogram[1] += value
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """
+        Record the duration of the managed block in the histogram `name`
+
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def snapshot(self, reset=False):
+        """
+        Picklable copy of the recorded series
+
+        Args:
+            reset (bool, optional): clear the registry after copying
+
+        Returns:
+            dict: counters and histograms keyed by series
+
+        """
+        with self.lock:
+            snapshot = {
+                'counters': dict(self.counters),
+                'histograms': {
+                    key: [list(counts), total]
+                    for key, (counts, total) in self.histograms.items()}}
+            if reset:
+                self.counters.clear()
+                self.histograms.clear()
+
+        return snapshot
+
+    def merge(self, snapshot):
+        """
+        Add the series of a snapshot taken in another registry
+
+        """
+        with self.lock:
+            for key, value in snapshot['counters'].items():
+                self.counters[key] += value
+            for key, (counts, total) in snapshot['histograms'].items():
+                if key not in self.histograms:
+                    self.histograms[key] = [[0] * len(buckets), 0.]
+                histogram = self.histograms[key]
+                histogram[0] = [a + b for a, b in zip(histogram[0], counts)]
+                histogram[1] += total
+
+    def prometheus(self, prefix='sportquery'):
+        """
+        Series in the prometheus text exposition format, e.g. for the node
+        exporter textfile collector
+
+        Args:
+            prefix (str, optional): prefix of the metric names
+
+        Returns:
+            str: exposition text
+
+        """
+        snapshot = self.snapshot()
+        lines = []
+
+        names = sorted({name for name, _ in snapshot['counters']})
+        for name in names:
+            lines.append(f'# TYPE {prefix}_{name} counter')
+            for (series, labels), value in sorted(
+                    snapshot['counters'].items()):
+                if series == name:
+                    lines.append(
+                        f'{prefix}_{name}{_format_labels(labels)} {value:g}')
+
+        names = sorted({name for name, _ in snapshot['histograms']})
+        for name in names:
+            lines.append(f'# TYPE {prefix}_{name} histogram')
+            for (series, labels), (counts, total) in sorted(
+                    snapshot['histograms'].items()):
+                if series != name:
+                    continue
+                labels = dict(labels)
+                cumulative = 0
+                for bound, count in zip(buckets, counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else f'{bound:g}'
+                    lines.append(
+                        f'{prefix}_{name}_bucket'
+                        f'{_format_labels(labels, le=le)} {cumulative}')
+                lines.append(
+                    f'{prefix}_{name}_sum{_format_labels(labels)} {total:g}')
+                lines.append(
+                    f'{prefix}_{name}_count{_format_labels(labels)} '
+                    f'{cumulative}')
+
+        return '\n'.join(lines) + '\n'
+
+    def summary(self):
+        """
+        Json serializable summary of the series: counter values, and the
+        count, total, mean and bucket estimated median and 95th percentile
+        of each histogram
+
+        Returns:
+            dict: summary keyed by metric name, then by label values
+
+        """
+        snapshot = self.snapshot()
+        summary = defaultdict(dict)
+
+        def label(labels):
+            return ','.join(f'{k}={v}' for k, v in labels) or 'all'
+
+        for (name, labels), value in snapshot['counters'].items():
+            summary[name][label(labels)] = value
+
+        for (name, labels), (counts, total) in snapshot['histograms'].items():
+            count = sum(counts)
+            cumulative = [sum(counts[:i + 1]) for i in range(len(counts))]
+
+            def quantile(q):
+                bound = buckets[bisect.bisect_left(cumulative, q * count)]
+                return None if bound == float('inf') else bound
+
+            summary[name][label(labels)] = {
+                'count': count,
+                'sum': total,
+                'mean': total / count if count else None,
+                'p50_upper_bound': quantile(.5),
+                'p95_upper_bound': quantile(.95)}
+
+        return dict(summary)
+
+
+registry = Registry()
+
+
+def inc(name, value=1, **labels):
+    """
+    Add `value` to the counter `name` unless instrumentation is off
+
+    """
+    if level != 'off':
+        registry.inc(name, value, **labels)
+
+
+def timer(name, detailed=False, **labels):
+    """
+    Context manager timing a block into the histogram `name`. Timers of
+    `detailed` steps only record when the metrics level is 'detailed'.
+
+    """
+    if level == 'off' or (detailed and level != 'detailed'):
+        return _noop
+    return registry.timer(name, **labels)
+
+
+def measured(func, *args):
+    """
+    Call `func(*args)` in a worker process and return its result along with
+    the measurements recorded during the call, for `merge` in the parent
+
+    """
+    registry.snapshot(reset=True)
+    result = func(*args)
+
+    return result, registry.snapshot(reset=True)
+
+
+def merge(snapshot):
+    """
+    Merge measurements returned by `measured`
+
+    """
+    registry.merge(snapshot)
+
+
+def export(name, started_at=None):
+    """
+    Write the recorded measurements to `metrics_dir`: a prometheus text file
+    `{name}.prom`, replaced on each run, and a json summary of the run
+    `{name}-{time}.json`
+
+    Args:
+        name (str): run name, e.g. 'nba'
+        started_at (float, optional): unix time at which the run started
+
+    Returns:
+        pathlib.Path: path of the json summary
+
+    """
+    directory = Path(metrics_dir).expanduser()
+    directory.mkdir(parents=True, exist_ok=True)
+
+    finished_at = time.time()
+
+    prom = directory / f'{name}.prom'
+    tmp = prom.with_name(f'.{prom.name}.{os.getpid()}.tmp')
+    tmp.write_text(registry.prometheus())
+    os.replace(tmp, prom)
+
+    summary = {
+        'name': name,
+        'started_at': started_at,
+        'finished_at': finished_at,
+        'seconds': finished_at - started_at if started_at else None,
+        'metrics': registry.summary()}
+
+    path = directory / f'{name}-{time.strftime("%Y%m%dT%H%M%S")}.json'
+    path.write_text(json.dumps(summary, indent=2))
+
+    return path
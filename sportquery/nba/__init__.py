@@ -1,12 +1,21 @@
-import sqlalchemy
+from datetime import date, datetime, timedelta
+import os
+from zoneinfo import ZoneInfo
 
-from .. import cachedir
+from ..storage import get_engine
 
-db_path = cachedir / 'nba.db'
-db_path.parent.mkdir(parents=True, exist_ok=True)
-engine = sqlalchemy.create_engine(f'sqlite:///{db_path.expanduser()}')
+base_url = os.getenv(
+    'SPORTQUERY_NBA_URL', 'http://www.basketball-reference.com')
 
-base_url = 'http://www.basketball-reference.com'
+# time zone of the tipoff times of the schedule
+schedule_timezone = ZoneInfo('America/New_York')
+
+# lifetime (seconds) of cached pages which may still change
+schedule_ttl = 3600
+live_game_ttl = 300
+# schedule months yet to start only change with postponements, which are
+# picked up once the month starts
+future_schedule_ttl = 7 * 24 * 3600
 
 team_abbr = {
     'Atlanta Hawks': 'ATL',
@@ -45,3 +54,68 @@ team_abbr = {
     'Utah Jazz': 'UTA',
     'Vancouver Grizzlies': 'VAN',
     'Washington Wizards': 'WAS'}
+
+
+def latest_season(today=None):
+    """
+    Year of the season in progress, or of the last season played during
+    the offseason. Season N starts in October of year N - 1.
+
+    Args:
+        today (datetime.date, optional): reference date, today by default
+
+    Returns:
+        int: NBA season year
+
+    """
+    today = today or date.today()
+
+    return today.year + 1 if today.month >= 10 else today.year
+
+
+def season_lifetime(season):
+    """
+    Cache lifetime of season level pages (team lists and schedules). Pages
+    fetched once the season has concluded are immutable, copies fetched
+    during the season are revalidated after `schedule_ttl` seconds.
+
+    Args:
+        season (int): NBA season year
+
+    Returns:
+        dict: `ttl` and `final_at` arguments of `sportquery.fetch.fetch_page`
+
+    """
+    # season N finishes by the fall of year N (the 2020 bubble ended in October)
+    season_over = datetime(season, 11, 1)
+
+    return dict(ttl=schedule_ttl, final_at=season_over.timestamp())
+
+
+def game_lifetime(game_id):
+    """
+    Cache lifetime of game level pages (boxscore, play-by-play and
+    plus-minus). Pages fetched more than a day after the game are
+    immutable, copies fetched earlier, e.g. while the game was in progress,
+    are revalidated after `live_game_ttl` seconds.
+
+    Args:
+        game_id (str): unique game identifier
+
+    Returns:
+        dict: `ttl` and `final_at` arguments of `sportquery.fetch.fetch_page`
+
+    """
+    game_date = datetime.strptime(game_id[:8], '%Y%m%d')
+    game_over = game_date + timedelta(days=2)
+
+    return dict(ttl=live_game_ttl, final_at=game_over.timestamp())
+
+
+def __getattr__(name):
+    # the database engine is created on first access of `nba.engine` so
+    # that importing the scrapers never touches the database
+    if name == 'engine':
+        return get_engine('nba')
+
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
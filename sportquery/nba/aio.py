@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+
+from . import game_lifetime, season_lifetime
+from .boxscore import boxscore_url, parse_boxscore
+from .game import game_tables, parse_game
+from .play_by_play import parse_play_by_play, play_by_play_url
+from .plus_minus import parse_plus_minus, plus_minus_url
+from .schedule import parse_schedule, team_schedule_url
+from .teams import parse_teams, teams_url
+from ..aio import async_client, fetch_page, get_page, run_parser
+
+
+async def get_teams(season):
+    """
+    Asyncio counterpart of `sportquery.nba.teams.get_teams`
+
+    Args:
+        season (int): The requested season year to pull teams for
+
+    Returns:
+        list of str: abbreviated name of all teams in season `season`
+
+    """
+    text = await get_page(teams_url(season), **season_lifetime(season))
+
+    return await run_parser(parse_teams, text)
+
+
+async def get_schedule(team, season):
+    """
+    Asyncio counterpart of `sportquery.nba.schedule.get_schedule`
+
+    Args:
+        team (str): NBA team abbreviation
+        season (int): NBA season number (according to regular season)
+
+    Returns:
+        pd.DataFrame: pandas dataframe containing all team games for the
+            specified season
+
+    """
+    text = await get_page(
+        team_schedule_url(team, season), **season_lifetime(season))
+
+    return await run_parser(parse_schedule, text, team)
+
+
+async def get_boxscore(game_id):
+    """
+    Asyncio counterpart of `sportquery.nba.boxscore.get_boxscore`
+
+    Args:
+        game_id (str): unique game identifier
+
+    Returns:
+        pd.DataFrame: pandas dataframe of player and team-level boxscore stats
+
+    """
+    text = await get_page(boxscore_url(game_id), **game_lifetime(game_id))
+
+    return await run_parser(parse_boxscore, text, game_id)
+
+
+async def get_play_by_play(game_id):
+    """
+    Asyncio counterpart of `sportquery.nba.play_by_play.get_play_by_play`
+
+    Args:
+        game_id (str): unique game identifier
+
+    Returns:
+        pd.DataFrame: pandas dataframe of individual game plays
+
+    """
+    text = await get_page(
+        play_by_play_url(game_id), **game_lifetime(game_id))
+
+    return await run_parser(parse_play_by_play, text, game_id)
+
+
+async def get_plus_minus(game_id):
+    """
+    Asyncio counterpart of `sportquery.nba.plus_minus.get_plus_minus`
+
+    Args:
+        game_id (str): unique game identifier
+
+    Returns:
+        pd.DataFrame: pandas dataframe containing player plus-minus data
+
+    """
+    text = await get_page(plus_minus_url(game_id), **game_lifetime(game_id))
+
+    return await run_parser(parse_plus_minus, text, game_id)
+
+
+async def get_game(game_id):
+    """
+    Asyncio counterpart of `sportquery.nba.game.get_game`, requesting the
+    pages of the game concurrently
+
+    Args:
+        game_id (str): unique game identifier
+
+    Returns:
+        dict: pandas dataframe of each game level table keyed by table name
+
+    """
+    lifetime = game_lifetime(game_id)
+
+    pages = await asyncio.gather(*(
+        fetch_page(page_url(game_id), **lifetime)
+        for page_url, _ in game_tables.values()))
+
+    return await run_parser(
+        parse_game, dict(zip(game_tables, pages)), game_id)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Print the boxscores of NBA games fetched concurrently')
+    parser.add_argument('game_ids', nargs='+')
+    args = parser.parse_args()
+
+    async def main():
+        try:
+            boxscores = await asyncio.gather(
+                *map(get_boxscore, args.game_ids))
+        finally:
+            await async_client.close()
+
+        for game_id, df in zip(args.game_ids, boxscores):
+            print(game_id)
+            print(df.to_string())
+
+    asyncio.run(main())
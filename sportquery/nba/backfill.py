@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+import argparse
+from collections import namedtuple
+from datetime import date, timedelta
+import os
+
+import pandas as pd
+import prefect
+import sqlalchemy
+
+from . import game_lifetime, latest_season, season_lifetime, team_abbr
+from .game import game_pages, game_tables
+from .migrate import check_schema
+from .schedule import league_schedule_url, parse_schedule_months
+from .schema import metadata, schedule, sync_ledger
+from .schema import teams as team_dimension
+from .sync_database import (
+    initialize_database, sync_games, sync_schedule, update_columnar)
+from ..cache import page_cache
+from ..fetch import _is_fresh
+from ..storage import database_url
+
+datasets = ['schedule'] + list(game_tables)
+
+# pages of a league schedule whose index page is not cached, the index and
+# one page per month, and number of games of a season whose schedule is not
+# synced yet (30 teams playing 82 games), used to estimate unknown plans
+league_schedule_pages = 9
+season_games = 1230
+team_games = 82
+
+Plan = namedtuple('Plan', [
+    'schedules', 'games', 'schedule_requests', 'game_requests',
+    'estimated_games', 'filters'])
+Plan.__doc__ = """
+Pages to sync: the seasons whose league schedule is synced, the game level
+tables missing from each game (`game_id` and `dataset` columns), the
+number of requests not served by the page cache, the estimated number of
+games of seasons whose schedule is not synced yet, which are only known
+once their schedule is, and the `missing_games` arguments of the plan.
+"""
+
+
+def planning_database():
+    """
+    Connect to the database configured by `SPORTQUERY_DB` for a dry run,
+    which leaves it untouched: unlike `initialize_database`, no table is
+    created, migrated or seeded, and sqlite databases are opened read-only
+    without the bulk write pragmas. Databases without the planned tables
+    yet, including sqlite files which do not exist, are planned as an empty
+    in-memory database.
+
+    Returns:
+        sqlalchemy.engine.base.Engine: database engine
+
+    """
+    url = sqlalchemy.engine.make_url(database_url('nba'))
+
+    engine = None
+    if url.get_backend_name() != 'sqlite':
+        engine = sqlalchemy.create_engine(url)
+    elif url.database and url.database != ':memory:' and os.path.exists(
+            url.database):
+        engine = sqlalchemy.create_engine(
+            f'sqlite:///file:{url.database}?mode=ro&uri=true')
+
+    tables = [schedule.name, sync_ledger.name, team_dimension.name]
+    if engine is not None and all(
+            sqlalchemy.inspect(engine).has_table(table) for table in tables):
+        check_schema(engine)
+        return engine
+
+    if engine is not None:
+        engine.dispose()
+
+    engine = sqlalchemy.create_engine('sqlite://')
+    metadata.create_all(engine)
+
+    return engine
+
+
+def is_cached(url, ttl=None, final_at=None):
+    """
+    Whether a fresh copy of `url` is in the page cache, so that fetching it
+    with the same `ttl` and `final_at` does not send a request
+
+    """
+    fetched_at = page_cache.fetched_at(url)
+
+    if fetched_at is None:
+        return False
+
+    return _is_fresh(fetched_at, ttl, final_at)
+
+
+def schedule_requests(season):
+    """
+    Number of requests sent to sync the league schedule of `season`: the
+    uncached pages among the schedule index and its monthly pages, or an
+    estimate if the index itself is not cached
+
+    """
+    lifetime = season_lifetime(season)
+    url = league_schedule_url(season)
+
+    cached = page_cache.get(url)
+    if cached is None:
+        return league_schedule_pages
+
+    months = parse_schedule_months(cached.text, season)
+
+    return int(not is_cached(url, **lifetime)) + sum(
+        not is_cached(league_schedule_url(season, month), **lifetime)
+        for month in months)
+
+
+def missing_games(conn, seasons, start_date=None, end_date=None,
+                  datasets=tuple(game_tables), teams=None, force=False):
+    """
+    Game level tables to sync for the completed games of `seasons` in the
+    schedule table: the tables without a successful ledger entry, or all
+    tables with `force`.
+
+    Args:
+        conn (sqlalchemy.engine.base.Engine): sqlalchemy engine connection
+        seasons (list of int): NBA season years
+        start_date (datetime.date, optional): first game date
+        end_date (datetime.date, optional): last game date
+        datasets (iterable of str, optional): game level table names
+        teams (list of str, optional): team abbreviations, games of any
+            team by default
+        force (bool, optional): sync tables already synced
+
+    Returns:
+        pd.DataFrame: `game_id` and `dataset` of each table to sync
+
+    """
+    games = (
+        sqlalchemy.select(schedule.c.game_id).distinct()
+        .where(schedule.c.season.in_(list(seasons)))
+        .where(schedule.c.outcome.isnot(None)))
+
+    if start_date is not None:
+        games = games.where(
+            schedule.c.datetime >= pd.Timestamp(start_date).to_pydatetime())
+    if end_date is not None:
+        games = games.where(schedule.c.datetime < pd.Timestamp(
+            end_date + timedelta(days=1)).to_pydatetime())
+    if teams:
+        games = games.where(schedule.c.team_key.in_(
+            sqlalchemy.select(team_dimension.c.team_key)
+            .where(team_dimension.c.team.in_(list(teams)))
+            .scalar_subquery()))
+
+    game_ids = pd.read_sql(games.order_by(schedule.c.game_id), conn).game_id
+
+    planned = pd.DataFrame({
+        'game_id': game_ids.repeat(len(datasets)).values,
+        'dataset': list(datasets) * len(game_ids)})
+
+    if force or len(planned) == 0:
+        return planned
+
+    synced = pd.read_sql(
+        sqlalchemy.select(sync_ledger.c.game_id, sync_ledger.c.dataset)
+        .where(sync_ledger.c.status == 'ok')
+        .where(sync_ledger.c.game_id.in_(games.scalar_subquery())), conn)
+
+    planned = planned.merge(synced, how='left', indicator=True)
+
+    return planned[planned._merge == 'left_only'].drop(
+        columns='_merge').reset_index(drop=True)
+
+
+def game_requests(games):
+    """
+    Number of requests sent to sync `games` (see `missing_games`): the
+    uncached pages of each game, including the boxscore pages needed to
+    parse plus-minus tables
+
+    """
+    requests = 0
+
+    for game_id, group in games.groupby('game_id').dataset:
+        lifetime = game_lifetime(game_id)
+        requests += sum(
+            not is_cached(game_tables[table][0](game_id), **lifetime)
+            for table in game_pages(group))
+
+    return requests
+
+
+def plan_backfill(conn, seasons, start_date=None, end_date=None,
+                  datasets=datasets, teams=None, force=False):
+    """
+    Pages to sync to fill the database for `seasons`. League schedules are
+    synced if the schedule table is requested or if the season has no
+    schedule rows yet; game level tables are planned as in `missing_games`.
+
+    Args:
+        conn (sqlalchemy.engine.base.Engine): sqlalchemy engine connection
+        seasons (list of int): NBA season years
+        start_date (datetime.date, optional): first game date
+        end_date (datetime.date, optional): last game date
+        datasets (iterable of str, optional): table names, among 'schedule'
+            and the game level tables
+        teams (list of str, optional): team abbreviations, games of any
+            team by default
+        force (bool, optional): sync tables already synced
+
+    Returns:
+        Plan: pages to sync and number of requests
+
+    """
+    game_datasets = [table for table in game_tables if table in datasets]
+
+    scheduled = set(pd.read_sql(
+        sqlalchemy.select(schedule.c.season).distinct()
+        .where(schedule.c.season.in_(list(seasons))), conn).season)
+
+    unscheduled = [season for season in seasons if season not in scheduled]
+    if 'schedule' in datasets:
+        schedule_seasons = list(seasons)
+    else:
+        schedule_seasons = unscheduled
+
+    filters = dict(
+        seasons=list(seasons), start_date=start_date, end_date=end_date,
+        datasets=game_datasets, teams=teams, force=force)
+    games = missing_games(conn, **filters)
+
+    estimated_games = 0
+    if game_datasets:
+        per_season = season_games
+        if teams:
+            per_season = min(season_games, team_games * len(teams))
+        estimated_games = per_season * len(unscheduled)
+
+    return Plan(
+        schedules=schedule_seasons,
+        games=games,
+        schedule_requests=sum(map(schedule_requests, schedule_seasons)),
+        game_requests=(
+            game_requests(games) +
+            estimated_games * len(game_pages(game_datasets))),
+        estimated_games=estimated_games,
+        filters=filters)
+
+
+def describe(plan, requests_per_minute=None):
+    """
+    Summary of `plan` with the time its requests take at the client rate
+
+    Args:
+        plan (Plan): plan returned by `plan_backfill`
+        requests_per_minute (float, optional): request rate, the rate of the
+            shared client by default
+
+    Returns:
+        str: multi-line description
+
+    """
+    from ..client import client
+
+    requests_per_minute = requests_per_minute or 60 * client.limiter.rate
+
+    requests = plan.schedule_requests + plan.game_requests
+    minutes = requests / requests_per_minute
+
+    counts = plan.games.dataset.value_counts()
+    tables = ', '.join(
+        f'{counts[table]} {table}' for table in game_tables
+        if table in counts)
+
+    lines = [
+        f'schedules: {len(plan.schedules)} seasons '
+        f'({plan.schedule_requests} requests)',
+        f'games: {plan.games.game_id.nunique()} games '
+        f'({tables or "up to date"})']
+    if plan.estimated_games:
+        lines.append(
+            f'  plus up to {plan.estimated_games} games of seasons whose '
+            'schedule is not synced yet')
+    lines.append(
+        f'requests: {requests}, about '
+        f'{timedelta(seconds=round(60 * minutes))} at '
+        f'{requests_per_minute:g} requests/minute')
+
+    return '\n'.join(lines)
+
+
+def run_backfill(conn, plan, fetch_workers=4, parse_workers=None,
+                 batch_size=25):
+    """
+    Sync the pages of `plan`. The game level tables are planned again once
+    the schedules are synced if the plan includes seasons whose games were
+    not known yet.
+
+    Args:
+        conn (sqlalchemy.engine.base.Engine): sqlalchemy engine connection
+        plan (Plan): plan returned by `plan_backfill`
+        fetch_workers (int, optional): number of games downloaded concurrently
+        parse_workers (int, optional): number of page parsing processes
+        batch_size (int, optional): number of games written per transaction
+
+    Returns:
+        list of str: identifiers of the synced games
+
+    """
+    schedule_ids = []
+    for season in plan.schedules:
+        schedule_ids.extend(sync_schedule(conn, season))
+
+    games = plan.games
+    if plan.estimated_games:
+        games = missing_games(conn, **plan.filters)
+
+    synced = []
+
+    # games missing the same tables are synced together
+    tables = games.groupby('game_id').dataset.agg(tuple)
+    for game_datasets, group in tables.groupby(tables):
+        synced.extend(sync_games(
+            conn, group.index, fetch_workers, parse_workers, batch_size,
+            datasets=list(game_datasets)))
+
+    update_columnar.run(conn, schedule_ids, synced)
+
+    return synced
+
+
+def season_range(text):
+    """
+    Seasons of a `2019` or `2019-2021` command line argument
+
+    """
+    first, _, last = text.partition('-')
+
+    return list(range(int(first), int(last or first) + 1))
+
+
+def date_range(text):
+    """
+    Dates of a `2021-01-01:2021-02-15` command line argument, either end
+    may be omitted
+
+    """
+    start, _, end = text.partition(':')
+
+    return (date.fromisoformat(start) if start else None,
+            date.fromisoformat(end) if end else None)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Plan and sync a backfill of the NBA database')
+    parser.add_argument(
+        '--seasons', type=season_range,
+        help='season or range of seasons, e.g. 2019-2021, the seasons of '
+        '--dates or the latest season by default')
+    parser.add_argument(
+        '--dates', type=date_range, default=(None, None),
+        help='range of game dates, e.g. 2021-01-01:2021-02-15')
+    parser.add_argument(
+        '--datasets', nargs='+', choices=datasets, default=datasets,
+        help='tables to sync, all by default')
+    parser.add_argument(
+        '--teams', nargs='+', choices=sorted(set(team_abbr.values())),
+        metavar='TEAM', help='team abbreviations, e.g. LAL BOS')
+    parser.add_argument(
+        '--force', action='store_true',
+        help='sync tables already synced')
+    parser.add_argument(
+        '--dry-run', action='store_true',
+        help='print the plan without syncing it')
+    parser.add_argument('--fetch-workers', type=int, default=4)
+    parser.add_argument('--parse-workers', type=int)
+    parser.add_argument('--batch-size', type=int, default=25)
+    args = parser.parse_args()
+
+    start_date, end_date = args.dates
+
+    seasons = args.seasons
+    if seasons is None:
+        seasons = season_range(
+            f'{latest_season(start_date or end_date)}-'
+            f'{latest_season(end_date or start_date)}')
+
+    if args.dry_run:
+        conn = planning_database()
+    else:
+        conn = initialize_database.run()
+
+    plan = plan_backfill(
+        conn, seasons, start_date, end_date, args.datasets, args.teams,
+        args.force)
+    print(describe(plan))
+
+    if not args.dry_run:
+        synced = run_backfill(
+            conn, plan, args.fetch_workers, args.parse_workers,
+            args.batch_size)
+        prefect.context.get('logger').info(f'synced {len(synced)} games')
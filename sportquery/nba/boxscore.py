@@ -1,16 +1,16 @@
-import re
-
 import pandas as pd
-import requests
 from unidecode import unidecode
 
-from . import base_url
+from . import base_url, game_lifetime
+from ..extract import Document
+from ..fetch import get_page
 
 boxscore_dtypes = {
     'GAME_ID': 'str',
     'TEAM': 'str',
     'IS_HOME': 'bool',
     'PLAYER': 'str',
+    'PLAYER_ID': 'object',
     'MP': 'float',
     'FG': 'float',
     'FGA': 'float',
@@ -52,24 +52,28 @@ boxscore_dtypes = {
     'PTS_Q4': 'float'}
 
 
-def _parse_boxscore(html, table_name):
+def _parse_boxscore_table(doc, table_name):
     """
     Parse and return basic boxscore stats for the specified table name
 
     Args:
-        html (str): html page data to parse
+        doc (sportquery.extract.Document): parsed boxscore page
         table_name (str): boxscore table name
 
     Returns:
         pd.DataFrame: pandas dataframe of raw boxscore data
 
     """
-    df, = pd.read_html(html, attrs={'id': table_name})
+    df = doc.table(table_name)
 
     df.columns = df.columns.droplevel()
 
     df.rename({'Starters': 'PLAYER'}, axis=1, inplace=True)
 
+    # basketball-reference player id (e.g. 'jamesle01') from the player link
+    df['PLAYER_ID'] = doc.links(table_name).iloc[:, 0].str.extract(
+        r'/players/\w/(\w+)\.html', expand=False).values
+
     df['PLAYER'] = df.PLAYER.str.replace(
         'Team Totals', 'All').apply(lambda s: unidecode(s))
 
@@ -80,27 +84,37 @@ def _parse_boxscore(html, table_name):
     return df
 
 
-def get_boxscore(game_id):
+def boxscore_url(game_id):
     """
-    Team and player-level boxscore data for the specified `game_id`.
-    Players are distinguished by the `player` column.
-    Team level stats are listed under `player = 'All'`
+    Url of the boxscore page for the specified `game_id`
 
     Args:
         game_id (str): unique game identifier
 
     Returns:
-        pd.DataFrame: pandas dataframe of player and team-level boxscore stats
+        str: boxscore page url
 
     """
-    boxscore_url = f'{base_url}/boxscores/{game_id}.html'
+    return f'{base_url}/boxscores/{game_id}.html'
 
-    r = requests.get(boxscore_url)
 
-    html = re.sub('(<!--)|(-->)', '', r.text, flags=re.DOTALL)
+def parse_boxscore(text, game_id):
+    """
+    Parse team and player-level boxscore data from the raw html of the
+    boxscore page of `game_id`.
+
+    Args:
+        text (str): boxscore page html
+        game_id (str): unique game identifier
+
+    Returns:
+        pd.DataFrame: pandas dataframe of player and team-level boxscore stats
+
+    """
+    doc = Document(text)
 
     # parse home and away team abbreviations
-    df_line_score, = pd.read_html(html, attrs={'id': 'line_score'})
+    df_line_score = doc.table('line_score')
     df_scoring = df_line_score['Scoring']
     df_scoring = df_scoring[df_scoring.columns[:5]]
     df_scoring.columns = ['TEAM', 'PTS_Q1', 'PTS_Q2', 'PTS_Q3', 'PTS_Q4']
@@ -109,7 +123,7 @@ def get_boxscore(game_id):
 
     # parse basic boxscore stats
     df_bsc_home, df_bsc_away = [
-        _parse_boxscore(html, f'box-{team}-game-basic')
+        _parse_boxscore_table(doc, f'box-{team}-game-basic')
         for team in [team_home, team_away]]
 
     df_bsc_home.insert(0, 'TEAM', team_home)
@@ -123,7 +137,7 @@ def get_boxscore(game_id):
 
     # parse advanced boxscore stats
     df_adv_home, df_adv_away = [
-        _parse_boxscore(html, f'box-{team}-game-advanced')
+        _parse_boxscore_table(doc, f'box-{team}-game-advanced')
         for team in [team_home, team_away]]
 
     df_adv_home.insert(0, 'TEAM', team_home)
@@ -140,7 +154,7 @@ def get_boxscore(game_id):
 
     # merge dataframes
     df_box = df_bsc.merge(
-        df_adv, on=['TEAM', 'IS_HOME', 'PLAYER']
+        df_adv, on=['TEAM', 'IS_HOME', 'PLAYER', 'PLAYER_ID']
     ).merge(df_scoring, on=['TEAM', 'PLAYER'], how='left')
     df_box.insert(0, 'GAME_ID', game_id)
     df_box.columns = df_box.columns.str.replace('%', '_PERC').str.upper()
@@ -166,6 +180,25 @@ def get_boxscore(game_id):
     return df_box
 
 
+def get_boxscore(game_id):
+    """
+    Team and player-level boxscore data for the specified `game_id`.
+    Players are distinguished by the `player` column and identified by their
+    basketball-reference id in the `player_id` column.
+    Team level stats are listed under `player = 'All'`
+
+    Args:
+        game_id (str): unique game identifier
+
+    Returns:
+        pd.DataFrame: pandas dataframe of player and team-level boxscore stats
+
+    """
+    text = get_page(boxscore_url(game_id), **game_lifetime(game_id))
+
+    return parse_boxscore(text, game_id)
+
+
 if __name__ == '__main__':
 
     #df = get_boxscore('202008140TOR')
@@ -0,0 +1,116 @@
+from datetime import datetime
+import os
+
+import pandas as pd
+
+from . import latest_season
+from .. import cachedir
+from ..parquet import ParquetStore
+from .schema import boxscore, play_by_play, plus_minus, schedule
+
+parquet_dir = os.getenv('SPORTQUERY_PARQUET', cachedir / 'parquet/nba')
+parquet_store = ParquetStore(parquet_dir)
+
+# tables mirrored in the parquet store
+mirrored_tables = [schedule, boxscore, plus_minus, play_by_play]
+
+
+def game_dates(game_ids):
+    """
+    Unique dates (YYYYMMDD strings) of the games `game_ids`
+
+    Args:
+        game_ids (iterable of str): unique game identifiers
+
+    Returns:
+        list of str: sorted game dates
+
+    """
+    return sorted({game_id[:8] for game_id in game_ids})
+
+
+def missing_dates(conn):
+    """
+    Game dates stored in the database but missing from the parquet store,
+    e.g. every date on the first run. The schedule is checked against the
+    schedule table and game level tables against the sync ledger. Dates
+    exported without rows are recorded by the store and are not missing.
+
+    Args:
+        conn (sqlalchemy.engine.base.Engine): sqlalchemy engine connection
+
+    Returns:
+        list of str: sorted game dates
+
+    """
+    missing = set()
+
+    for table in mirrored_tables:
+        if table is schedule:
+            query = 'select distinct substr(game_id, 1, 8) from schedule'
+        else:
+            query = (
+                'select distinct substr(game_id, 1, 8) from sync_ledger '
+                f"where dataset = '{table.name}' and status = 'ok'")
+
+        stored = {
+            date.replace('-', '')
+            for _, date in parquet_store.partitions(table.name)}
+
+        missing |= set(pd.read_sql(query, conn).squeeze(axis=1)) - stored
+
+    return sorted(missing)
+
+
+def export_dates(conn, dates):
+    """
+    Rewrite the parquet partitions of every mirrored table for each of the
+    game `dates` from the rows currently in the database. Each date is read
+    with a range scan of the game_id primary key. Dates missing from the
+    schedule are filed under the season of the date.
+
+    Args:
+        conn (sqlalchemy.engine.base.Engine): sqlalchemy engine connection
+        dates (iterable of str): game dates (YYYYMMDD strings)
+
+    Returns:
+        None
+
+    """
+    for day in dates:
+        frames = {
+            table.name: pd.read_sql(
+                table.select().where(
+                    table.c.game_id.between(f'{day}0', f'{day}9')), conn)
+            for table in mirrored_tables}
+
+        date = datetime.strptime(day, '%Y%m%d').date()
+
+        seasons = frames[schedule.name].season.unique()
+        season = int(seasons[0]) if len(seasons) > 0 else latest_season(date)
+
+        for table in mirrored_tables:
+            parquet_store.write_partition(
+                table, season, date, frames[table.name])
+
+
+def read_table(name, columns=None, filters=None, memory_map=True):
+    """
+    Read a mirrored table from the parquet store. Columns are projected
+    and `filters` are pushed down to the partition directories (`season`
+    and `date`) and to the row group statistics of the files.
+
+    Args:
+        name (str): table name, e.g. 'play_by_play'
+        columns (list of str, optional): columns to read, all by default
+        filters (list of tuple, optional): row predicates in disjunctive
+            normal form, e.g. `[('season', '=', 2021), ('team_key', '=', 2)]`
+        memory_map (bool, optional): memory map the files instead of reading
+            them into memory
+
+    Returns:
+        pd.DataFrame: table contents
+
+    """
+    return parquet_store.read(
+        name, columns=columns, filters=filters, memory_map=memory_map)
@@ -0,0 +1,182 @@
+import threading
+
+import pandas as pd
+import sqlalchemy
+from sqlalchemy.dialects import postgresql, sqlite
+
+from . import team_abbr
+from .schema import players, teams
+from ..writer import to_records
+
+# player key of the boxscore rows holding team totals (player 'All')
+team_totals_key = 0
+
+
+class Dimension:
+    """
+    Integer surrogate keys of the members of a dimension table, each
+    identified by a natural key such as a basketball-reference player id.
+    Keys are cached in memory per database and members seen for the first
+    time are inserted, letting the database assign their keys.
+
+    Args:
+        table (sqlalchemy.Table): dimension table
+        natural (str): natural key column name
+        key (str): surrogate key column name
+
+    """
+    def __init__(self, table, natural, key):
+        self.table = table
+        self.natural = natural
+        self.key = key
+        self.cache = {}  # database url -> {natural key: surrogate key}
+        self.lock = threading.Lock()
+
+    def _load(self, conn):
+        """
+        Read the keys of all members from the database
+
+        """
+        rows = conn.execute(sqlalchemy.select(
+            self.table.c[self.natural], self.table.c[self.key])).fetchall()
+
+        keys = {natural: key for natural, key in rows if natural is not None}
+        self.cache[str(conn.engine.url)] = keys
+
+        return keys
+
+    def add(self, conn, members):
+        """
+        Insert members missing from the dimension table. Members already
+        present, possibly inserted concurrently by another process, are
+        left unchanged.
+
+        Args:
+            conn (sqlalchemy.engine.base.Engine): sqlalchemy engine connection
+            members (pd.DataFrame): natural key and attribute columns of the
+                members
+
+        """
+        if len(members) == 0:
+            return
+
+        dialect = conn.dialect.name
+        records = to_records(members)
+
+        with conn.begin() as transaction:
+            if dialect in ('sqlite', 'postgresql'):
+                insert = {'sqlite': sqlite, 'postgresql': postgresql}[
+                    dialect].insert(self.table).values(records)
+                transaction.execute(insert.on_conflict_do_nothing(
+                    index_elements=[self.natural]))
+            else:
+                transaction.execute(self.table.insert(), records)
+
+    def map(self, conn, values, attributes=None):
+        """
+        Surrogate keys of the natural keys `values`, adding unseen members
+        to the dimension table along with their `attributes`
+
+        Args:
+            conn (sqlalchemy.engine.base.Engine): sqlalchemy engine connection
+            values (pd.Series): natural key of each row
+            attributes (dict of pd.Series, optional): attribute columns of
+                the dimension table, aligned with `values`
+
+        Returns:
+            pd.Series: nullable integer surrogate key of each row, missing
+                where the natural key is missing
+
+        """
+        values = values.astype(object)
+        members = pd.DataFrame({self.natural: values, **(attributes or {})})
+        members = members[values.notna()].drop_duplicates(self.natural)
+
+        with self.lock:
+            keys = self.cache.get(str(conn.engine.url))
+
+            if keys is None or not members[self.natural].isin(keys).all():
+                keys = self._load(conn)
+                unseen = members[~members[self.natural].isin(keys)]
+
+                if len(unseen) > 0:
+                    self.add(conn, unseen)
+                    keys = self._load(conn)
+
+        return values.map(keys).astype('Int64')
+
+
+player_keys = Dimension(players, 'player_id', 'player_key')
+team_keys = Dimension(teams, 'team', 'team_key')
+
+
+def seed_dimensions(conn):
+    """
+    Add the known NBA teams and the pseudo player of the team totals rows
+    to the dimension tables
+
+    Args:
+        conn (sqlalchemy.engine.base.Engine): sqlalchemy engine connection
+
+    Returns:
+        None
+
+    """
+    team_keys.add(conn, pd.DataFrame(
+        [(abbr, name) for name, abbr in team_abbr.items()],
+        columns=['team', 'name']))
+
+    totals = conn.execute(sqlalchemy.select(players.c.player_key).where(
+        players.c.player_key == team_totals_key)).first()
+
+    if totals is None:
+        with conn.begin() as transaction:
+            transaction.execute(players.insert().values(
+                player_key=team_totals_key, player_id=None, name='All'))
+
+
+def resolve_keys(conn, tables):
+    """
+    Replace the natural identifiers of teams (abbreviations) and players
+    (basketball-reference ids) in parsed tables by their integer keys:
+    `team` and `opponent` become `team_key` and `opponent_key`, while
+    `player_id` and `other_player_id` become `player_key` and
+    `other_player_key`. Player names are moved to the players table.
+
+    Args:
+        conn (sqlalchemy.engine.base.Engine): sqlalchemy engine connection
+        tables (dict): pandas dataframes keyed by table name
+
+    Returns:
+        dict: pandas dataframes with integer keys keyed by table name
+
+    """
+    resolved = {}
+
+    for name, df in tables.items():
+        df = df.copy()
+
+        for column in ['team', 'opponent']:
+            if column in df:
+                df[column] = team_keys.map(conn, df[column])
+
+        if 'player_id' in df:
+            names = {'name': df.player} if 'player' in df else None
+            keys = player_keys.map(conn, df.player_id, names)
+
+            if 'player' in df:
+                keys = keys.mask(df.player == 'All', team_totals_key)
+
+            df['player_id'] = keys
+
+        if 'other_player_id' in df:
+            df['other_player_id'] = player_keys.map(conn, df.other_player_id)
+
+        resolved[name] = df.drop(columns='player', errors='ignore').rename(
+            columns={
+                'team': 'team_key',
+                'opponent': 'opponent_key',
+                'player_id': 'player_key',
+                'other_player_id': 'other_player_key'})
+
+    return resolved
@@ -0,0 +1,191 @@
+from contextlib import contextmanager
+from datetime import datetime
+import os
+
+from . import game_lifetime, latest_season
+from .boxscore import boxscore_url, parse_boxscore
+from .play_by_play import parse_play_by_play, play_by_play_url
+from .plus_minus import link_players, parse_plus_minus, plus_minus_url
+from .. import cachedir, metrics
+from ..archive import PageArchive, available
+from ..fetch import fetch_page
+
+# page url and parser of each game level table
+game_tables = {
+    'boxscore': (boxscore_url, parse_boxscore),
+    'plus_minus': (plus_minus_url, parse_plus_minus),
+    'play_by_play': (play_by_play_url, parse_play_by_play)}
+
+# game pages are also kept in an archive partitioned by season, from which
+# the game tables may be rebuilt offline (see `sportquery.nba.reparse`), if
+# zstandard is installed
+archive_dir = os.getenv('SPORTQUERY_ARCHIVE', cachedir / 'archive/nba')
+page_archive = PageArchive(archive_dir)
+archive_pages = available()
+
+# number of archived pages sampled to train the archive dictionary, which is
+# trained once the archive holds as many pages
+training_pages = 300
+
+
+def game_season(game_id):
+    """
+    Season of `game_id` according to its date, the archive partition of its
+    pages
+
+    Args:
+        game_id (str): unique game identifier
+
+    Returns:
+        int: NBA season year
+
+    """
+    return latest_season(datetime.strptime(game_id[:8], '%Y%m%d').date())
+
+
+def game_pages(datasets):
+    """
+    Pages needed to parse the game level `datasets`: the plus-minus table
+    also requires the boxscore, which identifies its players.
+
+    Args:
+        datasets (iterable of str): dataset (table) names
+
+    Returns:
+        list of str: dataset names of the pages, in `game_tables` order
+
+    """
+    datasets = set(datasets)
+    if 'plus_minus' in datasets:
+        datasets.add('boxscore')
+
+    return [table for table in game_tables if table in datasets]
+
+
+@contextmanager
+def _dataset(table):
+    """
+    Tag exceptions raised while handling the page of `table` with a
+    `dataset` attribute, which survives pickling by parse processes, so
+    that failures are recorded against the page which caused them
+
+    """
+    try:
+        yield
+    except Exception as exc:
+        exc.dataset = table
+        raise
+
+
+def fetch_game(game_id, datasets=tuple(game_tables)):
+    """
+    Download the boxscore, plus-minus and play-by-play pages of `game_id`
+    back to back over the shared connection pool, and archive the pages
+    which are not archived yet. Exceptions raised by a download carry the
+    table name of the page as their `dataset` attribute.
+
+    Args:
+        game_id (str): unique game identifier
+        datasets (iterable of str, optional): game level tables to fetch the
+            pages of (see `game_pages`), all by default
+
+    Returns:
+        dict: `sportquery.cache.CachedPage` of each page keyed by table name
+
+    """
+    lifetime = game_lifetime(game_id)
+    pages = {}
+
+    for table in game_pages(datasets):
+        page_url = game_tables[table][0]
+        with metrics.timer('fetch_seconds', dataset=table), _dataset(table):
+            pages[table] = fetch_page(page_url(game_id), **lifetime)
+
+    if archive_pages:
+        with metrics.timer('archive_seconds'):
+            for page in pages.values():
+                page_archive.put(game_season(game_id), page)
+
+    return pages
+
+
+def train_archive(sample_size=training_pages):
+    """
+    Train the compression dictionary of the page archive on a sample of the
+    archived pages, once the archive holds `sample_size` pages and has no
+    dictionary yet. Pages archived from then on are compressed with it,
+    while pages already archived are left as they are.
+
+    Args:
+        sample_size (int, optional): number of pages sampled
+
+    Returns:
+        int: dictionary id, None if no dictionary was trained
+
+    """
+    if not archive_pages or page_archive.trained():
+        return None
+
+    entries = [
+        (partition, entry['url'])
+        for partition in page_archive.partitions()
+        for entry in page_archive.entries(partition)]
+
+    if len(entries) < sample_size:
+        return None
+
+    step = len(entries) // sample_size
+    samples = [
+        page_archive.get(partition, url).text
+        for partition, url in entries[::step]]
+
+    return page_archive.train(samples)
+
+
+def parse_game(pages, game_id):
+    """
+    Parse the raw pages returned by `fetch_game`. Players of the plus-minus
+    table are identified by their basketball-reference id, looked up in the
+    boxscore. Exceptions carry the table name of the page which failed to
+    parse as their `dataset` attribute.
+
+    Args:
+        pages (dict): `sportquery.cache.CachedPage` of each page keyed by
+            table name
+        game_id (str): unique game identifier
+
+    Returns:
+        dict: pandas dataframe of each game level table keyed by table name
+
+    """
+    tables = {}
+
+    for table, page in pages.items():
+        with metrics.timer('parse_seconds', dataset=table), _dataset(table):
+            tables[table] = game_tables[table][1](page.text, game_id)
+
+    if 'boxscore' in tables and 'plus_minus' in tables:
+        with _dataset('plus_minus'):
+            tables['plus_minus'] = link_players(
+                tables['plus_minus'], tables['boxscore'])
+
+    return tables
+
+
+def get_game(game_id):
+    """
+    Boxscore, plus-minus and play-by-play data of the specified `game_id`
+
+    Args:
+        game_id (str): unique game identifier
+
+    Returns:
+        dict: pandas dataframe of each game level table keyed by table name
+
+    """
+    return parse_game(fetch_game(game_id), game_id)
+
+
+if __name__ == '__main__':
+    for table, df in get_game('202102090SAS').items():
+        print(table, df, sep='\n')
@@ -0,0 +1,328 @@
+from datetime import datetime, timedelta
+import hashlib
+
+import pandas as pd
+import requests
+
+from .game import game_tables, parse_game
+from ..client import retry_status_codes
+
+# The database functions import sqlalchemy when called, so that the parse
+# worker processes running `ingest_game` never load it.
+
+# Datasets failing to sync are retried after exponentially growing delays
+# and quarantined after `max_attempts` failures, until explicitly requeued.
+# Throttled requests, server errors and network errors are retried without
+# counting towards the quarantine.
+max_attempts = 5
+retry_delay = timedelta(hours=1)
+max_retry_delay = timedelta(days=1)
+
+
+def ledger_entries(pages, game_id, status='ok'):
+    """
+    Ledger rows recording the ingestion of each page of `game_id`: status,
+    fetch time, HTTP validators and a hash of the page content. Failures
+    recorded by earlier attempts are cleared.
+
+    Args:
+        pages (dict): `sportquery.cache.CachedPage` of each page keyed by
+            dataset (table) name
+        game_id (str): unique game identifier
+        status (str, optional): ingestion status
+
+    Returns:
+        pd.DataFrame: one `sync_ledger` row per page
+
+    """
+    return pd.DataFrame([{
+        'game_id': game_id,
+        'dataset': dataset,
+        'status': status,
+        'fetched_at': datetime.fromtimestamp(page.fetched_at),
+        'etag': page.etag,
+        'last_modified': page.last_modified,
+        'content_hash': hashlib.sha1(page.text.encode()).hexdigest(),
+        'error_count': 0,
+        'error': None,
+        'next_attempt': None
+    } for dataset, page in pages.items()])
+
+
+def ingest_game(pages, game_id, datasets=None):
+    """
+    Parse the pages of `game_id` into the rows to write for the game: each
+    game level table plus the ledger entries marking them as synced. Writing
+    both in one transaction keeps the ledger consistent with the data.
+
+    Args:
+        pages (dict): `sportquery.cache.CachedPage` of each page keyed by
+            dataset (table) name
+        game_id (str): unique game identifier
+        datasets (iterable of str, optional): tables to write, all parsed
+            tables by default. Pages fetched only to parse other tables,
+            e.g. the boxscore of the plus-minus table, are left out.
+
+    Returns:
+        dict: pandas dataframes keyed by table name
+
+    """
+    tables = parse_game(pages, game_id)
+
+    if datasets is not None:
+        tables = {
+            table: df for table, df in tables.items() if table in datasets}
+        pages = {
+            table: page for table, page in pages.items() if table in datasets}
+
+    tables['sync_ledger'] = ledger_entries(pages, game_id)
+
+    return tables
+
+
+def pending_game_ids(conn, datasets=tuple(game_tables)):
+    """
+    Completed games missing a successful ledger entry for any of `datasets`.
+    Each game is checked with an index lookup on the ledger primary key
+    rather than a scan of the fact tables. Quarantined games, and failed
+    games whose next attempt is not due yet, are skipped.
+
+    Args:
+        conn (sqlalchemy.engine.base.Engine): sqlalchemy engine connection
+        datasets (iterable of str, optional): dataset (table) names
+
+    Returns:
+        pd.Series: unique identifiers of games to sync
+
+    """
+    missing = ' or '.join(
+        f"not exists (select 1 from sync_ledger l where "
+        f"l.game_id = s.game_id and l.dataset = '{dataset}' "
+        f"and l.status = 'ok')"
+        for dataset in datasets)
+
+    import sqlalchemy
+
+    blocked = (
+        'exists (select 1 from sync_ledger l where l.game_id = s.game_id '
+        "and (l.status = 'quarantined' or "
+        "(l.status = 'error' and l.next_attempt > :now)))")
+
+    return pd.read_sql(
+        sqlalchemy.text(
+            'select distinct s.game_id from schedule s '
+            f'where s.outcome is not null and ({missing}) '
+            f'and not {blocked} '
+            'order by s.game_id'),
+        conn, params={'now': datetime.now()}
+    ).game_id
+
+
+def error_count(conn, game_id, datasets=tuple(game_tables)):
+    """
+    Number of failed attempts to sync `datasets` of `game_id` recorded in
+    the ledger, the largest count of any of the datasets
+
+    Args:
+        conn (sqlalchemy.engine.base.Engine): sqlalchemy engine connection
+        game_id (str): unique game identifier
+        datasets (iterable of str, optional): dataset (table) names
+
+    Returns:
+        int: number of failed attempts
+
+    """
+    import sqlalchemy
+
+    from .schema import sync_ledger
+
+    count = conn.execute(
+        sqlalchemy.select(sqlalchemy.func.max(sync_ledger.c.error_count))
+        .where(sync_ledger.c.game_id == game_id)
+        .where(sync_ledger.c.dataset.in_(list(datasets)))).scalar()
+
+    return count or 0
+
+
+def failed_datasets(exc, datasets=tuple(game_tables)):
+    """
+    Datasets whose page failed to download or parse, according to the
+    `dataset` attribute set on exceptions by `fetch_game` and `parse_game`.
+    Failures which are not tied to a page are blamed on all `datasets`.
+
+    Args:
+        exc (Exception): exception raised while fetching or parsing
+        datasets (iterable of str, optional): datasets of the failed attempt
+
+    Returns:
+        list of str: dataset (table) names
+
+    """
+    dataset = getattr(exc, 'dataset', None)
+
+    return [dataset] if dataset in datasets else list(datasets)
+
+
+def is_transient(exc):
+    """
+    Whether `exc` is a throttled request, a server error or a network error,
+    which are expected to go away when retried later
+
+    Args:
+        exc (Exception): exception raised while fetching or parsing
+
+    Returns:
+        bool: True for transient errors
+
+    """
+    if isinstance(exc, requests.HTTPError):
+        status = getattr(exc.response, 'status_code', None)
+        return status in retry_status_codes
+
+    return isinstance(exc, (requests.ConnectionError, requests.Timeout))
+
+
+def failure_entries(game_id, exc, previous_errors=0,
+                    datasets=tuple(game_tables)):
+    """
+    Ledger rows recording a failed attempt to sync `datasets` of `game_id`,
+    with the exception raised and the time of the next attempt. The
+    datasets are quarantined once they have failed `max_attempts` times;
+    transient errors (see `is_transient`) are not counted.
+
+    Args:
+        game_id (str): unique game identifier
+        exc (Exception): exception raised while fetching or parsing
+        previous_errors (int, optional): number of earlier failed attempts
+        datasets (iterable of str, optional): datasets which failed (see
+            `failed_datasets`)
+
+    Returns:
+        pd.DataFrame: one `sync_ledger` row per dataset
+
+    """
+    attempts = previous_errors + (0 if is_transient(exc) else 1)
+    quarantined = attempts >= max_attempts
+    delay = min(retry_delay * 2**max(attempts - 1, 0), max_retry_delay)
+
+    return pd.DataFrame([{
+        'game_id': game_id,
+        'dataset': dataset,
+        'status': 'quarantined' if quarantined else 'error',
+        'fetched_at': None,
+        'etag': None,
+        'last_modified': None,
+        'content_hash': None,
+        'error_count': attempts,
+        'error': f'{type(exc).__name__}: {exc}'[:2000],
+        'next_attempt': None if quarantined else datetime.now() + delay
+    } for dataset in datasets])
+
+
+def failed_games(conn):
+    """
+    Games whose last sync attempt failed, with their status ('error' or
+    'quarantined'), number of failed attempts, time of the next attempt and
+    last error message
+
+    Args:
+        conn (sqlalchemy.engine.base.Engine): sqlalchemy engine connection
+
+    Returns:
+        pd.DataFrame: one row per failed game
+
+    """
+    import sqlalchemy
+
+    from .schema import sync_ledger
+
+    query = (
+        sqlalchemy.select(
+            sync_ledger.c.game_id, sync_ledger.c.status,
+            sync_ledger.c.error_count, sync_ledger.c.next_attempt,
+            sync_ledger.c.error)
+        .where(sync_ledger.c.status.in_(['error', 'quarantined']))
+        .order_by(sync_ledger.c.game_id))
+
+    return pd.read_sql(query, conn).drop_duplicates('game_id').reset_index(
+        drop=True)
+
+
+def requeue(conn, game_ids=None):
+    """
+    Clear the failed attempts of quarantined or failed games so that the
+    next sync retries them immediately
+
+    Args:
+        conn (sqlalchemy.engine.base.Engine): sqlalchemy engine connection
+        game_ids (list of str, optional): games to requeue, all failed games
+            by default
+
+    Returns:
+        int: number of ledger rows cleared
+
+    """
+    from .schema import sync_ledger
+
+    delete = sync_ledger.delete().where(
+        sync_ledger.c.status.in_(['error', 'quarantined']))
+
+    if game_ids is not None:
+        delete = delete.where(sync_ledger.c.game_id.in_(list(game_ids)))
+
+    with conn.begin() as transaction:
+        return transaction.execute(delete).rowcount
+
+
+def upgrade_ledger(conn):
+    """
+    Add the ledger columns missing from databases created by earlier
+    versions
+
+    Args:
+        conn (sqlalchemy.engine.base.Engine): sqlalchemy engine connection
+
+    Returns:
+        None
+
+    """
+    import sqlalchemy
+
+    from .schema import sync_ledger
+
+    existing = {
+        column['name']
+        for column in sqlalchemy.inspect(conn).get_columns(sync_ledger.name)}
+
+    with conn.begin() as transaction:
+        for column in sync_ledger.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=conn.dialect)
+                transaction.execute(
+                    f'alter table {sync_ledger.name} '
+                    f'add column {column.name} {column_type}')
+
+
+def backfill_ledger(conn):
+    """
+    Record games already present in the fact tables of a database created
+    before the ledger existed. Runs a one-off scan per table and is a no-op
+    once the ledger holds any rows.
+
+    Args:
+        conn (sqlalchemy.engine.base.Engine): sqlalchemy engine connection
+
+    Returns:
+        None
+
+    """
+    if pd.read_sql('select count(*) from sync_ledger', conn).squeeze() > 0:
+        return
+
+    with conn.begin() as transaction:
+        for dataset in game_tables:
+            transaction.execute(
+                'insert into sync_ledger (game_id, dataset, status, '
+                'error_count) '
+                f"select distinct game_id, '{dataset}', 'ok', 0 "
+                f'from {dataset}')
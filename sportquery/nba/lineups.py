@@ -0,0 +1,322 @@
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+
+import numpy as np
+import pandas as pd
+
+from .schema import boxscore, play_by_play, plus_minus, schedule
+from ..storage import get_engine
+
+# plus-minus intervals are measured in pixels and each player row is scaled
+# to 48 minutes separately, so the times at which players are substituted
+# together only agree to within a few seconds: interval boundaries closer
+# than `tolerance` minutes are merged
+tolerance = 0.1
+
+# number of players of each team on court
+lineup_size = 5
+
+player_columns = [f'player_key_{i + 1}' for i in range(lineup_size)]
+
+
+def _boundaries(group, times, tolerance):
+    """
+    Merge interval endpoints into sorted boundaries. Endpoints of the same
+    group closer than `tolerance` to their predecessor are assigned to the
+    same boundary, whose time is the mean of its endpoints, except for the
+    first and last boundary of each group which keep the extreme times.
+
+    Args:
+        group (np.ndarray): integer group of each endpoint
+        times (np.ndarray): time of each endpoint
+
+    Returns:
+        tuple: boundary index of each endpoint, and the group and time of
+            each boundary, sorted by group and time
+
+    """
+    order = np.lexsort((times, group))
+    group, times = group[order], times[order]
+
+    new = np.ones(len(times), dtype=bool)
+    new[1:] = (group[1:] != group[:-1]) | (np.diff(times) > tolerance)
+    cluster = np.cumsum(new) - 1
+
+    counts = np.bincount(cluster)
+    boundary_group = group[new]
+    boundary_time = np.bincount(cluster, weights=times) / counts
+
+    first = np.ones(len(counts), dtype=bool)
+    first[1:] = boundary_group[1:] != boundary_group[:-1]
+    last = np.roll(first, -1)
+    boundary_time[first] = times[new][first]
+    boundary_time[last] = times[np.cumsum(counts)[last] - 1]
+
+    index = np.empty(len(order), dtype=int)
+    index[order] = cluster
+
+    return index, boundary_group, boundary_time
+
+
+def _boundary_net(boundary_group, lo, hi, points):
+    """
+    Net points scored since the start of the game at each boundary. An
+    interval from boundary `lo` to boundary `hi` with `points` net points
+    fixes the net points at either end once the other end is known; the
+    known boundaries spread from the first boundary of each group, all
+    groups advancing together at each step.
+
+    Returns:
+        np.ndarray: net points at each boundary, NaN where undetermined
+
+    """
+    net = np.full(len(boundary_group), np.nan)
+    first = np.ones(len(boundary_group), dtype=bool)
+    first[1:] = boundary_group[1:] != boundary_group[:-1]
+    net[first] = 0
+
+    known = ~np.isnan(points)
+    lo, hi, points = lo[known], hi[known], points[known]
+
+    while True:
+        forward = ~np.isnan(net[lo]) & np.isnan(net[hi])
+        backward = np.isnan(net[lo]) & ~np.isnan(net[hi])
+        if not (forward.any() or backward.any()):
+            return net
+
+        net[hi[forward]] = net[lo[forward]] + points[forward]
+        net[lo[backward]] = net[hi[backward]] - points[backward]
+
+
+def _align_plays(stints, plays):
+    """
+    Add the game time and the points scored by each team during each stint,
+    read from the running score of the play-by-play. Stint minutes are on
+    the 48 minutes scale of the plus-minus page and are stretched to the
+    length of games with overtime periods.
+
+    """
+    plays = plays.sort_values(['game_id', 'elapsed', 'play_number'])
+
+    # codes in game id order, so that the codes of the sorted plays ascend
+    # even for games with plays but no stints
+    game_ids = pd.concat([stints.game_id, plays.game_id]).astype(object)
+    codes, _ = pd.factorize(game_ids, sort=True)
+    stint_game = codes[:len(stints)]
+    play_game = codes[len(stints):]
+
+    # 48 minutes plus 5 minutes per overtime period
+    periods = np.maximum(
+        plays.groupby(play_game).quarter.max().reindex(
+            np.arange(codes.max(initial=-1) + 1)).fillna(4).values, 4)
+    length = 2880 + 300 * (periods - 4)
+
+    scale = length[stint_game] / 48.
+    start = stints.start_minute.values * scale
+    end = stints.end_minute.values * scale
+
+    # plays are located by a single search on (game, elapsed) keys, events
+    # at a stint boundary are credited to the stint ending there
+    span = int(length.max(initial=0)) + 1
+    keys = play_game * span + plays.elapsed.values
+
+    def score(seconds):
+        index = np.searchsorted(
+            keys, stint_game * span + np.floor(seconds), side='right') - 1
+        valid = (index >= 0) & (play_game[np.maximum(index, 0)] == stint_game)
+        index = np.maximum(index, 0)
+        away = np.where(valid, plays.score_away.values[index], 0)
+        home = np.where(valid, plays.score_home.values[index], 0)
+        return away.astype(int), home.astype(int)
+
+    start_away, start_home = score(start)
+    end_away, end_home = score(end)
+    away = end_away - start_away
+    home = end_home - start_home
+    is_home = stints.is_home.values.astype(bool)
+
+    return stints.assign(
+        start_elapsed=start,
+        end_elapsed=end,
+        points_for=np.where(is_home, home, away),
+        points_against=np.where(is_home, away, home))
+
+
+def lineup_stints(intervals, plays=None, tolerance=tolerance):
+    """
+    Sweep the plus-minus intervals of each team to find the five-man units
+    on court and the net points scored by each unit. Interval endpoints are
+    merged into one sorted boundary array per game and team, every interval
+    is expanded to the segments between its boundaries with array
+    arithmetic, and consecutive segments with the same five players become
+    one stint. No pairwise join is performed, so memory grows linearly with
+    the number of intervals and many games are processed at once.
+
+    Segments where the intervals do not place exactly five players of a
+    team on court, which happens when players are missing from the
+    boxscore, are dropped.
+
+    Args:
+        intervals (pd.DataFrame): plus-minus rows with columns `game_id`,
+            `team_key`, `player_key`, `subin_minute`, `subout_minute` and
+            `plus_minus`, plus `is_home` if `plays` is given
+        plays (pd.DataFrame, optional): play-by-play rows of the same games
+            with columns `game_id`, `play_number`, `quarter`, `elapsed`,
+            `score_away` and `score_home`, adding the game time
+            (`start_elapsed`, `end_elapsed` in seconds) and the points of
+            each team (`points_for`, `points_against`) of each stint
+        tolerance (float, optional): minutes within which substitutions are
+            considered simultaneous
+
+    Returns:
+        pd.DataFrame: one row per stint with the game, team, stint number,
+            start and end minute, player keys in ascending order and net
+            points (`plus_minus`, NaN where the intervals do not determine
+            it), in game and time order
+
+    """
+    columns = ['game_id', 'team_key'] + (
+        ['is_home'] if 'is_home' in intervals else [])
+
+    teams = intervals[columns].drop_duplicates(['game_id', 'team_key'])
+    teams = teams.sort_values(['game_id', 'team_key']).reset_index(drop=True)
+    group = pd.MultiIndex.from_frame(intervals[['game_id', 'team_key']])
+    group = pd.MultiIndex.from_frame(teams[['game_id', 'team_key']]
+                                     ).get_indexer(group)
+
+    n = len(intervals)
+    index, boundary_group, boundary_time = _boundaries(
+        np.concatenate([group, group]),
+        np.concatenate([intervals.subin_minute.values,
+                        intervals.subout_minute.values]).astype(float),
+        tolerance)
+    lo, hi = index[:n], index[n:]
+
+    # segment i lies between boundaries i and i + 1, each interval covers
+    # segments lo to hi - 1
+    counts = np.maximum(hi - lo, 0)
+    offsets = np.cumsum(counts) - counts
+    segment = (np.arange(counts.sum()) - np.repeat(offsets, counts) +
+               np.repeat(lo, counts))
+    player = np.repeat(intervals.player_key.values.astype(np.int64), counts)
+
+    order = np.lexsort((player, segment))
+    segment, player = segment[order], player[order]
+
+    sizes = np.bincount(segment, minlength=len(boundary_group))
+    full = np.flatnonzero(sizes == lineup_size)
+    lineups = player[sizes[segment] == lineup_size].reshape(-1, lineup_size)
+
+    net = _boundary_net(
+        boundary_group, lo, hi, intervals.plus_minus.values.astype(float))
+
+    # merge consecutive segments of the same unit
+    new = np.ones(len(full), dtype=bool)
+    new[1:] = ((full[1:] != full[:-1] + 1) |
+               (boundary_group[full[1:]] != boundary_group[full[:-1]]) |
+               (lineups[1:] != lineups[:-1]).any(axis=1))
+    first = np.flatnonzero(new)
+    last = np.append(first[1:], len(full))[:len(first)] - 1
+    start, end = full[first], full[last] + 1
+    stint_group = boundary_group[start]
+
+    stint_number = np.arange(len(first)) - np.searchsorted(
+        stint_group, stint_group)
+
+    stints = pd.concat([
+        teams.iloc[stint_group].reset_index(drop=True),
+        pd.DataFrame({
+            'stint': stint_number + 1,
+            'start_minute': boundary_time[start],
+            'end_minute': boundary_time[end],
+            **dict(zip(player_columns, lineups[first].T)),
+            'plus_minus': net[end] - net[start]})], axis=1)
+
+    if plays is not None:
+        stints = _align_plays(stints, plays)
+
+    return stints
+
+
+def _read_season(conn, season, with_plays):
+    """
+    Read the plus-minus intervals, with the team of each player, and
+    optionally the play-by-play of the games of `season`
+
+    """
+    import sqlalchemy
+
+    games = (
+        sqlalchemy.select(schedule.c.game_id)
+        .where(schedule.c.season == season)
+        .scalar_subquery())
+
+    query = (
+        sqlalchemy.select(plus_minus, boxscore.c.team_key, boxscore.c.is_home)
+        .select_from(plus_minus.join(boxscore, sqlalchemy.and_(
+            plus_minus.c.game_id == boxscore.c.game_id,
+            plus_minus.c.player_key == boxscore.c.player_key)))
+        .where(plus_minus.c.game_id.in_(games)))
+
+    intervals = pd.read_sql(query, conn)
+
+    plays = None
+    if with_plays:
+        plays = pd.read_sql(
+            sqlalchemy.select(
+                play_by_play.c.game_id, play_by_play.c.play_number,
+                play_by_play.c.quarter, play_by_play.c.elapsed,
+                play_by_play.c.score_away, play_by_play.c.score_home)
+            .where(play_by_play.c.game_id.in_(games)), conn)
+
+    return intervals, plays
+
+
+def season_lineups(season, with_plays=False, workers=1, chunk_size=100,
+                   tolerance=tolerance, conn=None):
+    """
+    Lineup stints of all synced games of `season` (see `lineup_stints`).
+    Games are processed in chunks of `chunk_size`, in parallel worker
+    processes if `workers` is greater than one.
+
+    Args:
+        season (int): NBA season year
+        with_plays (bool, optional): align stints with the play-by-play
+        workers (int, optional): number of worker processes, None for the
+            number of cpus
+        chunk_size (int, optional): number of games per chunk
+        tolerance (float, optional): minutes within which substitutions are
+            considered simultaneous
+        conn (sqlalchemy.engine.base.Engine, optional): sqlalchemy engine
+
+    Returns:
+        pd.DataFrame: one row per stint, in game and time order
+
+    """
+    conn = conn if conn is not None else get_engine('nba')
+    workers = workers or os.cpu_count()
+
+    intervals, plays = _read_season(conn, season, with_plays)
+
+    game_ids = np.sort(intervals.game_id.unique())
+    chunks = []
+    for i in range(0, len(game_ids), chunk_size):
+        chunk = game_ids[i:i + chunk_size]
+        chunks.append((
+            intervals[intervals.game_id.isin(chunk)],
+            None if plays is None else plays[plays.game_id.isin(chunk)],
+            tolerance))
+
+    if workers > 1 and len(chunks) > 1:
+        # spawn rather than fork, the caller may be multithreaded
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(workers, mp_context=context) as pool:
+            results = list(pool.map(lineup_stints, *zip(*chunks)))
+    else:
+        results = [lineup_stints(*chunk) for chunk in chunks]
+
+    if not results:
+        return lineup_stints(intervals, plays, tolerance)
+
+    return pd.concat(results, ignore_index=True)
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import hashlib
+import threading
+import time
+
+import pandas as pd
+import prefect
+import sqlalchemy
+
+from . import schedule_timezone
+from .dimensions import resolve_keys
+from .play_by_play import parse_new_plays, play_by_play_url, start_position
+from .schema import metadata, play_by_play, schedule
+from .. import metrics
+from ..fetch import fetch_page
+from ..storage import get_engine
+from ..writer import BulkWriter
+
+# seconds between polls of the play-by-play page of each live game
+poll_interval = 10
+
+# games are watched from tipoff until their final period ends, or at most
+# `max_game_length` after tipoff
+max_game_length = timedelta(hours=4)
+
+# description of the last play of a game's final period, e.g. 'End of 4th
+# quarter' or 'End of 2nd overtime', matched regardless of case
+final_period = r'^End of (?:4th quarter|\d+\w* overtime)'
+
+
+def live_game_ids(conn, now=None):
+    """
+    Games of the schedule table which have tipped off but have no outcome
+    yet, i.e. games in progress. Tipoff times are stored in eastern time,
+    the reference time is converted to it.
+
+    Args:
+        conn (sqlalchemy.engine.base.Engine): sqlalchemy engine connection
+        now (datetime.datetime, optional): reference time, now by default;
+            naive times are taken as local time
+
+    Returns:
+        list of str: unique game identifiers
+
+    """
+    now = (now or datetime.now()).astimezone(schedule_timezone).replace(
+        tzinfo=None)
+
+    query = (
+        sqlalchemy.select(schedule.c.game_id).distinct()
+        .where(schedule.c.outcome.is_(None))
+        .where(schedule.c.datetime <= now)
+        .where(schedule.c.datetime > now - max_game_length)
+        .order_by(schedule.c.game_id))
+
+    return pd.read_sql(query, conn).game_id.tolist()
+
+
+def is_final(plays):
+    """
+    Whether the last play of `plays` ends the game: the end of the fourth
+    quarter or of an overtime period with the teams not tied
+
+    """
+    if len(plays) == 0:
+        return False
+
+    last = plays.iloc[-1]
+
+    return bool(
+        pd.Series([last.event]).str.contains(final_period, case=False)[0]
+        and last.score_away != last.score_home)
+
+
+class LiveMonitor:
+    """
+    Poll the play-by-play pages of games in progress and append their new
+    plays to the play_by_play table.
+
+    Each page is revalidated with a conditional request every `interval`
+    seconds. Pages which changed are parsed from the last row read (see
+    `parse_new_plays`), and the new plays are written to the database and
+    passed to the subscribed listeners. Plays already stored when a game
+    is first polled, e.g. by a monitor which was restarted, are skipped.
+    The pages of finished games are synced again by the regular workflow,
+    which replaces the live rows and records the games in the sync ledger.
+
+    Args:
+        conn (sqlalchemy.engine.base.Engine, optional): sqlalchemy engine
+        interval (float, optional): seconds between polls of each game
+        fetch_workers (int, optional): number of pages fetched concurrently
+        write (bool, optional): append the new plays to the database
+
+    """
+    def __init__(self, conn=None, interval=poll_interval, fetch_workers=4,
+                 write=True):
+        self.conn = conn if conn is not None else get_engine('nba')
+        self.interval = interval
+        self.fetch_workers = fetch_workers
+        self.write = write
+        self.listeners = []
+        self.positions = {}  # game_id -> position of the last play read
+        self.hashes = {}  # game_id -> hash of the last parsed page
+        self.finished = set()
+        self.stopped = threading.Event()
+
+    def subscribe(self, listener):
+        """
+        Register a callable receiving the game id and a dataframe of the new
+        plays (see `parse_play_by_play`) of each update. May be used as a
+        decorator.
+
+        Args:
+            listener (callable): function of a game id and new plays
+
+        Returns:
+            callable: the listener
+
+        """
+        self.listeners.append(listener)
+
+        return listener
+
+    def _stored_plays(self, game_id):
+        """
+        Number of plays of `game_id` already in the database, so a restarted
+        monitor resumes after them
+
+        """
+        count = self.conn.execute(
+            sqlalchemy.select(sqlalchemy.func.count())
+            .where(play_by_play.c.game_id == game_id)).scalar()
+
+        return count or 0
+
+    def _fetch(self, game_id):
+        """
+        Revalidate the play-by-play page of `game_id`
+
+        """
+        with metrics.timer('fetch_seconds', dataset='live_play_by_play'):
+            return fetch_page(play_by_play_url(game_id), ttl=0)
+
+    def new_plays(self, game_id, page):
+        """
+        Plays of `page` after the last play read from the page of `game_id`
+
+        Args:
+            game_id (str): unique game identifier
+            page (sportquery.cache.CachedPage): play-by-play page
+
+        Returns:
+            pd.DataFrame: new plays, None if the page did not change
+
+        """
+        content_hash = hashlib.sha1(page.text.encode()).hexdigest()
+        if self.hashes.get(game_id) == content_hash:
+            return None
+        self.hashes[game_id] = content_hash
+
+        first_poll = game_id not in self.positions
+        position = self.positions.get(game_id, start_position)
+
+        with metrics.timer('parse_seconds', dataset='live_play_by_play'):
+            plays, self.positions[game_id] = parse_new_plays(
+                page.text, game_id, position)
+
+        if first_poll:
+            plays = plays[plays.play_number >= self._stored_plays(game_id)]
+
+        # the last play is only the end of the game once its final period
+        # is over
+        if is_final(plays):
+            self.finished.add(game_id)
+        else:
+            plays = plays.assign(end_game=0)
+
+        return plays
+
+    def poll(self, game_ids):
+        """
+        Fetch the pages of `game_ids` concurrently, append their new plays
+        in one transaction and notify the listeners
+
+        Args:
+            game_ids (list of str): unique game identifiers
+
+        Returns:
+            dict: new plays keyed by game id, for the games with new plays
+
+        """
+        # the prefect context, and its logger, is not shared with the thread
+        # running the monitor
+        logger = prefect.utilities.logging.get_logger()
+
+        updates = {}
+
+        with ThreadPoolExecutor(self.fetch_workers) as pool:
+            futures = [
+                pool.submit(self._fetch, game_id) for game_id in game_ids]
+
+            for game_id, future in zip(game_ids, futures):
+                try:
+                    page = future.result()
+                except Exception as exc:
+                    logger.warning(f'failed to poll {game_id}: {exc}')
+                    continue
+
+                plays = self.new_plays(game_id, page)
+                if plays is not None and len(plays) > 0:
+                    updates[game_id] = plays
+
+        if self.write and updates:
+            with BulkWriter(self.conn, metadata, upsert=True) as writer:
+                writer.add(resolve_keys(self.conn, {
+                    play_by_play.name: pd.concat(
+                        updates.values(), ignore_index=True)}))
+
+        for game_id, plays in updates.items():
+            logger.info(f'{len(plays)} new plays in {game_id}')
+            metrics.inc('live_plays_total', len(plays))
+            for listener in self.listeners:
+                listener(game_id, plays)
+
+        return updates
+
+    def run(self, game_ids=None):
+        """
+        Poll until `stop` is called, or until every game being watched has
+        finished. Without `game_ids`, the games in progress are looked up in
+        the schedule table before each poll, so games tipping off later are
+        picked up.
+
+        Args:
+            game_ids (list of str, optional): games to watch
+
+        """
+        while not self.stopped.is_set():
+            start = time.monotonic()
+
+            watched = game_ids or live_game_ids(self.conn)
+            watched = [
+                game_id for game_id in watched
+                if game_id not in self.finished]
+
+            if game_ids is not None and not watched:
+                return
+
+            if watched:
+                self.poll(watched)
+
+            self.stopped.wait(
+                max(self.interval - (time.monotonic() - start), 0))
+
+    def stop(self):
+        """
+        Stop `run` after the current poll
+
+        """
+        self.stopped.set()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Append the plays of NBA games in progress')
+    parser.add_argument(
+        'game_ids', nargs='*',
+        help='games to watch, the games in progress by default')
+    parser.add_argument(
+        '--interval', type=float, default=poll_interval,
+        help='seconds between polls of each game')
+    args = parser.parse_args()
+
+    monitor = LiveMonitor(interval=args.interval)
+
+    @monitor.subscribe
+    def show(game_id, plays):
+        for play in plays.itertuples():
+            print(f'{game_id} Q{play.quarter} {play.score_away}-'
+                  f'{play.score_home} {play.event}')
+
+    try:
+        monitor.run(args.game_ids or None)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+import argparse
+
+import pandas as pd
+import sqlalchemy
+
+from .dimensions import resolve_keys, seed_dimensions
+from .game import game_tables
+from .schema import metadata, players, sync_ledger, teams
+from ..storage import get_engine
+from ..writer import BulkWriter
+
+# columns of earlier layouts holding team abbreviations, which are replaced
+# by the keys of the teams table (see `resolve_keys`). Earlier player ids
+# come without the player names, so rows keyed by players are synced again.
+natural_columns = {'team': 'team_key', 'opponent': 'opponent_key'}
+
+# tables whose missing columns are added in place by `initialize_database`
+upgraded_tables = {sync_ledger.name}
+
+
+def outdated_tables(conn):
+    """
+    Tables of the database created by an earlier version of the schema, i.e.
+    whose primary key differs from the current one or which lack some of the
+    current columns. `metadata.create_all` leaves existing tables untouched,
+    so their layout has to be migrated.
+
+    Args:
+        conn (sqlalchemy.engine.base.Engine): sqlalchemy engine connection
+
+    Returns:
+        list of sqlalchemy.Table: current definition of each outdated table
+
+    """
+    inspector = sqlalchemy.inspect(conn)
+    existing = set(inspector.get_table_names())
+
+    outdated = []
+    for table in metadata.sorted_tables:
+        if table.name not in existing:
+            continue
+
+        key = inspector.get_pk_constraint(table.name)['constrained_columns']
+        columns = {
+            column['name'] for column in inspector.get_columns(table.name)}
+
+        if sorted(key) != sorted(column.name for column in table.primary_key):
+            outdated.append(table)
+        elif table.name not in upgraded_tables and not columns.issuperset(
+                table.columns.keys()):
+            outdated.append(table)
+
+    return outdated
+
+
+def check_schema(conn):
+    """
+    Refuse to use a database whose tables have an outdated layout, which
+    the sync would fail to write to
+
+    Args:
+        conn (sqlalchemy.engine.base.Engine): sqlalchemy engine connection
+
+    Raises:
+        RuntimeError: if any table is outdated
+
+    """
+    outdated = outdated_tables(conn)
+
+    if outdated:
+        names = ', '.join(table.name for table in outdated)
+        raise RuntimeError(
+            f'the tables {names} of {conn.url} were created by an earlier '
+            'version of sportquery, migrate them with '
+            '`python -m sportquery.nba.migrate` before syncing')
+
+
+def _quote(conn, name):
+    """
+    Quoted identifier `name`, e.g. of the boxscore column '3p'
+
+    """
+    return conn.dialect.identifier_preparer.quote(name)
+
+
+def _replace(conn, table, transaction):
+    """
+    Rename `table` to legacy_<name> and create it again with its current
+    layout, inside an open transaction
+
+    """
+    inspector = sqlalchemy.inspect(conn)
+
+    # index names are unique per database, the new table reuses them
+    for index in inspector.get_indexes(table.name):
+        transaction.execute(f'drop index {_quote(conn, index["name"])}')
+
+    transaction.execute(
+        f'alter table {table.name} rename to legacy_{table.name}')
+    table.create(transaction)
+
+
+def _converted(conn, table, df):
+    """
+    Rows `df` of an earlier layout of `table` converted to its current
+    layout: team abbreviations are replaced by integer keys, rows with a
+    missing key are dropped and only the last row of each key is kept
+
+    """
+    key = [column.name for column in table.primary_key]
+
+    df = resolve_keys(conn, {table.name: df})[table.name]
+    df = df[table.columns.keys()].dropna(subset=key)
+
+    for column in table.columns:
+        if isinstance(column.type, sqlalchemy.types.DateTime):
+            df[column.name] = pd.to_datetime(df[column.name])
+
+    return df.drop_duplicates(key, keep='last')
+
+
+def rebuild_table(conn, table, chunksize=100000):
+    """
+    Recreate `table` with its current primary key, columns and indexes and
+    copy the rows of the existing table. Rows sharing a primary key are
+    deduplicated, keeping the row inserted last, and rows with a missing key
+    are dropped. Team abbreviations of earlier layouts are replaced by the
+    keys of the teams table.
+
+    Rows from which the current columns cannot be derived, e.g. play-by-play
+    rows predating the compact layout or rows keyed by player names, are
+    kept in a legacy_<name> table and their ledger entries are cleared, so
+    the next sync scrapes the games again from the page cache.
+
+    Tables of earlier layouts were only created by versions predating
+    `SPORTQUERY_DB`, when the database was always sqlite.
+
+    Args:
+        conn (sqlalchemy.engine.base.Engine): sqlalchemy engine connection
+        table (sqlalchemy.Table): current definition of the table
+        chunksize (int, optional): number of rows converted at a time
+
+    Returns:
+        int: number of rows copied, None if the rows were set aside
+
+    """
+    if conn.dialect.name != 'sqlite':
+        raise RuntimeError(
+            f'{table.name} can only be migrated on sqlite databases')
+
+    inspector = sqlalchemy.inspect(conn)
+    legacy = f'legacy_{table.name}'
+
+    if inspector.has_table(legacy):
+        raise RuntimeError(
+            f'{legacy} is left from an earlier migration, drop it first')
+
+    existing = {column['name'] for column in inspector.get_columns(table.name)}
+    available = {natural_columns.get(name, name) for name in existing}
+
+    if not available.issuperset(table.columns.keys()):
+        with conn.begin() as transaction:
+            _replace(conn, table, transaction)
+
+            if (table.name in game_tables
+                    and inspector.has_table(sync_ledger.name)):
+                transaction.execute(sync_ledger.delete().where(
+                    sync_ledger.c.dataset == table.name))
+
+        return None
+
+    if existing.issuperset(table.columns.keys()):
+        columns = ', '.join(
+            _quote(conn, name) for name in table.columns.keys())
+        key = [_quote(conn, column.name) for column in table.primary_key]
+        present = ' and '.join(f'{name} is not null' for name in key)
+
+        with conn.begin() as transaction:
+            _replace(conn, table, transaction)
+            transaction.execute(
+                f'insert into {table.name} ({columns}) '
+                f'select {columns} from {legacy} where rowid in ('
+                f'select max(rowid) from {legacy} where {present} '
+                f'group by {", ".join(key)})')
+            transaction.execute(f'drop table {legacy}')
+    else:
+        # assign the keys of unseen teams before the table is locked by the
+        # migration transaction
+        for df in pd.read_sql(
+                f'select * from {table.name}', conn, chunksize=chunksize):
+            resolve_keys(conn, {table.name: df})
+
+        writer = BulkWriter(conn, metadata, upsert=True)
+
+        with conn.begin() as transaction:
+            _replace(conn, table, transaction)
+
+            # later chunks replace the rows of earlier chunks with equal keys
+            for df in pd.read_sql(
+                    f'select * from {legacy} order by rowid', transaction,
+                    chunksize=chunksize):
+                df = _converted(conn, table, df)
+                if len(df) > 0:
+                    writer.write(transaction, table, df)
+
+            transaction.execute(f'drop table {legacy}')
+
+    return pd.read_sql(f'select count(*) from {table.name}', conn).squeeze()
+
+
+def migrate_database(conn):
+    """
+    Rebuild the outdated tables of the database (see `rebuild_table`)
+
+    Args:
+        conn (sqlalchemy.engine.base.Engine): sqlalchemy engine connection
+
+    Returns:
+        dict: number of rows copied keyed by table name, None for the tables
+            whose rows were set aside
+
+    """
+    dimensions = [players, teams]
+
+    metadata.create_all(conn, tables=dimensions)
+    outdated = outdated_tables(conn)
+
+    # the teams table keys the rows of the other tables
+    copied = {
+        table.name: rebuild_table(conn, table)
+        for table in outdated if table in dimensions}
+    seed_dimensions(conn)
+    copied.update(
+        (table.name, rebuild_table(conn, table))
+        for table in outdated if table not in dimensions)
+
+    return copied
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Migrate an NBA database created by an earlier version')
+    parser.add_argument(
+        '--dry-run', action='store_true',
+        help='list the outdated tables without migrating them')
+    args = parser.parse_args()
+
+    engine = get_engine('nba')
+
+    if args.dry_run:
+        for table in outdated_tables(engine):
+            print(f'{table.name} is outdated')
+    else:
+        for name, rows in migrate_database(engine).items():
+            if rows is None:
+                print(
+                    f'{name} rows kept in legacy_{name}, the games will be '
+                    'synced again')
+            else:
+                print(f'migrated {name}: {rows} rows')
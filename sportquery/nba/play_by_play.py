@@ -1,112 +1,221 @@
-import re
+from collections import namedtuple
 
+import numpy as np
 import pandas as pd
-import requests
 
-from . import base_url
+from . import base_url, game_lifetime
+from ..extract import Document
+from ..fetch import get_page
+
+# type of an event and the pattern its description matches, the first
+# matching pattern wins
+event_patterns = [
+    ('period', r'^(?:Start|End) of'),
+    ('jump_ball', r'^Jump ball'),
+    ('made_free_throw', r' makes .*free throw'),
+    ('missed_free_throw', r' misses .*free throw'),
+    ('made_shot', r' makes '),
+    ('missed_shot', r' misses '),
+    ('rebound', r'[Rr]ebound by'),
+    ('turnover', r'^Turnover by'),
+    ('foul', r'[Ff]oul'),
+    ('violation', r'^Violation by'),
+    ('substitution', r' enters the game for '),
+    ('timeout', r'[Tt]imeout')]
+
+event_types = [name for name, _ in event_patterns] + ['other']
+
+# position in a play-by-play page from which `parse_new_plays` resumes: the
+# number of table rows and plays read, and the clock (seconds remaining),
+# quarter and score of the last play read
+Position = namedtuple('Position', [
+    'rows', 'plays', 'remaining', 'quarter', 'score_away', 'score_home'])
+
+start_position = Position(0, 0, 0., 0, 0, 0)
+
+
+def play_by_play_url(game_id):
+    """
+    Url of the play-by-play page for the specified `game_id`
+
+    Args:
+        game_id (str): unique game identifier
 
+    Returns:
+        str: play-by-play page url
 
-def get_play_by_play(game_id):
     """
-    Text description and current score of all plays in `game_id`.
+    return f'{base_url}/boxscores/pbp/{game_id}.html'
+
+
+def classify_events(event):
+    """
+    Classify play descriptions into the `event_types`: each event is
+    assigned the type of the first of the `event_patterns` it matches, or
+    'other' if none match.
 
     Args:
+        event (pd.Series): text description of each play
+
+    Returns:
+        pd.Categorical: event type of each play
+
+    """
+    conditions = [
+        event.str.contains(pattern, regex=True).fillna(False).values
+        for _, pattern in event_patterns]
+
+    return pd.Categorical(
+        np.select(conditions, event_types[:-1], 'other'),
+        categories=event_types)
+
+
+def parse_play_by_play(text, game_id):
+    """
+    Parse all plays from the raw html of the play-by-play page of `game_id`
+    into a compact table: game clock as integer seconds elapsed since
+    tipoff, the team of each play as a home/away code, the type of each
+    event and the players it references.
+
+    Args:
+        text (str): play-by-play page html
         game_id (str): unique game identifier
 
     Returns:
         pd.DataFrame: pandas dataframe of individual game plays
 
     """
-    plus_minus_url = f'{base_url}/boxscores/pbp/{game_id}.html'
+    return parse_new_plays(text, game_id)[0]
 
-    r = requests.get(plus_minus_url)
 
-    html = re.sub('(<!--)|(-->)', '', r.text, flags=re.DOTALL)
+def parse_new_plays(text, game_id, position=start_position):
+    """
+    Parse the plays of the play-by-play page of `game_id` which follow
+    `position`, e.g. the plays added to the page of a game in progress
+    since it was last read. Only the table rows after `position` are
+    extracted, and their quarter, score and play numbers continue from it.
+    The last play parsed is marked as the end of the game.
 
-    df, = pd.read_html(html, attrs={'id': 'pbp'})
+    Args:
+        text (str): play-by-play page html
+        game_id (str): unique game identifier
+        position (Position, optional): position returned by an earlier call
+            on a previous version of the page, the start of the page by
+            default
 
-    df = df['1st Q']
-    team_away = df.columns[1]
-    team_home = df.columns[5]
+    Returns:
+        tuple: pandas dataframe of the new plays (see `parse_play_by_play`)
+            and the position after the last play
+
+    """
+    doc = Document(text)
+    rows = doc.body_rows('pbp')
 
-    df.columns = [
+    columns = [
         'time',
-        'team_away',
+        'event_away',
         'points_away',
         'score',
         'points_home',
-        'team_home']
-
-    # away team events
-    df_away = df[['time', 'score', 'team_away', 'points_away']].copy()
-    df_away.rename(columns={
-        'team_away': 'event', 'points_away': 'points'}, inplace=True)
-    df_away.insert(1, 'city', team_away)
-    df_away.insert(2, 'is_home', 0)
-
-    # home team events
-    df_home = df[['time', 'score', 'team_home', 'points_home']].copy()
-    df_home.rename(columns={
-        'team_home': 'event', 'points_home': 'points'}, inplace=True)
-    df_home.insert(1, 'city', team_home)
-    df_home.insert(2, 'is_home', 1)
-
-    # concatenate away and home team events
-    df = pd.concat((df_away, df_home), axis=0).sort_index()
-    df = df[~df.event.isnull()]
-
-    # clean game score column
-    df['numeric'] = df.score.str.match(r'^\d+(-\d+)$')
-    df.loc[~df.numeric, 'score'] = pd.NA
-    df.loc[0, 'score'] = '0-0'
-    df['score'] = df.score.ffill(axis=0)
-
-    # clean points scored column
-    df.loc[~df.points.str.match(r'\+\d+').fillna(False), 'points'] = 0
-    df['points'] = df.points.astype(int)
-
-    # drop rows with no game time
-    has_time = df.time.str.match(r'^\d+:\d+.\d+$')
-    df = df[has_time].dropna(axis=0, how='any')
-
-    # dedupe rows (duplicates arise from split home/away tables)
-    df.drop_duplicates(
-        subset=['time', 'score', 'event', 'points'],
-        inplace=True)
-
-    # create column to track the quarter number
-    df['minute'] = df.time.str.split(':').str[0].astype(int)
-    df['start_quarter'] = (
-        df.minute > df.minute.shift(1).fillna(0)).astype(int)
-    df.insert(1, 'quarter', df.start_quarter.cumsum())
-
-    # create an indicator for end of game
-    df['end_game'] = 0
-    df.loc[df.index[-1], 'end_game'] = 1
-
-    # parse game score
-    score = df.score.str.split('-')
-    df['score_away'] = score.str[0].astype(int)
-    df['score_home'] = score.str[1].astype(int)
-
-    df.insert(0, 'game_id', game_id)
-
-    df.drop(columns=['numeric', 'minute', 'score'], inplace=True)
+        'event_home']
+
+    # a few new rows may leave a column empty, and typed as float
+    df = doc.table('pbp', skip=position.rows)['1st Q'].astype(object)
+    df.columns = columns
+
+    links = doc.links(
+        'pbp', first=False, skip=position.rows)['1st Q'].astype(object)
+    links.columns = columns
+
+    # keep play rows, dropping the header rows repeated for each quarter
+    clock = df.time.str.extract(r'^(\d+):(\d+\.\d+)$').astype(float)
+    remaining = (60 * clock[0] + clock[1]).values
+    plays = ~np.isnan(remaining) & (
+        df.event_away.notna() | df.event_home.notna()).values
+
+    df = df[plays]
+    links = links[plays]
+    remaining = remaining[plays]
+
+    # events spanning the whole row (e.g. quarter boundaries and jump balls)
+    # are copied into both team columns and belong to neither team
+    neutral = (df.event_away == df.event_home).values
+    home = df.event_home.notna().values & ~neutral
+
+    event = df.event_away.where(~home, df.event_home)
+    refs = links.event_away.where(~home, links.event_home)
+
+    points = pd.to_numeric(
+        df.points_away.where(~home, df.points_home), errors='coerce')
+    points = points.where(~neutral, 0).fillna(0).astype('int8')
+
+    score = df.score.where(df.score.str.match(r'^\d+-\d+$').fillna(False))
+    score = score.ffill().fillna(
+        f'{position.score_away}-{position.score_home}'
+    ).str.extract(r'^(\d+)-(\d+)$')
+
+    # the game clock is reset at the start of each quarter
+    previous = np.concatenate([[position.remaining], remaining[:-1]])
+    start_quarter = (remaining > previous).astype('int8')
+    quarter = (position.quarter + start_quarter.cumsum()).astype('int8')
+
+    overtime = quarter > 4
+    quarter_start = np.where(
+        overtime, 4 * 720 + (quarter - 5) * 300, (quarter - 1) * 720)
+    quarter_length = np.where(overtime, 300, 720)
+    elapsed = np.floor(quarter_start + quarter_length - remaining)
+
+    players = refs.str.extract(
+        r'/players/\w/(\w+)\.html(?:.*?/players/\w/(\w+)\.html)?')
+
+    play_number = position.plays + np.arange(len(event))
+
+    plays = pd.DataFrame({
+        'game_id': game_id,
+        'play_number': play_number,
+        'quarter': quarter,
+        'start_quarter': start_quarter,
+        'end_game': (
+            play_number == position.plays + len(event) - 1).astype('int8'),
+        'elapsed': elapsed.astype('int32'),
+        'is_home': pd.array(
+            np.where(neutral, None, home.astype(int)), dtype='Int8'),
+        'score_away': score[0].astype('int16').values,
+        'score_home': score[1].astype('int16').values,
+        'points': points.values,
+        'event_type': classify_events(event),
+        'player_id': players[0].astype('category').values,
+        'other_player_id': players[1].astype('category').values,
+        'event': event.values})
+
+    if len(plays) == 0:
+        return plays, position._replace(rows=rows)
+
+    last = plays.iloc[-1]
+
+    return plays, Position(
+        rows=rows,
+        plays=position.plays + len(plays),
+        remaining=remaining[-1],
+        quarter=int(last.quarter),
+        score_away=int(last.score_away),
+        score_home=int(last.score_home))
 
-    columns = [
-        'game_id',
-        'city',
-        'is_home',
-        'quarter',
-        'start_quarter',
-        'end_game',
-        'time',
-        'score_away',
-        'score_home',
-        'points',
-        'event']
 
-    return df[columns]
+def get_play_by_play(game_id):
+    """
+    Text description and current score of all plays in `game_id`.
+
+    Args:
+        game_id (str): unique game identifier
+
+    Returns:
+        pd.DataFrame: pandas dataframe of individual game plays
+
+    """
+    text = get_page(play_by_play_url(game_id), **game_lifetime(game_id))
+
+    return parse_play_by_play(text, game_id)
 
 
 if __name__ == '__main__':
@@ -1,77 +1,174 @@
 import re
 
-from bs4 import BeautifulSoup
+import lxml.html
+import numpy as np
 import pandas as pd
-import requests
 from unidecode import unidecode
 
-from . import base_url
+from . import base_url, game_lifetime
+from ..fetch import get_page
 
 
-def _unpack_plus_minus(div):
+def _has_class(name):
     """
-    Function to extract the sub duration (width) and plus-minus (points)
-    from a provided div website element.
+    XPath predicate matching elements whose class list contains `name`
+
+    """
+    return f'contains(concat(" ", normalize-space(@class), " "), " {name} ")'
+
+
+def _player_id(div):
+    """
+    Basketball-reference id of the player linked from a player element of
+    the plus-minus page, None if the player is not linked
+
+    """
+    for href in div.xpath('.//a/@href'):
+        match = re.search(r'/players/\w/(\w+)\.html', href)
+        if match:
+            return match.group(1)
+
+    return None
+
+
+def _name_key(name):
+    """
+    Player name reduced for matching names spelled differently on the
+    plus-minus and boxscore pages: lower case, without punctuation and
+    without generational suffixes (e.g. 'Jr.' or 'III')
+
+    """
+    words = re.sub(r'[^a-z ]', '', name.lower()).split()
+
+    return ' '.join(
+        word for word in words if word not in {'jr', 'sr', 'ii', 'iii', 'iv'})
+
+
+def plus_minus_url(game_id):
+    """
+    Url of the plus-minus page for the specified `game_id`
 
     Args:
-        div (bs4.element.Tag): beautiful soup tag element
+        game_id (str): unique game identifier
 
     Returns:
-        int: "width" of the sub-duration element (proxy for sub duration)
-        int: net points scored (plus-minus) during the sub interval
+        str: plus-minus page url
 
     """
-    width = int(re.search(r'\d+', div.get('style')).group())
-    numeric = re.search(r'[-+]?\d+', div.text)
-    points = int(numeric.group()) if numeric else None
-    return width, points
+    return f'{base_url}/boxscores/plus-minus/{game_id}.html'
 
 
-def get_plus_minus(game_id):
+def parse_plus_minus(text, game_id):
     """
-    Plus-minus contributions at the player-minute level
+    Parse plus-minus contributions at the player-minute level from the raw
+    html of the plus-minus page of `game_id`. Players linked to their page
+    are identified by their basketball-reference id in the `player_id`
+    column, which is empty for the other players (see `link_players`).
 
     Args:
+        text (str): plus-minus page html
         game_id (str): unique game identifier
 
     Returns:
         pd.DataFrame: pandas dataframe containing player plus-minus data
 
     """
-    plus_minus_url = f'{base_url}/boxscores/plus-minus/{game_id}.html'
+    root = lxml.html.fromstring(text)
 
-    r = requests.get(plus_minus_url)
+    player_divs = root.xpath(f'//div[{_has_class("player")}]')
+    all_players = [
+        unidecode(div.xpath('.//span')[0].text_content()).strip()
+        for div in player_divs]
+    all_ids = [_player_id(div) for div in player_divs]
+
+    all_intervals = [
+        div.xpath('.//div')
+        for div in root.xpath(f'//div[{_has_class("player-plusminus")}]')]
+
+    n_players = min(len(all_players), len(all_intervals))
+    counts = np.array(
+        [len(divs) for divs in all_intervals[:n_players]], dtype=int)
+    divs = [div for divs in all_intervals[:n_players] for div in divs]
+
+    # "width" of each sub-duration element (proxy for sub duration) and net
+    # points scored (plus-minus) during the sub interval
+    width = pd.Series(
+        [div.get('style') for div in divs], dtype=object
+    ).str.extract(r'(\d+)', expand=False).astype(float).values
+    points = pd.Series(
+        [div.text_content() for div in divs], dtype=object
+    ).str.extract(r'([-+]?\d+)', expand=False).astype(float).values
+
+    # normalize each player's intervals to 48 minutes, then accumulate
+    # elapsed time within each player using one global cumulative sum
+    player = np.repeat(np.arange(n_players), counts)
+    total = np.bincount(player, weights=width, minlength=n_players)
+    duration = width * (48. / total)[player]
+    elapsed = np.concatenate([[0.], np.cumsum(duration)])
+    first = np.cumsum(counts) - counts
+    offset = np.repeat(elapsed[first], counts)
+    subin_minute = elapsed[:-1] - offset
+    subout_minute = elapsed[1:] - offset
+
+    on_court = ~np.isnan(points)
+
+    df_plus_minus = pd.DataFrame({
+        'player': np.array(all_players[:n_players], dtype=object)[player],
+        'player_id': np.array(all_ids[:n_players], dtype=object)[player],
+        'subin_minute': subin_minute,
+        'subout_minute': subout_minute,
+        'plus_minus': points})[on_court]
 
-    soup = BeautifulSoup(r.text, 'html.parser')
+    df_plus_minus.insert(0, 'game_id', game_id)
 
-    all_players = [
-        unidecode(div.select_one('span').text).strip()
-        for div in soup.find_all('div', attrs={'class': 'player'})]
+    return df_plus_minus.reset_index(drop=True)
 
-    all_intervals = [[
-        _unpack_plus_minus(d) for d in div.find_all('div')]
-        for div in soup.find_all('div', attrs={'class': 'player-plusminus'})]
 
-    df_plus_minus = pd.DataFrame(columns=[
-        'player', 'subin_minute', 'subout_minute', 'plus_minus'])
+def link_players(df, boxscore):
+    """
+    Identify the players of plus-minus data by their basketball-reference
+    id. Players linked from the plus-minus page already carry their id, the
+    others are looked up by name among the players of the same game's
+    boxscore, ignoring case, punctuation and generational suffixes. Names
+    shared by several players of the boxscore are ambiguous and are not
+    looked up. Rows of players who cannot be identified are dropped.
 
-    for player, intervals in zip(all_players, all_intervals):
-        df = pd.DataFrame(intervals, columns=['duration', 'points'])
-        df.duration *= 48. / df.duration.sum()
+    Args:
+        df (pd.DataFrame): plus-minus data returned by `parse_plus_minus`
+        boxscore (pd.DataFrame): boxscore data of the same game
 
-        df['player'] = player
-        df['subin_minute'] = df.duration.shift(1).cumsum().fillna(0)
-        df['subout_minute'] = df.duration.cumsum()
-        df['plus_minus'] = df.points
+    Returns:
+        pd.DataFrame: plus-minus data with a `player_id` column
 
-        df.dropna(axis=0, inplace=True)
-        df.drop(columns=['duration', 'points'], inplace=True)
+    """
+    players = boxscore.dropna(subset=['player_id']).drop_duplicates(
+        'player_id')
+    names = players.player.map(_name_key)
+    unique = ~names.duplicated(keep=False)
+    player_ids = pd.Series(
+        players.player_id[unique].values, index=names[unique].values)
 
-        df_plus_minus = df_plus_minus.append(df)
+    df = df.copy()
+    df['player_id'] = df.player_id.fillna(
+        df.player.map(_name_key).map(player_ids))
 
-    df_plus_minus.insert(0, 'game_id', game_id)
+    return df[df.player_id.notna()].reset_index(drop=True)
 
-    return df_plus_minus.reset_index(drop=True)
+
+def get_plus_minus(game_id):
+    """
+    Plus-minus contributions at the player-minute level
+
+    Args:
+        game_id (str): unique game identifier
+
+    Returns:
+        pd.DataFrame: pandas dataframe containing player plus-minus data
+
+    """
+    text = get_page(plus_minus_url(game_id), **game_lifetime(game_id))
+
+    return parse_plus_minus(text, game_id)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,356 @@
+from collections import OrderedDict
+import functools
+import os
+import threading
+import time
+
+import pandas as pd
+import sqlalchemy
+
+from .schema import (
+    boxscore, play_by_play, players, plus_minus, schedule, teams)
+from ..storage import get_engine
+from ..writer import commit_listeners
+
+# memory budget of cached query results
+cache_size = int(os.getenv('SPORTQUERY_QUERY_CACHE_MB', 256)) * 2**20
+
+# minimum number of seconds between two database version checks
+version_interval = 10
+
+
+class QueryCache:
+    """
+    Thread-safe least recently used cache of query results, evicting the
+    oldest entries once the memory used by the cached dataframes exceeds
+    `max_bytes`. Each entry records the tables it was read from so that it
+    can be invalidated when any of them changes.
+
+    Args:
+        max_bytes (int): memory budget in bytes
+
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> (dataframe, tables, size)
+        self.size = 0
+        self.versions = {}  # database url -> (version, time checked)
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Cached result of `key`, None if missing
+
+        """
+        with self.lock:
+            if key not in self.entries:
+                return None
+            self.entries.move_to_end(key)
+            return self.entries[key][0]
+
+    def put(self, key, df, tables):
+        """
+        Cache the result `df` of `key`, read from `tables`
+
+        """
+        size = int(df.memory_usage(deep=True).sum())
+
+        with self.lock:
+            if key in self.entries:
+                self.size -= self.entries.pop(key)[2]
+
+            if size > self.max_bytes:
+                return
+
+            self.entries[key] = (df, frozenset(tables), size)
+            self.size += size
+
+            while self.size > self.max_bytes:
+                _, (_, _, evicted) = self.entries.popitem(last=False)
+                self.size -= evicted
+
+    def invalidate(self, tables=None):
+        """
+        Drop the entries read from any of `tables`, or all entries
+
+        Args:
+            tables (iterable of str, optional): names of changed tables
+
+        """
+        with self.lock:
+            for key, (_, entry_tables, size) in list(self.entries.items()):
+                if tables is None or entry_tables & set(tables):
+                    del self.entries[key]
+                    self.size -= size
+
+    def check_version(self, conn):
+        """
+        Invalidate all entries if the database was changed by another
+        process since the last check. Checks are throttled to one every
+        `version_interval` seconds per database.
+
+        Args:
+            conn (sqlalchemy.engine.base.Engine): sqlalchemy engine connection
+
+        """
+        url = str(conn.engine.url)
+        now = time.monotonic()
+
+        with self.lock:
+            version, checked = self.versions.get(url, (None, -version_interval))
+            if now - checked < version_interval:
+                return
+
+        current = tuple(data_version(conn))
+
+        with self.lock:
+            self.versions[url] = (current, now)
+
+        if version is not None and current != version:
+            self.invalidate()
+
+
+def data_version(conn):
+    """
+    Cheap fingerprint of the synced data which changes whenever games are
+    synced or completed games are added to the schedule
+
+    Args:
+        conn (sqlalchemy.engine.base.Engine): sqlalchemy engine connection
+
+    Returns:
+        sqlalchemy.engine.Row: ledger row count, latest ledger fetch time and
+            number of completed schedule rows
+
+    """
+    return conn.execute(
+        'select (select count(*) from sync_ledger), '
+        '(select max(fetched_at) from sync_ledger), '
+        '(select count(outcome) from schedule)'
+    ).first()
+
+
+query_cache = QueryCache(cache_size)
+
+# results are invalidated as soon as a writer in this process commits
+commit_listeners.append(query_cache.invalidate)
+
+
+def _typed(df, *tables):
+    """
+    Cast the columns of `df` to the pandas dtypes of the columns of `tables`,
+    using nullable dtypes for integer and boolean columns
+
+    """
+    dtypes = [
+        (sqlalchemy.types.Boolean, 'boolean'),
+        (sqlalchemy.types.Integer, 'Int64'),
+        (sqlalchemy.types.Float, 'float64'),
+        (sqlalchemy.types.DateTime, 'datetime64[ns]'),
+        (sqlalchemy.types.Text, 'string')]
+
+    for table in tables:
+        for column in table.columns:
+            if column.name not in df:
+                continue
+            for sql_type, dtype in dtypes:
+                if isinstance(column.type, sql_type):
+                    df[column.name] = df[column.name].astype(dtype)
+                    break
+
+    return df
+
+
+def _cached(*tables):
+    """
+    Serve a read function from the query cache. The decorated function is
+    called with an additional `conn` keyword argument, the database engine
+    by default. Callers receive a copy of the cached dataframe.
+
+    """
+    names = [table.name for table in tables]
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, conn=None, **kwargs):
+            conn = conn if conn is not None else get_engine('nba')
+            query_cache.check_version(conn)
+
+            key = (func.__name__, str(conn.engine.url), args,
+                   tuple(sorted(kwargs.items())))
+
+            df = query_cache.get(key)
+            if df is None:
+                df = func(*args, conn=conn, **kwargs)
+                query_cache.put(key, df, names)
+
+            return df.copy()
+
+        return wrapper
+
+    return decorator
+
+
+def _player(player):
+    """
+    Condition matching the player with basketball-reference id or name
+    `player`
+
+    """
+    return sqlalchemy.or_(
+        players.c.player_id == player, players.c.name == player)
+
+
+@_cached(boxscore, schedule, players, teams)
+def player_games(player, season=None, conn=None):
+    """
+    Game log of `player`: the boxscore row of each game played, with the
+    season, tipoff time and opponent of the game. Uses the boxscore player
+    index.
+
+    Args:
+        player (str): basketball-reference player id or player name
+        season (int, optional): NBA season year, all seasons by default
+        conn (sqlalchemy.engine.base.Engine, optional): sqlalchemy engine
+
+    Returns:
+        pd.DataFrame: one row per game, in chronological order
+
+    """
+    opponents = teams.alias('opponents')
+
+    query = (
+        sqlalchemy.select(
+            boxscore,
+            players.c.player_id,
+            players.c.name.label('player'),
+            teams.c.team,
+            schedule.c.season,
+            schedule.c.datetime,
+            opponents.c.team.label('opponent'))
+        .select_from(
+            boxscore
+            .join(players, boxscore.c.player_key == players.c.player_key)
+            .join(teams, boxscore.c.team_key == teams.c.team_key)
+            .join(schedule, sqlalchemy.and_(
+                boxscore.c.game_id == schedule.c.game_id,
+                boxscore.c.team_key == schedule.c.team_key))
+            .join(opponents,
+                  schedule.c.opponent_key == opponents.c.team_key))
+        .where(_player(player))
+        .order_by(boxscore.c.game_id))
+
+    if season is not None:
+        query = query.where(schedule.c.season == season)
+
+    df = _typed(pd.read_sql(query, conn), boxscore, players, schedule)
+
+    return df.astype({'player': 'string', 'opponent': 'string'})
+
+
+@_cached(schedule, teams)
+def team_games(team, season=None, conn=None):
+    """
+    Schedule of `team`, including games still to be played. Uses the
+    schedule team index.
+
+    Args:
+        team (str): NBA team abbreviation
+        season (int, optional): NBA season year, all seasons by default
+        conn (sqlalchemy.engine.base.Engine, optional): sqlalchemy engine
+
+    Returns:
+        pd.DataFrame: one row per game, in chronological order
+
+    """
+    opponents = teams.alias('opponents')
+
+    query = (
+        sqlalchemy.select(
+            schedule, teams.c.team, opponents.c.team.label('opponent'))
+        .select_from(
+            schedule
+            .join(teams, schedule.c.team_key == teams.c.team_key)
+            .join(opponents,
+                  schedule.c.opponent_key == opponents.c.team_key))
+        .where(teams.c.team == team)
+        .order_by(schedule.c.datetime, schedule.c.game_id))
+
+    if season is not None:
+        query = query.where(schedule.c.season == season)
+
+    df = _typed(pd.read_sql(query, conn), schedule, teams)
+
+    return df.astype({'opponent': 'string'})
+
+
+@_cached(play_by_play)
+def plays(first_game_id, last_game_id=None, conn=None):
+    """
+    Play-by-play events of the games with identifiers in the range
+    `first_game_id` to `last_game_id` inclusive. Since game identifiers
+    start with the game date, a range of identifiers is a range of dates,
+    read with a scan of the primary key.
+
+    Args:
+        first_game_id (str): first game identifier (or date prefix)
+        last_game_id (str, optional): last game identifier (or date prefix),
+            equal to `first_game_id` by default
+        conn (sqlalchemy.engine.base.Engine, optional): sqlalchemy engine
+
+    Returns:
+        pd.DataFrame: events ordered by game and play number
+
+    """
+    last_game_id = last_game_id or first_game_id
+
+    # '~' sorts after every character of a game identifier, so that a date
+    # prefix includes every game of that date
+    query = (
+        play_by_play.select()
+        .where(play_by_play.c.game_id.between(
+            first_game_id, f'{last_game_id}~'))
+        .order_by(play_by_play.c.game_id, play_by_play.c.play_number))
+
+    return _typed(pd.read_sql(query, conn), play_by_play)
+
+
+@_cached(plus_minus, players)
+def stints(game_id=None, player=None, conn=None):
+    """
+    Plus-minus stints of a game, of a player, or of a player in one game.
+    Uses the primary key for games and the plus-minus player index for
+    players.
+
+    Args:
+        game_id (str, optional): unique game identifier
+        player (str, optional): basketball-reference player id or player
+            name
+        conn (sqlalchemy.engine.base.Engine, optional): sqlalchemy engine
+
+    Returns:
+        pd.DataFrame: one row per stint, ordered by game, player and time
+
+    """
+    if game_id is None and player is None:
+        raise ValueError('game_id or player is required')
+
+    query = (
+        sqlalchemy.select(
+            plus_minus, players.c.player_id, players.c.name.label('player'))
+        .select_from(plus_minus.join(
+            players, plus_minus.c.player_key == players.c.player_key))
+        .order_by(
+            plus_minus.c.game_id,
+            plus_minus.c.player_key,
+            plus_minus.c.subin_minute))
+
+    if game_id is not None:
+        query = query.where(plus_minus.c.game_id == game_id)
+
+    if player is not None:
+        query = query.where(_player(player))
+
+    df = _typed(pd.read_sql(query, conn), plus_minus, players)
+
+    return df.astype({'player': 'string'})
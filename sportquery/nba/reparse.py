@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+import argparse
+from functools import partial
+import json
+import re
+import time
+from urllib.parse import urlsplit
+
+import prefect
+
+from .dimensions import resolve_keys
+from .game import (
+    game_pages, game_season, game_tables, page_archive, training_pages)
+from .ledger import ingest_game
+from .schema import metadata
+from .sync_database import initialize_database, update_columnar
+from .. import metrics
+from ..cache import page_cache
+from ..pipeline import run_pipeline
+from ..storage import get_engine
+from ..writer import BulkWriter
+
+
+def _path_pattern(page_url):
+    """
+    Regular expression matching the url path of a game page and capturing
+    its game id
+
+    """
+    path = urlsplit(page_url('GAME_ID')).path
+
+    return re.compile(re.escape(path).replace('GAME_ID', r'(\w{12})') + '$')
+
+
+# url path pattern of the page of each game level table
+page_patterns = {
+    table: _path_pattern(page_url)
+    for table, (page_url, _) in game_tables.items()}
+
+
+def page_game(url):
+    """
+    Table and game of the game page `url`
+
+    Args:
+        url (str): page url
+
+    Returns:
+        tuple: table name and game id, None if `url` is not a game page
+
+    """
+    path = urlsplit(url).path
+
+    for table, pattern in page_patterns.items():
+        match = pattern.match(path)
+        if match:
+            return table, match.group(1)
+
+    return None
+
+
+def archived_games(seasons=None, datasets=tuple(game_tables)):
+    """
+    Archived games with all the pages needed to parse `datasets`
+
+    Args:
+        seasons (list of int, optional): seasons to read, all by default
+        datasets (iterable of str, optional): game level table names
+
+    Returns:
+        list of str: unique game identifiers in archive order
+
+    """
+    needed = set(game_pages(datasets))
+
+    if seasons is None:
+        partitions = page_archive.partitions()
+    else:
+        partitions = [str(season) for season in seasons]
+
+    games = {}
+    for partition in partitions:
+        for entry in page_archive.entries(partition):
+            page = page_game(entry['url'])
+            if page is not None:
+                games.setdefault(page[1], set()).add(page[0])
+
+    return [game_id for game_id, tables in games.items() if needed <= tables]
+
+
+def read_game(game_id, datasets=tuple(game_tables)):
+    """
+    Archived pages of `game_id` needed to parse `datasets`, the archive
+    counterpart of `fetch_game`
+
+    Args:
+        game_id (str): unique game identifier
+        datasets (iterable of str, optional): game level table names
+
+    Returns:
+        dict: `sportquery.cache.CachedPage` of each page keyed by table name
+
+    """
+    season = game_season(game_id)
+    pages = {}
+
+    for table in game_pages(datasets):
+        page_url = game_tables[table][0]
+        url = page_url(game_id)
+        page = page_archive.get(season, url)
+
+        if page is None:
+            raise KeyError(f'{url} is not archived')
+
+        pages[table] = page
+
+    return pages
+
+
+def import_cache(cache=page_cache):
+    """
+    Archive the game pages of the page cache which are not archived yet,
+    e.g. the pages fetched before the archive existed. The compression
+    dictionary is first trained on a sample of the cached pages if the
+    archive has none.
+
+    Args:
+        cache (sportquery.cache.PageCache, optional): page cache to import
+
+    Returns:
+        int: number of pages archived
+
+    """
+    urls = []
+    for meta_path in sorted(cache.root.glob('*/*.json')):
+        try:
+            url = json.loads(meta_path.read_text())['url']
+        except (OSError, ValueError, KeyError):
+            continue
+        if page_game(url) is not None:
+            urls.append(url)
+
+    if not page_archive.trained() and urls:
+        step = max(len(urls) // training_pages, 1)
+        samples = [cache.get(url) for url in urls[::step]]
+        page_archive.train(
+            [page.text for page in samples if page is not None])
+
+    archived = 0
+    for url in urls:
+        page = cache.get(url)
+        if page is not None:
+            archived += page_archive.put(game_season(page_game(url)[1]), page)
+
+    return archived
+
+
+def reparse(conn=None, datasets=tuple(game_tables), seasons=None,
+            read_workers=4, parse_workers=None, batch_size=100):
+    """
+    Rebuild game level tables from the archive with the current parsers,
+    without network requests. Archived pages are streamed through the
+    pipeline used to sync games: reader threads decompress the pages, a
+    process pool parses them and a single writer replaces the rows of each
+    batch of games in the rebuilt tables, along with their sync ledger
+    entries, in one transaction, so rows which the parsers no longer
+    produce are removed. The parquet mirror of the games is refreshed.
+
+    Args:
+        conn (sqlalchemy.engine.base.Engine, optional): sqlalchemy engine
+        datasets (iterable of str, optional): game level tables to rebuild
+        seasons (list of int, optional): seasons to rebuild, all archived
+            seasons by default
+        read_workers (int, optional): number of archive reader threads
+        parse_workers (int, optional): number of page parsing processes
+        batch_size (int, optional): number of games written per transaction
+
+    Returns:
+        list of str: identifiers of the reparsed games
+
+    """
+    conn = conn if conn is not None else get_engine('nba')
+    datasets = list(datasets)
+
+    logger = prefect.context.get('logger')
+
+    game_ids = archived_games(seasons, datasets)
+    logger.info(f'reparsing {len(game_ids)} archived games')
+
+    reparsed = []
+
+    replace = {table: 'game_id' for table in datasets}
+
+    with BulkWriter(conn, metadata, batch_size=batch_size, upsert=True,
+                    replace=replace) as writer:
+
+        def write(games):
+            for game_id, tables in games:
+                writer.add(resolve_keys(conn, tables))
+                reparsed.append(game_id)
+
+        def on_error(game_id, exc):
+            logger.warning(f'failed to reparse {game_id}: {exc}')
+            metrics.inc('games_failed_total', status='reparse')
+
+        run_pipeline(
+            game_ids,
+            partial(read_game, datasets=datasets),
+            partial(ingest_game, datasets=datasets),
+            write,
+            fetch_workers=read_workers,
+            parse_workers=parse_workers,
+            batch_size=1,
+            on_error=on_error)
+
+    update_columnar.run(conn, [], reparsed)
+
+    return reparsed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Rebuild NBA game tables from the page archive')
+    parser.add_argument(
+        '--datasets', nargs='+', choices=list(game_tables),
+        default=list(game_tables), help='tables to rebuild, all by default')
+    parser.add_argument(
+        '--seasons', type=int, nargs='+',
+        help='seasons to rebuild, all archived seasons by default')
+    parser.add_argument('--parse-workers', type=int)
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument(
+        '--import-cache', action='store_true',
+        help='archive the game pages of the page cache first')
+    args = parser.parse_args()
+
+    if args.import_cache:
+        print(f'archived {import_cache()} cached pages')
+
+    start = time.perf_counter()
+    games = reparse(
+        initialize_database.run(), args.datasets, args.seasons,
+        parse_workers=args.parse_workers, batch_size=args.batch_size)
+    print(f'reparsed {len(games)} games in '
+          f'{time.perf_counter() - start:.1f}s')
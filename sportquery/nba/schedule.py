@@ -1,33 +1,45 @@
+from datetime import date, datetime
 import re
 
 import numpy as np
 import pandas as pd
-import requests
 
-from . import base_url, team_abbr
+from . import base_url, future_schedule_ttl, season_lifetime, team_abbr
+from ..cache import page_cache
+from ..extract import Document
+from ..fetch import get_page
 
 
-def get_schedule(team, season):
+def team_schedule_url(team, season):
     """
-    Return the game schedule of the specified `team` and `season`
-    as a pandas dataframe.
+    Url of the schedule page of `team` in `season`
 
     Args:
-        team (str): NFL team abbreviation
-        season (int): NFL season number (according to regular season)
+        team (str): NBA team abbreviation
+        season (int): NBA season number (according to regular season)
 
     Returns:
-        pd.DataFrame: pandas dataframe containing all team games for the
-            specified season
+        str: page url
 
     """
-    schedule_url = f'{base_url}/teams/{team}/{season}_games.html'
+    return f'{base_url}/teams/{team}/{season}_games.html'
 
-    r = requests.get(schedule_url)
 
-    html = re.sub('(<!--)|(-->)', '', r.text, flags=re.DOTALL)
+def parse_schedule(text, team):
+    """
+    Parse the game schedule of `team` from the raw html of its season
+    schedule page.
 
-    df, = pd.read_html(html, attrs={'id': 'games'})
+    Args:
+        text (str): team schedule page html
+        team (str): NBA team abbreviation
+
+    Returns:
+        pd.DataFrame: pandas dataframe containing all team games for the
+            season
+
+    """
+    df = Document(text).table('games')
 
     df.drop(columns=['Unnamed: 3', 'Unnamed: 4', 'Unnamed: 8', 'Notes'],
             inplace=True)  # empty columns
@@ -76,5 +88,257 @@ def get_schedule(team, season):
     return df
 
 
+def get_schedule(team, season):
+    """
+    Return the game schedule of the specified `team` and `season`
+    as a pandas dataframe.
+
+    Args:
+        team (str): NBA team abbreviation
+        season (int): NBA season number (according to regular season)
+
+    Returns:
+        pd.DataFrame: pandas dataframe containing all team games for the
+            specified season
+
+    """
+    text = get_page(
+        team_schedule_url(team, season), **season_lifetime(season))
+
+    return parse_schedule(text, team)
+
+
+def league_schedule_url(season, month=None):
+    """
+    Url of the league schedule page of `season`, or of one of its months
+
+    Args:
+        season (int): NBA season number (according to regular season)
+        month (str, optional): month slug, e.g. 'december'
+
+    Returns:
+        str: page url
+
+    """
+    suffix = f'-{month}' if month else ''
+
+    return f'{base_url}/leagues/NBA_{season}_games{suffix}.html'
+
+
+def parse_schedule_months(text, season):
+    """
+    Month slugs linked from a league schedule page of `season`, in calendar
+    order.
+
+    Args:
+        text (str): league schedule page html
+        season (int): NBA season number (according to regular season)
+
+    Returns:
+        list of str: month slugs
+
+    """
+    months = re.findall(rf'/leagues/NBA_{season}_games-([\w-]+)\.html', text)
+
+    return list(dict.fromkeys(months))
+
+
+def month_start(season, month):
+    """
+    First day of a month of the league schedule of `season`
+
+    Args:
+        season (int): NBA season number (according to regular season)
+        month (str): month slug, e.g. 'december', or 'october-2019' for
+            seasons spanning the same month twice
+
+    Returns:
+        datetime.date: first day of the month
+
+    """
+    name, _, year = month.partition('-')
+    number = datetime.strptime(name, '%B').month
+
+    if not year:
+        year = season - 1 if number >= 10 else season
+
+    return date(int(year), number, 1)
+
+
+def parse_league_schedule(text):
+    """
+    Parse the games listed on a league schedule page. Each game appears
+    once, with the points of both teams once it has been played. Games
+    following the 'Playoffs' separator row are flagged as playoff games;
+    pages listing only playoff games have no separator, see
+    `flag_playoffs`.
+
+    Args:
+        text (str): league schedule page html
+
+    Returns:
+        pd.DataFrame: pandas dataframe with one row per game
+
+    """
+    doc = Document(text)
+    df = doc.table('schedule')
+    links = doc.links('schedule')
+
+    playoffs = df.Date.eq('Playoffs').cumsum() > 0
+
+    date = pd.to_datetime(
+        df.Date, format='%a, %b %d, %Y', errors='coerce')
+
+    if 'Start (ET)' in df:
+        timestamp = pd.to_datetime(
+            date.dt.strftime('%Y-%m-%d') + ' '
+            + (df['Start (ET)'].astype(str) + 'm').str.upper(),
+            format='%Y-%m-%d %I:%M%p', errors='coerce').fillna(date)
+    else:
+        timestamp = date
+
+    def abbr(column):
+        team = links[column].str.extract(r'/teams/(\w+)/', expand=False)
+        return team.fillna(df[column].replace(team_abbr))
+
+    team_away = abbr('Visitor/Neutral')
+    team_home = abbr('Home/Neutral')
+
+    boxscore = links.iloc[:, df.columns.get_loc('PTS.1') + 1]
+    game_id = boxscore.str.extract(
+        r'/boxscores/(\w+)\.html', expand=False
+    ).fillna(date.dt.strftime('%Y%m%d') + '0' + team_home)
+
+    games = pd.DataFrame({
+        'game_id': game_id,
+        'datetime': timestamp,
+        'team_away': team_away,
+        'team_home': team_home,
+        'points_away': pd.to_numeric(df.PTS, errors='coerce'),
+        'points_home': pd.to_numeric(df['PTS.1'], errors='coerce'),
+        'playoffs': playoffs})
+
+    return games[date.notna()].reset_index(drop=True)
+
+
+def flag_playoffs(games):
+    """
+    Flag every game of a season dated on or after its first playoff game as
+    a playoff game. Only the month page of the end of the regular season has
+    a 'Playoffs' separator row, so the games of the following months are
+    flagged from the games of the whole season.
+
+    Args:
+        games (pd.DataFrame): league schedule games of a season
+
+    Returns:
+        pd.DataFrame: games with the `playoffs` column set
+
+    """
+    date = games.datetime.dt.normalize()
+    start = date[games.playoffs].min()
+
+    if pd.isna(start):
+        return games
+
+    return games.assign(playoffs=date >= start)
+
+
+def team_schedules(games):
+    """
+    Expand the regular season games returned by `parse_league_schedule`
+    into the schedule of each team: one row per game and team, with the
+    record and streak of the team after each game.
+
+    Args:
+        games (pd.DataFrame): league schedule games
+
+    Returns:
+        pd.DataFrame: pandas dataframe of team games, with the columns of
+            `parse_schedule`
+
+    """
+    games = games[~games.playoffs]
+
+    df = pd.concat([
+        pd.DataFrame({
+            'game_id': games.game_id,
+            'datetime': games.datetime,
+            'is_home': is_home,
+            'team': games[f'team_{side}'],
+            'opponent': games[f'team_{other}'],
+            'team_points': games[f'points_{side}'],
+            'opponent_points': games[f'points_{other}']})
+        for side, other, is_home in [
+            ('home', 'away', True), ('away', 'home', False)]
+    ], ignore_index=True)
+
+    df = df.sort_values(['team', 'datetime', 'game_id'], ignore_index=True)
+
+    played = df.team_points.notna()
+    won = played & (df.team_points > df.opponent_points)
+    lost = played & ~won
+
+    df.insert(1, 'game_number', df.groupby('team').cumcount() + 1)
+    df.insert(6, 'outcome', np.where(won, 'W', np.where(lost, 'L', None)))
+
+    df['cumulative_wins'] = won.groupby(df.team).cumsum().where(played)
+    df['cumulative_losses'] = lost.groupby(df.team).cumsum().where(played)
+
+    # signed length of the current run of wins (+) or losses (-)
+    run = (df.outcome != df.groupby('team').outcome.shift()).cumsum()
+    length = df.groupby(run).cumcount() + 1
+    df['streak'] = length.where(won, -length).where(played)
+
+    return df
+
+
+def get_league_schedule(season):
+    """
+    Return all games of the specified `season` from the league schedule,
+    which lists the games of each month on a separate page, with the
+    playoff games flagged. Months whose games have all been played are
+    served from the page cache, and months yet to start are only
+    revalidated every `future_schedule_ttl` seconds, so a refresh during
+    the season only reloads the schedule index and the months up to the
+    current date.
+
+    Args:
+        season (int): NBA season number (according to regular season)
+
+    Returns:
+        pd.DataFrame: pandas dataframe with one row per game
+
+    """
+    lifetime = season_lifetime(season)
+    text = get_page(league_schedule_url(season), **lifetime)
+
+    months = parse_schedule_months(text, season)
+    if not months:
+        return parse_league_schedule(text)
+
+    today = date.today()
+
+    frames = []
+    for month in months:
+        url = league_schedule_url(season, month)
+        cached = page_cache.get(url)
+
+        if cached is not None:
+            games = parse_league_schedule(cached.text)
+            if len(games) > 0 and games.points_home.notna().all():
+                frames.append(games)
+                continue
+
+        if month_start(season, month) > today:
+            page = get_page(url, **dict(lifetime, ttl=future_schedule_ttl))
+        else:
+            page = get_page(url, **lifetime)
+
+        frames.append(parse_league_schedule(page))
+
+    return flag_playoffs(pd.concat(frames, ignore_index=True))
+
+
 if __name__ == '__main__':
-    print(get_schedule('BRK', 2021))
+    print(team_schedules(get_league_schedule(2021)))
@@ -0,0 +1,147 @@
+import sqlalchemy
+
+metadata = sqlalchemy.MetaData()
+
+# dimension tables assigning the integer keys used by the fact tables
+players = sqlalchemy.Table(
+    'players', metadata,
+    sqlalchemy.Column('player_key', sqlalchemy.types.Integer),
+    sqlalchemy.Column('player_id', sqlalchemy.types.Text),
+    sqlalchemy.Column('name', sqlalchemy.types.Text),
+    sqlalchemy.PrimaryKeyConstraint('player_key'),
+    sqlalchemy.UniqueConstraint('player_id'))
+
+teams = sqlalchemy.Table(
+    'teams', metadata,
+    sqlalchemy.Column('team_key', sqlalchemy.types.Integer),
+    sqlalchemy.Column('team', sqlalchemy.types.Text),
+    sqlalchemy.Column('name', sqlalchemy.types.Text),
+    sqlalchemy.PrimaryKeyConstraint('team_key'),
+    sqlalchemy.UniqueConstraint('team'))
+
+schedule = sqlalchemy.Table(
+    'schedule', metadata,
+    sqlalchemy.Column('game_id', sqlalchemy.types.Text),
+    sqlalchemy.Column('season', sqlalchemy.types.Integer),
+    sqlalchemy.Column('game_number', sqlalchemy.types.Integer),
+    sqlalchemy.Column('datetime', sqlalchemy.types.DateTime),
+    sqlalchemy.Column('is_home', sqlalchemy.types.Boolean),
+    sqlalchemy.Column('team_key', sqlalchemy.types.Integer),
+    sqlalchemy.Column('opponent_key', sqlalchemy.types.Integer),
+    sqlalchemy.Column('outcome', sqlalchemy.types.Text),
+    sqlalchemy.Column('team_points', sqlalchemy.types.Integer),
+    sqlalchemy.Column('opponent_points', sqlalchemy.types.Integer),
+    sqlalchemy.Column('cumulative_wins', sqlalchemy.types.Integer),
+    sqlalchemy.Column('cumulative_losses', sqlalchemy.types.Integer),
+    sqlalchemy.Column('streak', sqlalchemy.types.Integer),
+    sqlalchemy.PrimaryKeyConstraint('game_id', 'team_key'),
+    sqlalchemy.Index('ix_schedule_season', 'season'),
+    sqlalchemy.Index('ix_schedule_team', 'team_key'))
+
+boxscore = sqlalchemy.Table(
+    'boxscore', metadata,
+    sqlalchemy.Column('game_id', sqlalchemy.types.Text),
+    sqlalchemy.Column('team_key', sqlalchemy.types.Integer),
+    sqlalchemy.Column('is_home', sqlalchemy.types.Boolean),
+    sqlalchemy.Column('player_key', sqlalchemy.types.Integer),
+    sqlalchemy.Column('mp', sqlalchemy.types.Float),
+    sqlalchemy.Column('fg', sqlalchemy.types.Integer),
+    sqlalchemy.Column('fga', sqlalchemy.types.Integer),
+    sqlalchemy.Column('fg_perc', sqlalchemy.types.Float),
+    sqlalchemy.Column('3p', sqlalchemy.types.Integer),
+    sqlalchemy.Column('3pa', sqlalchemy.types.Integer),
+    sqlalchemy.Column('3p_perc', sqlalchemy.types.Float),
+    sqlalchemy.Column('ft', sqlalchemy.types.Integer),
+    sqlalchemy.Column('fta', sqlalchemy.types.Integer),
+    sqlalchemy.Column('ft_perc', sqlalchemy.types.Float),
+    sqlalchemy.Column('orb', sqlalchemy.types.Integer),
+    sqlalchemy.Column('drb', sqlalchemy.types.Integer),
+    sqlalchemy.Column('trb', sqlalchemy.types.Integer),
+    sqlalchemy.Column('ast', sqlalchemy.types.Integer),
+    sqlalchemy.Column('stl', sqlalchemy.types.Integer),
+    sqlalchemy.Column('blk', sqlalchemy.types.Integer),
+    sqlalchemy.Column('tov', sqlalchemy.types.Integer),
+    sqlalchemy.Column('pf', sqlalchemy.types.Integer),
+    sqlalchemy.Column('pts', sqlalchemy.types.Integer),
+    sqlalchemy.Column('plus_minus', sqlalchemy.types.Integer),
+    sqlalchemy.Column('ts_perc', sqlalchemy.types.Float),
+    sqlalchemy.Column('efg_perc', sqlalchemy.types.Float),
+    sqlalchemy.Column('3par', sqlalchemy.types.Float),
+    sqlalchemy.Column('ftr', sqlalchemy.types.Float),
+    sqlalchemy.Column('orb_perc', sqlalchemy.types.Float),
+    sqlalchemy.Column('drb_perc', sqlalchemy.types.Float),
+    sqlalchemy.Column('trb_perc', sqlalchemy.types.Float),
+    sqlalchemy.Column('ast_perc', sqlalchemy.types.Float),
+    sqlalchemy.Column('stl_perc', sqlalchemy.types.Float),
+    sqlalchemy.Column('blk_perc', sqlalchemy.types.Float),
+    sqlalchemy.Column('tov_perc', sqlalchemy.types.Float),
+    sqlalchemy.Column('usg_perc', sqlalchemy.types.Float),
+    sqlalchemy.Column('ortg', sqlalchemy.types.Float),
+    sqlalchemy.Column('drtg', sqlalchemy.types.Float),
+    sqlalchemy.Column('bpm', sqlalchemy.types.Float),
+    sqlalchemy.Column('pts_q1', sqlalchemy.types.Float),
+    sqlalchemy.Column('pts_q2', sqlalchemy.types.Float),
+    sqlalchemy.Column('pts_q3', sqlalchemy.types.Float),
+    sqlalchemy.Column('pts_q4', sqlalchemy.types.Float),
+    sqlalchemy.PrimaryKeyConstraint('game_id', 'team_key', 'player_key'),
+    sqlalchemy.Index('ix_boxscore_team', 'team_key'),
+    sqlalchemy.Index('ix_boxscore_player', 'player_key'))
+
+plus_minus = sqlalchemy.Table(
+    'plus_minus', metadata,
+    sqlalchemy.Column('game_id', sqlalchemy.types.Text),
+    sqlalchemy.Column('player_key', sqlalchemy.types.Integer),
+    sqlalchemy.Column('subin_minute', sqlalchemy.types.Float),
+    sqlalchemy.Column('subout_minute', sqlalchemy.types.Float),
+    sqlalchemy.Column('plus_minus', sqlalchemy.types.Integer),
+    sqlalchemy.PrimaryKeyConstraint('game_id', 'player_key', 'subin_minute'),
+    sqlalchemy.Index('ix_plus_minus_player', 'player_key'))
+
+play_by_play = sqlalchemy.Table(
+    'play_by_play', metadata,
+    sqlalchemy.Column('game_id', sqlalchemy.types.Text),
+    sqlalchemy.Column('play_number', sqlalchemy.types.Integer),
+    sqlalchemy.Column('quarter', sqlalchemy.types.SmallInteger),
+    sqlalchemy.Column('start_quarter', sqlalchemy.types.SmallInteger),
+    sqlalchemy.Column('end_game', sqlalchemy.types.SmallInteger),
+    sqlalchemy.Column('elapsed', sqlalchemy.types.Integer),
+    sqlalchemy.Column('is_home', sqlalchemy.types.SmallInteger),
+    sqlalchemy.Column('score_away', sqlalchemy.types.SmallInteger),
+    sqlalchemy.Column('score_home', sqlalchemy.types.SmallInteger),
+    sqlalchemy.Column('points', sqlalchemy.types.SmallInteger),
+    sqlalchemy.Column('event_type', sqlalchemy.types.Text),
+    sqlalchemy.Column('player_key', sqlalchemy.types.Integer),
+    sqlalchemy.Column('other_player_key', sqlalchemy.types.Integer),
+    sqlalchemy.Column('event', sqlalchemy.types.Text),
+    sqlalchemy.PrimaryKeyConstraint('game_id', 'play_number'),
+    sqlalchemy.Index('ix_play_by_play_player', 'player_key'))
+
+# ingestion state of each (game, dataset) pair
+sync_ledger = sqlalchemy.Table(
+    'sync_ledger', metadata,
+    sqlalchemy.Column('game_id', sqlalchemy.types.Text),
+    sqlalchemy.Column('dataset', sqlalchemy.types.Text),
+    sqlalchemy.Column('status', sqlalchemy.types.Text),
+    sqlalchemy.Column('fetched_at', sqlalchemy.types.DateTime),
+    sqlalchemy.Column('etag', sqlalchemy.types.Text),
+    sqlalchemy.Column('last_modified', sqlalchemy.types.Text),
+    sqlalchemy.Column('content_hash', sqlalchemy.types.Text),
+    sqlalchemy.Column('error_count', sqlalchemy.types.Integer),
+    sqlalchemy.Column('error', sqlalchemy.types.Text),
+    sqlalchemy.Column('next_attempt', sqlalchemy.types.DateTime),
+    sqlalchemy.PrimaryKeyConstraint('game_id', 'dataset'),
+    sqlalchemy.Index(
+        'ix_sync_ledger_dataset_status', 'dataset', 'status', 'game_id'))
+
+# games waiting to be synced by the queue workers and the lease under which
+# a worker holds each claimed game
+sync_queue = sqlalchemy.Table(
+    'sync_queue', metadata,
+    sqlalchemy.Column('game_id', sqlalchemy.types.Text),
+    sqlalchemy.Column('enqueued_at', sqlalchemy.types.DateTime),
+    sqlalchemy.Column('lease_id', sqlalchemy.types.Text),
+    sqlalchemy.Column('lease_owner', sqlalchemy.types.Text),
+    sqlalchemy.Column('lease_expires', sqlalchemy.types.DateTime),
+    sqlalchemy.Column('claim_count', sqlalchemy.types.Integer),
+    sqlalchemy.PrimaryKeyConstraint('game_id'),
+    sqlalchemy.Index('ix_sync_queue_lease_expires', 'lease_expires'))
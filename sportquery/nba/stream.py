@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+import argparse
+from collections import deque
+from concurrent.futures import (
+    FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait)
+import multiprocessing
+import sys
+import threading
+
+import pandas as pd
+
+from .game import fetch_game, game_tables, parse_game
+from .. import metrics
+
+
+def iter_games(game_ids, datasets=tuple(game_tables), fetch_workers=4,
+               parse_workers=0, prefetch=None, ordered=True, on_error=None):
+    """
+    Download and parse the game level tables of `game_ids`, yielding each
+    game as soon as it is ready. At most `prefetch` games are in flight or
+    waiting to be consumed at any time, so memory use stays constant however
+    many games are streamed, and pages are only requested as fast as the
+    consumer keeps up. Closing the generator, e.g. by breaking out of the
+    loop, cancels the games not started yet.
+
+    Pages are parsed in the fetching threads, or by a pool of
+    `parse_workers` processes. A process pool parses faster but, like any
+    multiprocessing code, requires the calling script to be guarded by
+    `if __name__ == '__main__':`.
+
+    Args:
+        game_ids (iterable of str): unique game identifiers, consumed lazily
+        datasets (iterable of str, optional): game level tables to parse
+        fetch_workers (int, optional): number of games downloaded concurrently
+        parse_workers (int, optional): number of page parsing processes, 0 to
+            parse in the fetching threads
+        prefetch (int, optional): maximum number of games in flight, twice the
+            number of workers by default
+        ordered (bool, optional): yield the games in the order of `game_ids`,
+            otherwise as soon as each game is parsed, which keeps the workers
+            busy when some games are slower than others
+        on_error (callable, optional): function called with a game id and the
+            exception raised while fetching or parsing it, after which the
+            game is skipped; exceptions are raised by default
+
+    Yields:
+        tuple: game id and dict of pandas dataframes keyed by table name
+
+    """
+    datasets = [table for table in game_tables if table in datasets]
+    prefetch = prefetch or 2 * (fetch_workers + parse_workers)
+
+    fetch_slots = threading.Semaphore(fetch_workers)
+
+    if parse_workers:
+        # spawn rather than fork, the parent process is multithreaded
+        parse_pool = ProcessPoolExecutor(
+            parse_workers, mp_context=multiprocessing.get_context('spawn'))
+    else:
+        parse_pool = None
+
+    def load(game_id):
+        with fetch_slots:
+            pages = fetch_game(game_id, datasets)
+
+        if parse_pool is None:
+            tables = parse_game(pages, game_id)
+        else:
+            tables, measurements = parse_pool.submit(
+                metrics.measured, parse_game, pages, game_id).result()
+            metrics.merge(measurements)
+
+        # pages fetched only to parse other tables are left out
+        return {table: tables[table] for table in datasets}
+
+    # threads waiting on a parse process do not hold a fetch slot
+    load_pool = ThreadPoolExecutor(fetch_workers + parse_workers)
+
+    game_ids = iter(game_ids)
+    pending = deque()
+
+    def submit():
+        game_id = next(game_ids, None)
+        if game_id is not None:
+            pending.append((game_id, load_pool.submit(load, game_id)))
+
+        return game_id is not None
+
+    try:
+        while len(pending) < prefetch and submit():
+            pass
+
+        while pending:
+            if ordered:
+                game_id, future = pending.popleft()
+            else:
+                done, _ = wait(
+                    [future for _, future in pending],
+                    return_when=FIRST_COMPLETED)
+                game_id, future = next(
+                    entry for entry in pending if entry[1] in done)
+                pending.remove((game_id, future))
+
+            try:
+                tables = future.result()
+            except Exception as exc:
+                if on_error is None:
+                    raise
+                on_error(game_id, exc)
+                tables = None
+
+            submit()
+
+            if tables is not None:
+                yield game_id, tables
+    finally:
+        load_pool.shutdown(cancel_futures=True)
+        if parse_pool is not None:
+            parse_pool.shutdown(cancel_futures=True)
+
+
+def iter_table(table, game_ids, batch_size=None, **kwargs):
+    """
+    Stream one game level table of `game_ids` (see `iter_games`), game by
+    game or in batches of games concatenated into one dataframe
+
+    Args:
+        table (str): game level table name
+        game_ids (iterable of str): unique game identifiers
+        batch_size (int, optional): number of games per yielded dataframe,
+            one game at a time by default
+        **kwargs: options of `iter_games`
+
+    Yields:
+        tuple or pd.DataFrame: game id and dataframe of each game, or one
+            dataframe per batch of games if `batch_size` is given
+
+    """
+    games = iter_games(game_ids, datasets=[table], **kwargs)
+
+    if batch_size is None:
+        for game_id, tables in games:
+            yield game_id, tables[table]
+        return
+
+    batch = []
+    for _, tables in games:
+        batch.append(tables[table])
+        if len(batch) >= batch_size:
+            yield pd.concat(batch, ignore_index=True)
+            batch = []
+
+    if batch:
+        yield pd.concat(batch, ignore_index=True)
+
+
+def iter_boxscores(game_ids, batch_size=None, **kwargs):
+    """
+    Stream the boxscores of `game_ids` (see `iter_table`)
+
+    Args:
+        game_ids (iterable of str): unique game identifiers
+        batch_size (int, optional): number of games per yielded dataframe
+        **kwargs: options of `iter_games`
+
+    Yields:
+        tuple or pd.DataFrame: game id and boxscore of each game, or one
+            dataframe per batch of games
+
+    """
+    return iter_table('boxscore', game_ids, batch_size, **kwargs)
+
+
+def iter_plus_minus(game_ids, batch_size=None, **kwargs):
+    """
+    Stream the plus-minus tables of `game_ids` (see `iter_table`)
+
+    Args:
+        game_ids (iterable of str): unique game identifiers
+        batch_size (int, optional): number of games per yielded dataframe
+        **kwargs: options of `iter_games`
+
+    Yields:
+        tuple or pd.DataFrame: game id and plus-minus table of each game, or
+            one dataframe per batch of games
+
+    """
+    return iter_table('plus_minus', game_ids, batch_size, **kwargs)
+
+
+def iter_play_by_play(game_ids, batch_size=None, **kwargs):
+    """
+    Stream the play-by-play tables of `game_ids` (see `iter_table`)
+
+    Args:
+        game_ids (iterable of str): unique game identifiers
+        batch_size (int, optional): number of games per yielded dataframe
+        **kwargs: options of `iter_games`
+
+    Yields:
+        tuple or pd.DataFrame: game id and play-by-play table of each game,
+            or one dataframe per batch of games
+
+    """
+    return iter_table('play_by_play', game_ids, batch_size, **kwargs)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Stream an NBA game table as csv to stdout')
+    parser.add_argument('table', choices=list(game_tables))
+    parser.add_argument(
+        'game_ids', nargs='*',
+        help='unique game identifiers, read from stdin by default')
+    parser.add_argument('--fetch-workers', type=int, default=4)
+    parser.add_argument('--parse-workers', type=int, default=0)
+    parser.add_argument('--batch-size', type=int, default=25)
+    parser.add_argument(
+        '--unordered', action='store_true',
+        help='write the games as soon as they are parsed')
+    args = parser.parse_args()
+
+    game_ids = args.game_ids or (
+        line.strip() for line in sys.stdin if line.strip())
+
+    header = True
+    for df in iter_table(
+            args.table, game_ids, args.batch_size,
+            fetch_workers=args.fetch_workers,
+            parse_workers=args.parse_workers,
+            ordered=not args.unordered):
+        df.to_csv(sys.stdout, header=header, index=False)
+        header = False
@@ -1,246 +1,397 @@
 #!/usr/bin/env python3
+from functools import partial
+import time
+
 import pandas as pd
 import prefect
 from prefect import Flow, Parameter, task
-import sqlalchemy
-
-from . import engine
-from .boxscore import get_boxscore
-from .play_by_play import get_play_by_play
-from .plus_minus import get_plus_minus
-from .schedule import get_schedule
-from .teams import get_teams
+from prefect.triggers import all_finished
+
+from . import latest_season
+from .columnar import export_dates, game_dates, missing_dates
+from .dimensions import resolve_keys, seed_dimensions
+from .game import fetch_game, game_tables, train_archive
+from .ledger import (
+    backfill_ledger, error_count, failed_datasets, failure_entries,
+    ingest_game, pending_game_ids, upgrade_ledger)
+from .migrate import check_schema
+from .schedule import get_league_schedule, team_schedules
+from .schema import metadata, schedule, sync_ledger
+from .. import metrics
+from ..pipeline import run_pipeline
+from ..storage import get_engine
+from ..writer import BulkWriter, notify_commit
+
+# seconds after which the games buffered by the writer are committed even if
+# the batch is not full
+checkpoint_interval = 60
 
 
 @task
 def initialize_database():
     """
-    Establish a sqlite database engine and return a connection to the database.
-
-    """
-    metadata = sqlalchemy.MetaData()
-
-    sqlalchemy.Table(
-        'schedule', metadata,
-        sqlalchemy.Column('game_id', sqlalchemy.types.Text),
-        sqlalchemy.Column('season', sqlalchemy.types.Integer),
-        sqlalchemy.Column('game_number', sqlalchemy.types.Integer),
-        sqlalchemy.Column('datetime', sqlalchemy.types.DateTime),
-        sqlalchemy.Column('is_home', sqlalchemy.types.Boolean),
-        sqlalchemy.Column('team', sqlalchemy.types.Text),
-        sqlalchemy.Column('opponent', sqlalchemy.types.Text),
-        sqlalchemy.Column('outcome', sqlalchemy.types.Text),
-        sqlalchemy.Column('team_points', sqlalchemy.types.Integer),
-        sqlalchemy.Column('opponent_points', sqlalchemy.types.Integer),
-        sqlalchemy.Column('cumulative_wins', sqlalchemy.types.Integer),
-        sqlalchemy.Column('cumulative_losses', sqlalchemy.types.Integer),
-        sqlalchemy.Column('streak', sqlalchemy.types.Integer),
-        sqlalchemy.UniqueConstraint('game_id', 'team'))
-
-    sqlalchemy.Table(
-        'boxscore', metadata,
-        sqlalchemy.Column('game_id', sqlalchemy.types.Text),
-        sqlalchemy.Column('team', sqlalchemy.types.Text),
-        sqlalchemy.Column('is_home', sqlalchemy.types.Boolean),
-        sqlalchemy.Column('player', sqlalchemy.types.Text),
-        sqlalchemy.Column('mp', sqlalchemy.types.Integer),
-        sqlalchemy.Column('fg', sqlalchemy.types.Integer),
-        sqlalchemy.Column('fga', sqlalchemy.types.Integer),
-        sqlalchemy.Column('fg_perc', sqlalchemy.types.Float),
-        sqlalchemy.Column('3p', sqlalchemy.types.Integer),
-        sqlalchemy.Column('3pa', sqlalchemy.types.Integer),
-        sqlalchemy.Column('3p_perc', sqlalchemy.types.Float),
-        sqlalchemy.Column('ft', sqlalchemy.types.Integer),
-        sqlalchemy.Column('fta', sqlalchemy.types.Integer),
-        sqlalchemy.Column('ft_perc', sqlalchemy.types.Float),
-        sqlalchemy.Column('orb', sqlalchemy.types.Integer),
-        sqlalchemy.Column('drb', sqlalchemy.types.Integer),
-        sqlalchemy.Column('trb', sqlalchemy.types.Integer),
-        sqlalchemy.Column('ast', sqlalchemy.types.Integer),
-        sqlalchemy.Column('stl', sqlalchemy.types.Integer),
-        sqlalchemy.Column('blk', sqlalchemy.types.Integer),
-        sqlalchemy.Column('tov', sqlalchemy.types.Integer),
-        sqlalchemy.Column('pf', sqlalchemy.types.Integer),
-        sqlalchemy.Column('pts', sqlalchemy.types.Integer),
-        sqlalchemy.Column('plus_minus', sqlalchemy.types.Integer),
-        sqlalchemy.Column('ts_perc', sqlalchemy.types.Float),
-        sqlalchemy.Column('efg_perc', sqlalchemy.types.Float),
-        sqlalchemy.Column('3par', sqlalchemy.types.Float),
-        sqlalchemy.Column('ftr', sqlalchemy.types.Float),
-        sqlalchemy.Column('orb_perc', sqlalchemy.types.Float),
-        sqlalchemy.Column('drb_perc', sqlalchemy.types.Float),
-        sqlalchemy.Column('trb_perc', sqlalchemy.types.Float),
-        sqlalchemy.Column('ast_perc', sqlalchemy.types.Float),
-        sqlalchemy.Column('stl_perc', sqlalchemy.types.Float),
-        sqlalchemy.Column('blk_perc', sqlalchemy.types.Float),
-        sqlalchemy.Column('tov_perc', sqlalchemy.types.Float),
-        sqlalchemy.Column('usg_perc', sqlalchemy.types.Float),
-        sqlalchemy.Column('ortg', sqlalchemy.types.Float),
-        sqlalchemy.Column('drtg', sqlalchemy.types.Float),
-        sqlalchemy.Column('bpm', sqlalchemy.types.Float),
-        sqlalchemy.Column('pts_q1', sqlalchemy.types.Float),
-        sqlalchemy.Column('pts_q2', sqlalchemy.types.Float),
-        sqlalchemy.Column('pts_q3', sqlalchemy.types.Float),
-        sqlalchemy.Column('pts_q4', sqlalchemy.types.Float))
-
-    sqlalchemy.Table(
-        'plus_minus', metadata,
-        sqlalchemy.Column('game_id', sqlalchemy.types.Text),
-        sqlalchemy.Column('player', sqlalchemy.types.Text),
-        sqlalchemy.Column('subin_minute', sqlalchemy.types.Float),
-        sqlalchemy.Column('subout_minute', sqlalchemy.types.Float),
-        sqlalchemy.Column('plus_minus', sqlalchemy.types.Integer))
-
-    sqlalchemy.Table(
-        'play_by_play', metadata,
-        sqlalchemy.Column('game_id', sqlalchemy.types.Text),
-        sqlalchemy.Column('city', sqlalchemy.types.Text),
-        sqlalchemy.Column('is_home', sqlalchemy.types.Integer),
-        sqlalchemy.Column('quarter', sqlalchemy.types.Integer),
-        sqlalchemy.Column('start_quarter', sqlalchemy.types.Integer),
-        sqlalchemy.Column('end_game', sqlalchemy.types.Integer),
-        sqlalchemy.Column('time', sqlalchemy.types.Text),
-        sqlalchemy.Column('score_away', sqlalchemy.types.Integer),
-        sqlalchemy.Column('score_home', sqlalchemy.types.Integer),
-        sqlalchemy.Column('points', sqlalchemy.types.Integer),
-        sqlalchemy.Column('event', sqlalchemy.types.Text))
+    Establish an engine for the database configured by `SPORTQUERY_DB`
+    (a local sqlite database by default) and return a connection to the
+    database. Missing tables and indexes are created, and the sync ledger of
+    databases created before the ledger existed is backfilled from the fact
+    tables. Databases whose tables have an outdated layout are refused until
+    they are migrated (see `sportquery.nba.migrate`).
+
+    """
+    engine = get_engine('nba')
 
+    check_schema(engine)
     metadata.create_all(engine)
 
+    for table in metadata.tables.values():
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
+    upgrade_ledger(engine)
+    seed_dimensions(engine)
+    backfill_ledger(engine)
+
     return engine
 
 
+def changed_rows(df, existing, key):
+    """
+    Rows of `df` which are missing from `existing` or differ from the row
+    with the same `key` in `existing`. Missing values compare equal.
+
+    Args:
+        df (pd.DataFrame): new rows
+        existing (pd.DataFrame): rows currently stored
+        key (list of str): key column names
+
+    Returns:
+        pd.DataFrame: new or changed rows of `df`
+
+    """
+    merged = df.merge(
+        existing, on=key, how='left', suffixes=('', '_old'), indicator=True)
+    changed = merged._merge == 'left_only'
+
+    for column in df.columns.difference(key):
+        new, old = merged[column], merged[f'{column}_old']
+        changed |= ~((new == old) | (new.isna() & old.isna()))
+
+    return df[changed.values]
+
+
+def sync_schedule(conn, season):
+    """
+    Sync the league schedule of `season`. Only new or changed rows are
+    upserted, and games which no longer appear on the schedule are deleted.
+
+    Args:
+        conn (sqlalchemy.engine.base.Engine): sqlalchemy engine connection
+        season (int): NBA season year
+
+    Returns:
+        list of str: identifiers of the games whose rows changed
+
+    """
+    logger = prefect.context.get('logger')
+
+    key = ['game_id', 'team_key']
+
+    logger.info(f'syncing schedule: {season}')
+
+    with metrics.timer('schedule_seconds'):
+        df = team_schedules(get_league_schedule(season))
+    df.insert(1, 'season', season)
+    df = resolve_keys(conn, {schedule.name: df})[schedule.name]
+
+    existing = pd.read_sql(
+        schedule.select().where(schedule.c.season == season), conn)
+
+    changed = changed_rows(df, existing, key)
+    stale = existing.merge(
+        df[key], on=key, how='left', indicator=True
+    ).query('_merge == "left_only"')
+
+    logger.info(
+        f'{len(changed)} changed and {len(stale)} stale schedule rows')
+
+    with BulkWriter(conn, metadata, upsert=True) as writer:
+        writer.add({schedule.name: changed})
+
+    with conn.begin() as transaction:
+        for game_id, team_key in stale[key].itertuples(index=False):
+            transaction.execute(schedule.delete().where(
+                (schedule.c.game_id == game_id)
+                & (schedule.c.team_key == team_key)))
+
+    if len(stale) > 0:
+        notify_commit([schedule.name])
+
+    return sorted(set(changed.game_id) | set(stale.game_id))
+
+
 @task
-def update_schedules(conn, current_season, start_season=2003):
+def update_schedules(conn, current_season=None, start_season=2003):
     """
-    Iterate over all seasons from `start_season` to `current_season` inclusive
-    and pull team schedules. The schedules for the latest season in the
-    database are dropped and repopulated.
+    Iterate over all seasons from the latest season in the database (or
+    `start_season` for an empty database) to `current_season` inclusive and
+    sync the league schedule (see `sync_schedule`).
 
     Args:
         conn (sqlalchemy.engine.base.Engine): sqlalchemy engine connection
-        current_season (int): year of the last season to pull data for
+        current_season (int, optional): year of the last season to pull data
+            for, the season in progress or last played by default
         start_season (int, optional): year of the first season to pull data for
 
     Returns:
-        pd.DataFrame: pandas dataframe containing the `game_id` of all
-            completed games
+        list of str: identifiers of the games whose rows changed
 
     """
-    logger = prefect.context.get('logger')
+    current_season = current_season or latest_season()
+
+    game_ids = []
 
     start_season = pd.read_sql(
         'select max(season) from schedule', conn
     ).squeeze() or start_season
 
-    logger.info(f'latest season = {start_season}, dropping and updating...')
-    conn.execute(f'delete from schedule where season == {start_season}')
-
     for season in range(start_season, current_season + 1):
-        for team in get_teams(season):
-            logger.info(f'syncing schedule: {season} {team}')
-            schedule = get_schedule(team, season)
-            schedule.insert(1, 'season', season)
-            schedule.to_sql('schedule', conn, if_exists='append', index=False)
+        game_ids.extend(sync_schedule(conn, season))
 
-    completed_games = pd.read_sql(
-        'select distinct game_id from schedule where outcome is not null', conn)
+    return sorted(set(game_ids))
 
-    return completed_games.game_id
 
-
-@task
-def update_boxscores(conn, game_ids):
+def sync_game(conn, game_id):
     """
-    Pull basic and advanced boxscore numbers at the player and team level
-    for the specified NBA games and perist to the database.
+    Fetch the boxscore, plus-minus and play-by-play pages of `game_id` and
+    write all three tables, along with their sync ledger entries, in one
+    transaction. Rows of a previous sync of the game are replaced.
 
     Args:
         conn (sqlalchemy.engine.base.Engine): sqlalchemy engine connection
-        game_ids (pd.Series): unique game identifiers to pull boxscore stats for
+        game_id (str): unique game identifier
 
     Returns:
         None
 
     """
-    recorded_game_ids = pd.read_sql(
-        'select distinct game_id from boxscore', conn
-    ).squeeze()
+    tables = ingest_game(fetch_game(game_id), game_id)
 
-    unrecorded_game_ids = game_ids[~game_ids.isin(recorded_game_ids)]
+    replace = {table: 'game_id' for table in game_tables}
 
+    with BulkWriter(conn, metadata, upsert=True, replace=replace) as writer:
+        writer.add(resolve_keys(conn, tables))
+
+
+def sync_games(conn, game_ids, fetch_workers=4, parse_workers=None,
+               batch_size=25, datasets=None):
+    """
+    Pull the boxscore, plus-minus and play-by-play data of `game_ids` and
+    persist to the database. Games are synced by a concurrent pipeline of
+    fetch threads, parse processes and a single database writer which
+    buffers games and commits each batch, along with its ledger entries, in
+    one transaction. The rows of a game replace the rows of earlier syncs,
+    e.g. the plays appended while the game was live (see
+    `sportquery.nba.live`). Batches are also committed every
+    `checkpoint_interval` seconds, so an interrupted sync resumes from its
+    last checkpoint. The archive dictionary is trained once enough pages
+    are archived (see `sportquery.nba.game.train_archive`).
+
+    A game whose pages fail to download or parse does not stop the sync:
+    the failure is recorded in the ledger entry of the failing dataset with
+    the exception and the time of the next attempt, and the dataset is
+    quarantined after repeated failures other than throttled requests and
+    network errors (see `sportquery.nba.ledger.requeue`).
+
+    Args:
+        conn (sqlalchemy.engine.base.Engine): sqlalchemy engine connection
+        game_ids (iterable of str): unique game identifiers
+        fetch_workers (int, optional): number of games downloaded concurrently
+        parse_workers (int, optional): number of page parsing processes
+        batch_size (int, optional): number of games written per transaction
+        datasets (list of str, optional): game level tables to sync, all by
+            default
+
+    Returns:
+        list of str: identifiers of the synced games
+
+    """
     logger = prefect.context.get('logger')
 
-    for game_id in unrecorded_game_ids.values:
-        logger.info(f'syncing {game_id}')
-        boxscore = get_boxscore(game_id)
-        boxscore.to_sql('boxscore', conn, if_exists='append', index=False)
+    fetch, ingest = fetch_game, ingest_game
+    if datasets is not None:
+        fetch = partial(fetch_game, datasets=datasets)
+        ingest = partial(ingest_game, datasets=datasets)
+
+    synced = []
+
+    replace = {table: 'game_id' for table in datasets or game_tables}
+
+    with BulkWriter(
+            conn, metadata, batch_size=batch_size, upsert=True,
+            max_delay=checkpoint_interval, replace=replace) as writer:
+
+        def write(games):
+            for game_id, tables in games:
+                logger.info(f'syncing {game_id}')
+                writer.add(resolve_keys(conn, tables))
+                synced.append(game_id)
+
+        def on_error(game_id, exc):
+            failed = failed_datasets(exc, datasets or tuple(game_tables))
+            entries = failure_entries(
+                game_id, exc, error_count(conn, game_id, failed), failed)
+            logger.warning(
+                f'failed to sync {game_id} ({entries.status[0]}): '
+                f'{entries.error[0]}')
+            metrics.inc('games_failed_total', status=entries.status[0])
+            writer.add({sync_ledger.name: entries})
+
+        # the writer batches games itself, results are handed over one by one
+        run_pipeline(
+            list(game_ids), fetch, ingest, write,
+            fetch_workers=fetch_workers,
+            parse_workers=parse_workers,
+            batch_size=1,
+            on_error=on_error)
+
+    # the sync does not depend on the archive, which may be trained later
+    try:
+        train_archive()
+    except Exception as exc:
+        logger.warning(f'failed to train the archive dictionary: {exc}')
+
+    return synced
 
 
 @task
-def update_plus_minus(conn, game_ids):
+def update_games(conn, fetch_workers=4, parse_workers=None, batch_size=25,
+                 distributed=False):
     """
-    Pull individual player plus-minus for all substitutions over the course
-    of the specified NBA games and persist to the database.
+    Sync all completed NBA games which the sync ledger does not record as
+    synced (see `sync_games`).
+
+    With `distributed`, the games are instead added to the work queue
+    table and synced by this process along with any queue workers started
+    on other hosts (see `sportquery.nba.work_queue`), each claiming batches
+    of games under a lease.
 
     Args:
         conn (sqlalchemy.engine.base.Engine): sqlalchemy engine connection
-        game_ids (pd.Series): unique game identifiers to pull boxscore stats for
+        fetch_workers (int, optional): number of games downloaded concurrently
+        parse_workers (int, optional): number of page parsing processes
+        batch_size (int, optional): number of games written per transaction
+        distributed (bool, optional): sync the games through the work queue
 
     Returns:
-        None
+        list of str: identifiers of the games synced by this process
 
     """
-    recorded_game_ids = pd.read_sql(
-        'select distinct game_id from plus_minus', conn
-    ).squeeze()
+    game_ids = pending_game_ids(conn)
 
-    unrecorded_game_ids = game_ids[~game_ids.isin(recorded_game_ids)]
+    if not distributed:
+        return sync_games(
+            conn, game_ids, fetch_workers, parse_workers, batch_size)
+
+    from .work_queue import enqueue, run_worker
 
     logger = prefect.context.get('logger')
+    logger.info(f'{enqueue(conn, game_ids)} games added to the work queue')
 
-    for game_id in unrecorded_game_ids.values:
-        logger.info(f'syncing {game_id}')
-        plus_minus = get_plus_minus(game_id)
-        plus_minus.to_sql('plus_minus', conn, if_exists='append', index=False)
+    return run_worker(
+        conn, fetch_workers=fetch_workers, parse_workers=parse_workers,
+        batch_size=batch_size)
 
 
 @task
-def update_play_by_play(conn, game_ids):
+def update_columnar(conn, schedule_ids, game_ids):
     """
-    Pull individual play descriptions and score data over the course
-    of the specified NBA games and persist to the database.
+    Refresh the parquet mirror of the schedule, boxscore, plus-minus and
+    play-by-play tables: the date partitions of the changed schedule rows and
+    synced games are rewritten from the database, along with any dates not
+    yet mirrored.
+    Skipped if pyarrow is not installed.
 
     Args:
         conn (sqlalchemy.engine.base.Engine): sqlalchemy engine connection
-        game_ids (pd.Series): unique game identifiers to pull boxscore stats for
+        schedule_ids (list of str): games with changed schedule rows
+        game_ids (list of str): synced games
 
     Returns:
         None
 
     """
-    recorded_game_ids = pd.read_sql(
-        'select distinct game_id from play_by_play', conn
-    ).squeeze()
+    logger = prefect.context.get('logger')
 
-    unrecorded_game_ids = game_ids[~game_ids.isin(recorded_game_ids)]
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        logger.info('pyarrow is not installed, skipping the parquet mirror')
+        return
 
+    dates = set(missing_dates(conn))
+    dates.update(game_dates(schedule_ids))
+    dates.update(game_dates(game_ids))
+
+    logger.info(f'exporting {len(dates)} game dates to parquet')
+    export_dates(conn, sorted(dates))
+
+
+@task
+def start_metrics():
+    """
+    Clear the measurements of previous runs in this process
+
+    Returns:
+        float: unix time at which the run started
+
+    """
+    metrics.registry.snapshot(reset=True)
+
+    return time.time()
+
+
+@task(trigger=all_finished)
+def export_metrics(started_at):
+    """
+    Export the fetch, parse and write measurements of the run as a
+    prometheus text file and a json run summary, whether or not the run
+    succeeded. Skipped if `SPORTQUERY_METRICS` is 'off'.
+
+    Args:
+        started_at (float): unix time at which the run started
+
+    Returns:
+        None
+
+    """
     logger = prefect.context.get('logger')
 
-    for game_id in unrecorded_game_ids.values:
-        logger.info(f'syncing {game_id}')
-        play_by_play = get_play_by_play(game_id)
-        play_by_play.to_sql('play_by_play', conn, if_exists='append',
-                            index=False)
+    if metrics.level == 'off':
+        return
+
+    path = metrics.export('nba', started_at)
+    logger.info(f'metrics written to {path}')
 
 
 with Flow('sync NBA database') as flow:
-    current_season = Parameter('current_season', default=2021)
-    conn = initialize_database()
-    game_ids = update_schedules(conn, current_season)
-    update_boxscores(conn, game_ids)
-    update_plus_minus(conn, game_ids)
-    update_play_by_play(conn, game_ids)
+    current_season = Parameter('current_season', default=None)
+    start_season = Parameter('start_season', default=2003)
+    fetch_workers = Parameter('fetch_workers', default=4)
+    parse_workers = Parameter('parse_workers', default=None)
+    batch_size = Parameter('batch_size', default=25)
+    distributed = Parameter('distributed', default=False)
+    started_at = start_metrics()
+    conn = initialize_database(upstream_tasks=[started_at])
+    schedules = update_schedules(conn, current_season, start_season)
+    games = update_games(
+        conn, fetch_workers, parse_workers, batch_size, distributed,
+        upstream_tasks=[schedules])
+    columnar = update_columnar(conn, schedules, games)
+    export_metrics(started_at, upstream_tasks=[columnar])
+
+# the metrics are exported whatever the outcome of the sync, so the run state
+# is taken from the sync tasks
+flow.set_reference_tasks([columnar])
 
 if __name__ == '__main__':
-    flow.run(current_season=2021)
+    flow.run()
@@ -1,28 +1,34 @@
-import re
+from . import base_url, season_lifetime, team_abbr
+from ..extract import Document
+from ..fetch import get_page
 
-import pandas as pd
-import requests
 
-from . import base_url, team_abbr
-
-
-def get_teams(season):
+def teams_url(season):
     """
-    Return list of `team_abbr` strings for the given season
+    Url of the league page of `season`, which lists its teams
 
     Args:
-        season (int): The requested season year to pull teams for
+        season (int): NBA season year
 
     Returns:
-        list of str: abbreviated name of all teams in season `season`
+        str: page url
+
+    """
+    return f'{base_url}/leagues/NBA_{season}.html'
+
 
+def parse_teams(text):
     """
-    season_url = f'{base_url}/leagues/NBA_{season}.html'
-    r = requests.get(season_url)
+    Parse the list of `team_abbr` strings from the raw html of a season page
 
-    html = re.sub('(<!--)|(-->)', '', r.text, flags=re.DOTALL)
+    Args:
+        text (str): season page html
 
-    df, = pd.read_html(html, attrs={'id': 'team-stats-base'})
+    Returns:
+        list of str: abbreviated name of all teams in the season
+
+    """
+    df = Document(text).table('team-stats-base')
 
     df['Team'] = df.Team.str.rstrip('*')  # remove trailing asterisk
 
@@ -31,6 +37,22 @@ def get_teams(season):
     return [team_abbr[team_full] for team_full in teams_full]
 
 
+def get_teams(season):
+    """
+    Return list of `team_abbr` strings for the given season
+
+    Args:
+        season (int): The requested season year to pull teams for
+
+    Returns:
+        list of str: abbreviated name of all teams in season `season`
+
+    """
+    text = get_page(teams_url(season), **season_lifetime(season))
+
+    return parse_teams(text)
+
+
 if __name__ == '__main__':
 
     teams = get_teams(2004)
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+import argparse
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import os
+import socket
+import threading
+import time
+import uuid
+
+import pandas as pd
+import prefect
+import sqlalchemy
+
+from .schema import metadata, sync_queue
+from .sync_database import sync_games
+from .. import client as client_module
+from ..client import RateLimiter
+from ..storage import get_engine
+from ..writer import BulkWriter
+
+# a claimed game returns to the queue if its worker stops renewing the lease
+# for `lease_duration`, e.g. after a crash; leases are renewed every
+# `heartbeat_interval` seconds while the games are synced
+lease_duration = timedelta(minutes=5)
+heartbeat_interval = 60
+
+# seconds between polls of an empty queue by workers started with `follow`
+poll_interval = 30
+
+
+def worker_name():
+    """
+    Name identifying the leases of this process, `{hostname}:{pid}`
+
+    """
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def enqueue(conn, game_ids):
+    """
+    Add games to the work queue. Games already queued, including games
+    currently leased by a worker, are left untouched.
+
+    Args:
+        conn (sqlalchemy.engine.base.Engine): sqlalchemy engine connection
+        game_ids (iterable of str): unique game identifiers
+
+    Returns:
+        int: number of games added
+
+    """
+    game_ids = pd.Series(sorted(set(game_ids)), dtype=object)
+
+    queued = pd.read_sql(sqlalchemy.select(sync_queue.c.game_id), conn)
+    game_ids = game_ids[~game_ids.isin(queued.game_id)]
+
+    with BulkWriter(conn, metadata, upsert=True) as writer:
+        writer.add({sync_queue.name: pd.DataFrame({
+            'game_id': game_ids, 'enqueued_at': datetime.now()})})
+
+    return len(game_ids)
+
+
+def claim(conn, owner, limit=25, lease=lease_duration):
+    """
+    Lease up to `limit` queued games which are not leased, or whose lease
+    expired, to `owner`. The games are selected and leased by a single
+    UPDATE statement: on PostgreSQL the selected rows are locked with FOR
+    UPDATE SKIP LOCKED, so concurrent workers claim disjoint games without
+    waiting on each other, and on SQLite the statement holds the database
+    write lock, so claims are serialized.
+
+    Args:
+        conn (sqlalchemy.engine.base.Engine): sqlalchemy engine connection
+        owner (str): name of the claiming worker
+        limit (int, optional): maximum number of games to claim
+        lease (datetime.timedelta, optional): lease duration
+
+    Returns:
+        tuple: lease identifier and list of claimed game identifiers
+
+    """
+    lease_id = uuid.uuid4().hex
+    now = datetime.now()
+
+    available = (
+        sqlalchemy.select(sync_queue.c.game_id)
+        .where(sqlalchemy.or_(
+            sync_queue.c.lease_expires.is_(None),
+            sync_queue.c.lease_expires < now))
+        .order_by(sync_queue.c.game_id)
+        .limit(limit))
+
+    if conn.dialect.name == 'postgresql':
+        available = available.with_for_update(skip_locked=True)
+
+    with conn.begin() as transaction:
+        transaction.execute(
+            sync_queue.update()
+            .where(sync_queue.c.game_id.in_(available.scalar_subquery()))
+            .values(
+                lease_id=lease_id,
+                lease_owner=owner,
+                lease_expires=now + lease,
+                claim_count=sqlalchemy.func.coalesce(
+                    sync_queue.c.claim_count, 0) + 1))
+
+        game_ids = transaction.execute(
+            sqlalchemy.select(sync_queue.c.game_id)
+            .where(sync_queue.c.lease_id == lease_id)
+            .order_by(sync_queue.c.game_id)).scalars().all()
+
+    return lease_id, game_ids
+
+
+def renew(conn, lease_id, lease=lease_duration):
+    """
+    Extend the lease `lease_id` by `lease` from now
+
+    Args:
+        conn (sqlalchemy.engine.base.Engine): sqlalchemy engine connection
+        lease_id (str): lease identifier returned by `claim`
+        lease (datetime.timedelta, optional): lease duration
+
+    Returns:
+        int: number of games still held under the lease
+
+    """
+    with conn.begin() as transaction:
+        return transaction.execute(
+            sync_queue.update()
+            .where(sync_queue.c.lease_id == lease_id)
+            .values(lease_expires=datetime.now() + lease)).rowcount
+
+
+def complete(conn, lease_id):
+    """
+    Remove the games held under the lease `lease_id` from the queue. Games
+    whose lease expired and was claimed by another worker are left to it.
+
+    Args:
+        conn (sqlalchemy.engine.base.Engine): sqlalchemy engine connection
+        lease_id (str): lease identifier returned by `claim`
+
+    Returns:
+        int: number of games removed
+
+    """
+    with conn.begin() as transaction:
+        return transaction.execute(
+            sync_queue.delete()
+            .where(sync_queue.c.lease_id == lease_id)).rowcount
+
+
+def release(conn, lease_id):
+    """
+    Return the games held under the lease `lease_id` to the queue without
+    waiting for the lease to expire
+
+    Args:
+        conn (sqlalchemy.engine.base.Engine): sqlalchemy engine connection
+        lease_id (str): lease identifier returned by `claim`
+
+    Returns:
+        int: number of games released
+
+    """
+    with conn.begin() as transaction:
+        return transaction.execute(
+            sync_queue.update()
+            .where(sync_queue.c.lease_id == lease_id)
+            .values(lease_id=None, lease_owner=None,
+                    lease_expires=None)).rowcount
+
+
+def queue_status(conn):
+    """
+    Queued games with their lease owner and expiry, leased games first
+
+    Args:
+        conn (sqlalchemy.engine.base.Engine): sqlalchemy engine connection
+
+    Returns:
+        pd.DataFrame: one row per queued game
+
+    """
+    return pd.read_sql(
+        sync_queue.select().order_by(
+            sync_queue.c.lease_owner.is_(None), sync_queue.c.game_id),
+        conn)
+
+
+@contextmanager
+def heartbeat(conn, lease_id, count, lease=lease_duration,
+              interval=heartbeat_interval):
+    """
+    Renew the lease `lease_id` every `interval` seconds from a background
+    thread while the managed block runs, warning if games of the lease were
+    lost to other workers after it expired
+
+    Args:
+        conn (sqlalchemy.engine.base.Engine): sqlalchemy engine connection
+        lease_id (str): lease identifier returned by `claim`
+        count (int): number of games claimed under the lease
+        lease (datetime.timedelta, optional): lease duration
+        interval (float, optional): seconds between renewals
+
+    """
+    logger = prefect.context.get('logger')
+    stopped = threading.Event()
+
+    def beat():
+        while not stopped.wait(interval):
+            try:
+                held = renew(conn, lease_id, lease)
+            except sqlalchemy.exc.DBAPIError as exc:
+                logger.warning(f'failed to renew lease {lease_id}: {exc}')
+                continue
+            if held < count:
+                logger.warning(
+                    f'lease {lease_id} expired, {count - held} games '
+                    'were claimed by other workers')
+
+    thread = threading.Thread(target=beat, daemon=True)
+    thread.start()
+
+    try:
+        yield
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def run_worker(conn=None, owner=None, claim_size=None, lease=lease_duration,
+               fetch_workers=4, parse_workers=None, batch_size=25,
+               follow=False):
+    """
+    Claim batches of games from the work queue and sync them (see
+    `sportquery.nba.sync_database.sync_games`) until the queue is empty.
+    Any number of workers may run against the same database, on one host
+    or several, each downloading at its own `SPORTQUERY_RPM` rate. A worker
+    which crashes stops renewing its leases and its games are claimed by
+    the other workers once the leases expire.
+
+    Args:
+        conn (sqlalchemy.engine.base.Engine, optional): sqlalchemy engine
+        owner (str, optional): worker name, `{hostname}:{pid}` by default
+        claim_size (int, optional): number of games per claim, `batch_size`
+            by default
+        lease (datetime.timedelta, optional): lease duration
+        fetch_workers (int, optional): number of games downloaded concurrently
+        parse_workers (int, optional): number of page parsing processes
+        batch_size (int, optional): number of games written per transaction
+        follow (bool, optional): keep polling the queue once it is empty
+
+    Returns:
+        list of str: identifiers of the games synced by this worker
+
+    """
+    conn = conn if conn is not None else get_engine('nba')
+    owner = owner or worker_name()
+    claim_size = claim_size or batch_size
+
+    logger = prefect.context.get('logger')
+
+    synced = []
+
+    while True:
+        lease_id, game_ids = claim(conn, owner, claim_size, lease)
+
+        if not game_ids:
+            if not follow:
+                return synced
+            time.sleep(poll_interval)
+            continue
+
+        logger.info(f'{owner} claimed {len(game_ids)} games')
+
+        try:
+            with heartbeat(conn, lease_id, len(game_ids), lease):
+                synced.extend(sync_games(
+                    conn, game_ids, fetch_workers, parse_workers,
+                    batch_size))
+        except BaseException:
+            release(conn, lease_id)
+            raise
+
+        complete(conn, lease_id)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Sync the games of the NBA work queue')
+    parser.add_argument(
+        '--claim-size', type=int, help='games claimed at a time')
+    parser.add_argument(
+        '--lease', type=float, default=lease_duration.total_seconds(),
+        help='lease duration (seconds)')
+    parser.add_argument('--fetch-workers', type=int, default=4)
+    parser.add_argument('--parse-workers', type=int)
+    parser.add_argument('--batch-size', type=int, default=25)
+    parser.add_argument(
+        '--rpm', type=float,
+        help='requests per minute of this worker, SPORTQUERY_RPM by default')
+    parser.add_argument(
+        '--follow', action='store_true',
+        help='keep waiting for new games once the queue is empty')
+    args = parser.parse_args()
+
+    if args.rpm:
+        client_module.client.limiter = RateLimiter(args.rpm)
+
+    run_worker(
+        claim_size=args.claim_size,
+        lease=timedelta(seconds=args.lease),
+        fetch_workers=args.fetch_workers,
+        parse_workers=args.parse_workers,
+        batch_size=args.batch_size,
+        follow=args.follow)
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+""" Columnar Parquet mirror of database tables partitioned by season. """
+import os
+from pathlib import Path
+
+partition_columns = ['season', 'date']
+
+# file marking a partition written without rows, ignored by pyarrow readers
+# like every file name starting with an underscore
+empty_marker = '_empty'
+
+
+def _pyarrow():
+    """
+    Import pyarrow, which is an optional dependency
+
+    """
+    try:
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError(
+            'the parquet store requires pyarrow, install it with '
+            '`pip install sportquery[parquet]`')
+
+    return pyarrow
+
+
+def arrow_schema(table):
+    """
+    Arrow schema of a database `table`. Text columns are dictionary encoded
+    so that repeated strings (teams, players, game ids) are stored and
+    loaded once per file.
+
+    Args:
+        table (sqlalchemy.Table): database table
+
+    Returns:
+        pyarrow.Schema: arrow schema with one field per table column
+
+    """
+    import sqlalchemy
+
+    pa = _pyarrow()
+
+    types = [
+        (sqlalchemy.types.Boolean, pa.bool_()),
+        (sqlalchemy.types.Integer, pa.int64()),
+        (sqlalchemy.types.Float, pa.float64()),
+        (sqlalchemy.types.DateTime, pa.timestamp('us')),
+        (sqlalchemy.types.Text, pa.dictionary(pa.int32(), pa.string()))]
+
+    def arrow_type(column):
+        for sql_type, value in types:
+            if isinstance(column.type, sql_type):
+                return value
+        raise TypeError(f'unsupported column type {column.type!r}')
+
+    return pa.schema([
+        pa.field(column.name, arrow_type(column)) for column in table.columns])
+
+
+class ParquetStore:
+    """
+    Directory of Parquet datasets, one per table, partitioned by season and
+    game date using hive style directory names, e.g.
+    `root/boxscore/season=2021/date=2021-01-02/part-0.parquet`. Each date
+    partition holds a single file which is replaced as a whole, so a
+    partition is always read in a consistent state. Partitions written
+    without rows hold an `_empty` marker instead, which readers skip.
+
+    Args:
+        root (pathlib.Path): store root directory
+
+    """
+    def __init__(self, root):
+        self.root = Path(root).expanduser()
+
+    def _path(self, name, season, date):
+        """
+        File path of the partition of table `name`
+
+        """
+        return (self.root / name / f'season={season}' /
+                f'date={date:%Y-%m-%d}' / 'part-0.parquet')
+
+    def partitions(self, name):
+        """
+        Partitions of table `name` present in the store, including the
+        partitions written without rows
+
+        Args:
+            name (str): table name
+
+        Returns:
+            set of tuple: (season, date string) of each partition
+
+        """
+        paths = [
+            *(self.root / name).glob('season=*/date=*/*.parquet'),
+            *(self.root / name).glob(f'season=*/date=*/{empty_marker}')]
+
+        return {
+            (int(path.parts[-3].split('=')[1]), path.parts[-2].split('=')[1])
+            for path in paths}
+
+    def write_partition(self, table, season, date, df):
+        """
+        Replace the partition of `table` for `season` and `date` with the
+        rows of `df`. An empty `df` replaces the partition file by a marker
+        recording that the date was written.
+
+        Args:
+            table (sqlalchemy.Table): database table described by `df`
+            season (int): season year
+            date (datetime.date): game date
+            df (pd.DataFrame): partition rows with the table columns
+
+        """
+        pa = _pyarrow()
+
+        path = self._path(table.name, season, date)
+        marker = path.with_name(empty_marker)
+
+        if len(df) == 0:
+            if path.exists():
+                path.unlink()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            marker.touch()
+            return
+
+        # partition keys are encoded in the directory names only
+        schema = arrow_schema(table)
+        for name in partition_columns:
+            if name in schema.names:
+                schema = schema.remove(schema.get_field_index(name))
+
+        df = df[schema.names].astype(
+            {field.name: 'Int64' for field in schema
+             if pa.types.is_integer(field.type)})
+
+        arrow_table = pa.Table.from_pandas(
+            df, schema=schema, preserve_index=False)
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+
+        pa.parquet.write_table(
+            arrow_table, tmp, compression='zstd', use_dictionary=True)
+        os.replace(tmp, path)
+
+        if marker.exists():
+            marker.unlink()
+
+    def read_arrow(self, name, columns=None, filters=None, memory_map=True):
+        """
+        Read table `name` as an arrow table. Only the requested `columns`
+        are decoded, and `filters` on the partition columns skip whole
+        directories while filters on other columns are evaluated against
+        the row group statistics before any data is read.
+
+        Args:
+            name (str): table name
+            columns (list of str, optional): columns to read, all by default
+            filters (list of tuple, optional): predicates in disjunctive
+                normal form, e.g. `[('season', '>=', 2019), ('team_key',
+                '=', 2)]`, following `pyarrow.parquet.read_table`
+            memory_map (bool, optional): memory map the files instead of
+                reading them into memory
+
+        Returns:
+            pyarrow.Table: table contents
+
+        """
+        pa = _pyarrow()
+
+        partitioning = pa.dataset.partitioning(
+            pa.schema([
+                ('season', pa.int64()), ('date', pa.date32())]),
+            flavor='hive')
+
+        return pa.parquet.read_table(
+            self.root / name,
+            columns=columns,
+            filters=filters,
+            memory_map=memory_map,
+            partitioning=partitioning)
+
+    def read(self, name, columns=None, filters=None, memory_map=True):
+        """
+        Read table `name` as a pandas dataframe (see `read_arrow`). Text
+        columns become categoricals and numeric columns without missing
+        values are converted without copying.
+
+        Args:
+            name (str): table name
+            columns (list of str, optional): columns to read, all by default
+            filters (list of tuple, optional): row predicates
+            memory_map (bool, optional): memory map the files
+
+        Returns:
+            pd.DataFrame: table contents
+
+        """
+        return self.read_arrow(
+            name, columns=columns, filters=filters, memory_map=memory_map
+        ).to_pandas(split_blocks=True, self_destruct=True)
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+""" Staged fetch, parse and write pipeline joined by bounded queues. """
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+import os
+import queue
+import threading
+
+from . import metrics
+
+_done = object()
+
+
+def run_pipeline(items, fetch, parse, write, fetch_workers=4,
+                 parse_workers=None, batch_size=25, on_error=None):
+    """
+    Process `items` through three overlapping stages:
+
+        1. a pool of `fetch_workers` threads calling `fetch(item)`
+        2. a pool of `parse_workers` processes calling `parse(payload, item)`
+        3. a single writer, running in the calling thread, which receives
+           lists of `(item, result)` pairs of length `batch_size`
+
+    The stages are joined by bounded queues, so fast stages block once they
+    are far enough ahead of slow ones and memory use stays constant
+    regardless of the number of items. The first exception raised by any
+    stage stops the pipeline and is re-raised after in-flight work drains,
+    unless an `on_error` handler is given: exceptions raised while fetching
+    or parsing an item are then passed to the handler, in the writer thread,
+    and the pipeline moves on to the next item.
+    Measurements recorded with `sportquery.metrics` by the parse processes
+    are merged into the registry of the calling process.
+
+    Args:
+        items (iterable): work items, e.g. game ids
+        fetch (callable): function mapping an item to a payload (page html)
+        parse (callable): picklable module-level function mapping a payload
+            and its item to a result
+        write (callable): function persisting a list of (item, result) pairs
+        fetch_workers (int, optional): number of concurrent fetch threads
+        parse_workers (int, optional): number of parse processes; defaults
+            to the number of cpus
+        batch_size (int, optional): number of results passed to each `write`
+        on_error (callable, optional): function called with an item and the
+            exception raised while fetching or parsing it
+
+    Returns:
+        None
+
+    """
+    parse_workers = parse_workers or os.cpu_count()
+    queue_size = 2 * max(fetch_workers, parse_workers)
+
+    items = iter(items)
+    items_lock = threading.Lock()
+    fetched = queue.Queue(maxsize=queue_size)
+    parsed = queue.Queue()
+    # bounds the number of results submitted for parsing but not yet written
+    slots = threading.Semaphore(queue_size)
+    stop = threading.Event()
+
+    def fetch_worker():
+        while not stop.is_set():
+            with items_lock:
+                item = next(items, _done)
+            if item is _done:
+                return
+
+            try:
+                fetched.put((item, fetch(item), None))
+            except Exception as exc:
+                fetched.put((item, None, exc))
+
+    def fetch_stage():
+        workers = [
+            threading.Thread(target=fetch_worker, daemon=True)
+            for _ in range(fetch_workers)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        fetched.put(_done)
+
+    def parse_stage():
+        # spawn rather than fork, the parent process is multithreaded
+        context = multiprocessing.get_context('spawn')
+
+        with ProcessPoolExecutor(parse_workers, mp_context=context) as pool:
+            while True:
+                entry = fetched.get()
+                if entry is _done:
+                    break
+
+                item, payload, exc = entry
+                slots.acquire()
+
+                if exc is None:
+                    try:
+                        future = pool.submit(
+                            metrics.measured, parse, payload, item)
+                    except BrokenProcessPool as broken:
+                        exc = broken
+
+                if exc is not None:
+                    future = Future()
+                    future.set_exception(exc)
+
+                future.add_done_callback(
+                    lambda f, item=item: parsed.put((item, f)))
+
+        parsed.put(_done)
+
+    stages = [
+        threading.Thread(target=fetch_stage, daemon=True),
+        threading.Thread(target=parse_stage, daemon=True)]
+    for stage in stages:
+        stage.start()
+
+    error = None
+    batch = []
+
+    while True:
+        entry = parsed.get()
+        if entry is _done:
+            break
+
+        item, future = entry
+        slots.release()
+
+        if error is not None:
+            continue  # drain in-flight work after a failure
+
+        try:
+            try:
+                result, measurements = future.result()
+            except Exception as exc:
+                # a crashed parse process is not the fault of the item
+                if on_error is None or isinstance(exc, BrokenProcessPool):
+                    raise
+                on_error(item, exc)
+                continue
+
+            metrics.merge(measurements)
+            batch.append((item, result))
+            if len(batch) >= batch_size:
+                write(batch)
+                batch = []
+        except Exception as exc:
+            error = exc
+            stop.set()
+
+    for stage in stages:
+        stage.join()
+
+    if error is not None:
+        raise error
+
+    if batch:
+        write(batch)
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+""" Lazily created database engines configured from the environment. """
+import os
+import threading
+
+from . import cachedir
+
+# connection pool of server databases (ignored by sqlite)
+pool_size = int(os.getenv('SPORTQUERY_POOL_SIZE', 5))
+max_overflow = int(os.getenv('SPORTQUERY_MAX_OVERFLOW', 10))
+pool_timeout = float(os.getenv('SPORTQUERY_POOL_TIMEOUT', 30))
+pool_recycle = int(os.getenv('SPORTQUERY_POOL_RECYCLE', 1800))
+connect_timeout = int(os.getenv('SPORTQUERY_CONNECT_TIMEOUT', 10))
+
+_engines = {}
+_lock = threading.Lock()
+
+
+def database_url(name):
+    """
+    Connection string of the database `name`: the value of the
+    `SPORTQUERY_DB` environment variable if set, otherwise a sqlite database
+    file in the sportquery cache directory.
+
+    Args:
+        name (str): database name, e.g. 'nba'
+
+    Returns:
+        str: sqlalchemy database url
+
+    """
+    url = os.getenv('SPORTQUERY_DB')
+
+    if url:
+        return url
+
+    return f'sqlite:///{(cachedir / f"{name}.db").expanduser()}'
+
+
+def create_engine(url):
+    """
+    Create a sqlalchemy engine for `url`. Sqlite engines are tuned for bulk
+    writes and their database directory is created if missing. Engines of
+    server databases use a bounded connection pool whose size and timeouts
+    are read from the `SPORTQUERY_POOL_*` and `SPORTQUERY_CONNECT_TIMEOUT`
+    environment variables.
+
+    Args:
+        url (str): sqlalchemy database url
+
+    Returns:
+        sqlalchemy.engine.base.Engine: database engine
+
+    """
+    import sqlalchemy
+    from .writer import apply_sqlite_pragmas
+
+    url = sqlalchemy.engine.make_url(url)
+
+    if url.get_backend_name() == 'sqlite':
+        if url.database and url.database != ':memory:':
+            os.makedirs(os.path.dirname(url.database) or '.', exist_ok=True)
+        engine = sqlalchemy.create_engine(url)
+        apply_sqlite_pragmas(engine)
+        return engine
+
+    connect_args = {}
+    if url.get_backend_name() in ('postgresql', 'mysql'):
+        connect_args['connect_timeout'] = connect_timeout
+
+    return sqlalchemy.create_engine(
+        url,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=pool_timeout,
+        pool_recycle=pool_recycle,
+        pool_pre_ping=True,
+        connect_args=connect_args)
+
+
+def get_engine(name):
+    """
+    Return the engine of the database `name`, creating it on first use.
+    No connection is opened until the engine is used.
+
+    Args:
+        name (str): database name, e.g. 'nba'
+
+    Returns:
+        sqlalchemy.engine.base.Engine: database engine
+
+    """
+    with _lock:
+        if name not in _engines:
+            _engines[name] = create_engine(database_url(name))
+
+        return _engines[name]
@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+""" Batched bulk database writer with backend specific fast paths. """
+from collections import defaultdict
+import io
+import sqlite3
+import time
+
+import pandas as pd
+import sqlalchemy
+from sqlalchemy.dialects import postgresql, sqlite
+
+from . import metrics
+
+sqlite_pragmas = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'temp_store': 'MEMORY',
+    'cache_size': -64000,  # 64 MB page cache
+    'busy_timeout': 30000}
+
+# maximum number of bound parameters in a single sqlite statement
+sqlite_max_variables = (
+    32766 if sqlite3.sqlite_version_info >= (3, 32) else 999)
+
+# callables notified with the names of the tables changed by each commit
+commit_listeners = []
+
+
+def notify_commit(tables):
+    """
+    Notify the registered commit listeners that `tables` were changed by a
+    committed transaction, e.g. to invalidate cached query results.
+
+    Args:
+        tables (iterable of str): names of the changed tables
+
+    """
+    tables = frozenset(tables)
+
+    for listener in commit_listeners:
+        listener(tables)
+
+
+def apply_sqlite_pragmas(engine):
+    """
+    Tune every new connection of a sqlite `engine` for bulk writes:
+    write-ahead logging, relaxed fsync and a larger page cache.
+    Engines of other backends are left untouched.
+
+    Args:
+        engine (sqlalchemy.engine.base.Engine): sqlalchemy engine
+
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @sqlalchemy.event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for key, value in sqlite_pragmas.items():
+            cursor.execute(f'PRAGMA {key} = {value}')
+        cursor.close()
+
+
+def unique_key(table):
+    """
+    Column names of the primary key of `table`, or of its first unique
+    constraint if it has no primary key.
+
+    Args:
+        table (sqlalchemy.Table): database table
+
+    Returns:
+        list of str or None: key column names, None if the table has no key
+
+    """
+    if table.primary_key.columns:
+        return [column.name for column in table.primary_key.columns]
+
+    for constraint in table.constraints:
+        if isinstance(constraint, sqlalchemy.UniqueConstraint):
+            return [column.name for column in constraint.columns]
+
+    return None
+
+
+def to_records(df):
+    """
+    Rows of `df` as dicts with missing values replaced by None
+
+    """
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+
+class BulkWriter:
+    """
+    Buffer dataframes destined for several tables and flush them in batches,
+    each inside a single transaction. Every call to `add` is a unit which is
+    never split across transactions, so e.g. all tables of one game are
+    committed together.
+
+    With `max_delay`, a batch is also flushed once its first unit has been
+    buffered for `max_delay` seconds, bounding the work lost if the process
+    is killed while the units arrive slowly.
+
+    Rows are written with multi-row INSERT statements on SQLite and with
+    COPY FROM STDIN on PostgreSQL (psycopg2). With `upsert=True`, rows
+    conflicting with existing rows on the primary key (or first unique
+    constraint) of their table replace them. With `replace`, the existing
+    rows of a table sharing a value of the given column with the buffered
+    rows, e.g. all rows of the same game, are deleted first in the same
+    transaction, so rows no longer produced are not left behind.
+
+    Args:
+        engine (sqlalchemy.engine.base.Engine): sqlalchemy engine
+        metadata (sqlalchemy.MetaData): metadata describing the tables
+        batch_size (int, optional): number of units buffered before a flush
+        upsert (bool, optional): replace rows with conflicting keys
+        max_delay (float, optional): seconds after which a partial batch is
+            flushed
+        replace (dict, optional): column name keyed by the name of each
+            table whose rows are replaced, e.g. `{'boxscore': 'game_id'}`
+
+    """
+    def __init__(self, engine, metadata, batch_size=25, upsert=False,
+                 max_delay=None, replace=None):
+        self.engine = engine
+        self.metadata = metadata
+        self.batch_size = batch_size
+        self.upsert = upsert
+        self.max_delay = max_delay
+        self.replace = replace or {}
+        self.buffer = defaultdict(list)
+        self.pending = 0
+        self.started = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.flush()
+
+    def add(self, frames):
+        """
+        Buffer a unit of rows and flush if the batch is full
+
+        Args:
+            frames (dict): pandas dataframes keyed by destination table name
+
+        """
+        for table, df in frames.items():
+            self.buffer[table].append(df)
+
+        if not self.pending:
+            self.started = time.monotonic()
+        self.pending += 1
+
+        if self.pending >= self.batch_size or (
+                self.max_delay is not None and
+                time.monotonic() - self.started >= self.max_delay):
+            self.flush()
+
+    def flush(self):
+        """
+        Write all buffered rows in one transaction
+
+        """
+        if not self.pending:
+            return
+
+        with metrics.timer('transaction_seconds'):
+            with self.engine.begin() as conn:
+                for name, frames in self.buffer.items():
+                    df = pd.concat(frames, axis=0, ignore_index=True)
+                    if name in self.replace and len(df) > 0:
+                        self.delete(
+                            conn, self.metadata.tables[name],
+                            self.replace[name], df[self.replace[name]])
+                    if len(df) > 0:
+                        with metrics.timer('write_seconds', table=name):
+                            self.write(conn, self.metadata.tables[name], df)
+                        metrics.inc('rows_written_total', len(df), table=name)
+
+        notify_commit(self.buffer)
+
+        self.buffer.clear()
+        self.pending = 0
+
+    def delete(self, conn, table, column, values):
+        """
+        Delete the rows of `table` whose `column` holds any of `values`
+
+        Args:
+            conn (sqlalchemy.engine.Connection): connection inside an open
+                transaction
+            table (sqlalchemy.Table): table to delete rows from
+            column (str): column name, e.g. 'game_id'
+            values (pd.Series): column values of the deleted rows
+
+        """
+        values = values.dropna().unique().tolist()
+
+        for start in range(0, len(values), sqlite_max_variables):
+            conn.execute(table.delete().where(table.c[column].in_(
+                values[start:start + sqlite_max_variables])))
+
+    def write(self, conn, table, df):
+        """
+        Write `df` to `table` using the fastest path of the backend
+
+        Args:
+            conn (sqlalchemy.engine.Connection): connection inside an open
+                transaction
+            table (sqlalchemy.Table): destination table
+            df (pd.DataFrame): rows to write
+
+        """
+        if conn.dialect.driver == 'psycopg2':
+            cursor = conn.connection.cursor()
+            try:
+                self._copy(conn, cursor, table, df)
+            finally:
+                cursor.close()
+        else:
+            self._insert(conn, table, df)
+
+    def _key(self, table):
+        """
+        Conflict key of `table`, None when not upserting
+
+        """
+        return unique_key(table) if self.upsert else None
+
+    def _insert(self, conn, table, df):
+        """
+        Multi-row INSERT, chunked to respect the sqlite bound parameter limit
+
+        """
+        dialect = conn.dialect.name
+        key = self._key(table)
+        records = to_records(df)
+
+        if dialect == 'sqlite':
+            chunk_size = max(sqlite_max_variables // len(df.columns), 1)
+        else:
+            chunk_size = len(records)
+
+        for start in range(0, len(records), chunk_size):
+            chunk = records[start:start + chunk_size]
+
+            if key and dialect in ('sqlite', 'postgresql'):
+                insert = {'sqlite': sqlite, 'postgresql': postgresql}[
+                    dialect].insert(table).values(chunk)
+                updates = {
+                    column: insert.excluded[column]
+                    for column in df.columns if column not in key}
+                statement = (
+                    insert.on_conflict_do_update(
+                        index_elements=key, set_=updates)
+                    if updates else
+                    insert.on_conflict_do_nothing(index_elements=key))
+                conn.execute(statement)
+            elif dialect == 'sqlite':
+                conn.execute(table.insert().values(chunk))
+            else:
+                conn.execute(table.insert(), chunk)
+
+    def _copy(self, conn, cursor, table, df):
+        """
+        PostgreSQL COPY FROM STDIN, staged through a temporary table when
+        upserting
+
+        """
+        df = df.copy()
+
+        # COPY does not cast '1.0' to integer like INSERT does
+        for column in table.columns:
+            if (column.name in df and isinstance(
+                    column.type, sqlalchemy.types.Integer)
+                    and df[column.name].dtype.kind == 'f'):
+                df[column.name] = df[column.name].round().astype('Int64')
+
+        buffer = io.StringIO()
+        df.to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+
+        preparer = conn.dialect.identifier_preparer
+        target = preparer.format_table(table)
+        columns = ', '.join(preparer.quote(column) for column in df.columns)
+        key = self._key(table)
+
+        if key is None:
+            cursor.copy_expert(
+                f'COPY {target} ({columns}) FROM STDIN WITH (FORMAT csv)',
+                buffer)
+            return
+
+        staging = preparer.quote(f'staging_{table.name}')
+        cursor.execute(
+            f'CREATE TEMP TABLE {staging} '
+            f'(LIKE {target} INCLUDING DEFAULTS) ON COMMIT DROP')
+        cursor.copy_expert(
+            f'COPY {staging} ({columns}) FROM STDIN WITH (FORMAT csv)',
+            buffer)
+
+        conflict = ', '.join(preparer.quote(column) for column in key)
+        updates = ', '.join(
+            f'{preparer.quote(column)} = EXCLUDED.{preparer.quote(column)}'
+            for column in df.columns if column not in key)
+        action = f'DO UPDATE SET {updates}' if updates else 'DO NOTHING'
+
+        cursor.execute(
+            f'INSERT INTO {target} ({columns}) '
+            f'SELECT {columns} FROM {staging} '
+            f'ON CONFLICT ({conflict}) {action}')
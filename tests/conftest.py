@@ -0,0 +1,57 @@
+import os
+from pathlib import Path
+import tempfile
+
+import pytest
+import sqlalchemy
+
+# keep the page cache, archive and metrics of the tests out of the home
+# directory, before sportquery reads the environment
+os.environ['SPORTQUERY_CACHE'] = tempfile.mkdtemp(prefix='sportquery-')
+
+from sportquery.cache import CachedPage  # noqa: E402
+from sportquery.nba.dimensions import seed_dimensions  # noqa: E402
+from sportquery.nba.game import game_tables  # noqa: E402
+from sportquery.nba.schema import metadata  # noqa: E402
+
+# game of the recorded boxscore, plus-minus and play-by-play pages
+game_id = '202102090SAS'
+
+
+@pytest.fixture
+def fixtures():
+    """
+    Directory of the recorded pages and expected outputs
+
+    """
+    return Path(__file__).parent / 'fixtures'
+
+
+@pytest.fixture
+def pages(fixtures):
+    """
+    Recorded pages of `game_id` keyed by table name, as returned by
+    `fetch_game`
+
+    """
+    return {
+        table: CachedPage(
+            page_url(game_id),
+            (fixtures / f'{table}_{game_id}.html').read_text(),
+            None, None, 1612915200.)
+        for table, (page_url, _) in game_tables.items()}
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """
+    Empty sqlite database with the NBA tables and seeded dimensions
+
+    """
+    engine = sqlalchemy.create_engine(f'sqlite:///{tmp_path / "nba.db"}')
+    metadata.create_all(engine)
+    seed_dimensions(engine)
+
+    yield engine
+
+    engine.dispose()
@@ -0,0 +1,136 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+from sportquery import aio
+from sportquery.cache import PageCache
+from sportquery.client import RateLimiter
+from sportquery.nba import aio as nba_aio
+
+from conftest import game_id
+
+web = pytest.importorskip('aiohttp.web')
+test_utils = pytest.importorskip('aiohttp.test_utils')
+
+
+def serve(handler, test):
+    """
+    Run the coroutine function `test` with the url of a local server
+    answering every request with `handler`
+
+    """
+    async def main():
+        app = web.Application()
+        app.router.add_get('/{path:.*}', handler)
+
+        async with test_utils.TestServer(app) as server:
+            return await test(str(server.make_url('/page.html')))
+
+    return asyncio.run(main())
+
+
+def async_client(**kwargs):
+    return aio.AsyncClient(
+        limiter=RateLimiter(6000, burst=100), backoff=.01, **kwargs)
+
+
+def test_retries():
+    statuses = [503, 429, 200]
+
+    async def handler(request):
+        status = statuses.pop(0)
+        headers = {'Retry-After': '0'} if status == 429 else {}
+        return web.Response(status=status, text='page', headers=headers)
+
+    async def test(url):
+        client = async_client()
+        try:
+            return await client.get(url)
+        finally:
+            await client.close()
+
+    r = serve(handler, test)
+
+    assert r.status == 200
+    assert r.content == b'page'
+    assert statuses == []
+
+
+def test_gives_up():
+    async def handler(request):
+        return web.Response(status=500)
+
+    async def test(url):
+        client = async_client(max_retries=1)
+        try:
+            return await client.get(url)
+        finally:
+            await client.close()
+
+    assert serve(handler, test).status == 500
+
+
+def test_fetch_page(monkeypatch, tmp_path):
+    cache = PageCache(tmp_path)
+    monkeypatch.setattr(aio, 'page_cache', cache)
+    received = []
+
+    async def handler(request):
+        received.append(request.headers.get('If-None-Match'))
+        if request.headers.get('If-None-Match') == '"v1"':
+            return web.Response(status=304)
+        return web.Response(
+            text='café', headers={'ETag': '"v1"'},
+            content_type='text/html', charset='utf-8')
+
+    async def test(url):
+        client = async_client()
+        monkeypatch.setattr(aio, 'async_client', client)
+        try:
+            first = await aio.fetch_page(url, ttl=60)
+            cached = await aio.fetch_page(url, ttl=60)
+            revalidated = await aio.fetch_page(url, ttl=0)
+        finally:
+            await client.close()
+        return url, first, cached, revalidated
+
+    url, first, cached, revalidated = serve(handler, test)
+
+    assert first.text == cached.text == revalidated.text == 'café'
+    assert received == [None, '"v1"']
+    assert cache.get(url).etag == '"v1"'
+
+
+def test_error_status(monkeypatch, tmp_path):
+    monkeypatch.setattr(aio, 'page_cache', PageCache(tmp_path))
+
+    async def handler(request):
+        return web.Response(status=404)
+
+    async def test(url):
+        client = async_client()
+        monkeypatch.setattr(aio, 'async_client', client)
+        try:
+            await aio.get_page(url)
+        finally:
+            await client.close()
+
+    with pytest.raises(requests.HTTPError):
+        serve(handler, test)
+
+
+def test_get_game(monkeypatch, pages):
+    monkeypatch.setattr(aio, '_executor', ThreadPoolExecutor(2))
+
+    async def fetch_page(url, ttl=None, final_at=None):
+        return next(page for page in pages.values() if page.url == url)
+
+    monkeypatch.setattr(nba_aio, 'fetch_page', fetch_page)
+
+    tables = asyncio.run(nba_aio.get_game(game_id))
+
+    assert set(tables) == set(pages)
+    assert (tables['boxscore'].game_id == game_id).all()
+    assert tables['plus_minus'].player_id.notna().all()
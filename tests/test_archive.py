@@ -0,0 +1,124 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from sportquery.archive import PageArchive
+from sportquery.cache import CachedPage
+from sportquery.nba import game
+
+pytest.importorskip('zstandard')
+
+
+def version(url, text, fetched_at=1.):
+    return CachedPage(url, text, 'etag', 'Tue, 09 Feb 2021', fetched_at)
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return PageArchive(tmp_path / 'archive')
+
+
+def test_round_trip(archive, pages):
+    for page in pages.values():
+        assert archive.put(2021, page)
+
+    for page in pages.values():
+        assert archive.get(2021, page.url) == page
+        assert archive.get('2021', page.url) == page
+
+    assert archive.get(2021, 'missing') is None
+    assert archive.get(2020, pages['boxscore'].url) is None
+
+
+def test_unchanged_pages_are_skipped(archive):
+    assert archive.put(2021, version('a', 'first'))
+    assert not archive.put(2021, version('a', 'first', fetched_at=2.))
+    assert archive.put(2021, version('a', 'second'))
+
+    assert archive.get(2021, 'a').text == 'second'
+    assert len(archive.entries(2021)) == 1
+
+
+def test_entries_and_pages(archive):
+    for url in ['c', 'a', 'b']:
+        archive.put(2020, version(url, url * 100))
+    archive.put(2021, version('d', 'd'))
+    archive.put(2020, version('c', 'changed'))
+
+    assert archive.partitions() == ['2020', '2021']
+    assert [entry['url'] for entry in archive.entries(2020)] == [
+        'a', 'b', 'c']
+    assert [page.text for page in archive.pages(2020, {'a', 'c'})] == [
+        'a' * 100, 'changed']
+
+
+def put_pages(root, count):
+    archive = PageArchive(root)
+
+    return sum(
+        archive.put(2021, version(f'page{number}', f'text {number}'))
+        for number in range(count))
+
+
+def test_concurrent_writers(archive):
+    with ProcessPoolExecutor(4) as pool:
+        archived = list(pool.map(put_pages, [archive.root] * 4, [50] * 4))
+
+    index = (archive.root / '2021.index').read_text().splitlines()
+
+    assert sum(archived) == 50
+    assert len(index) == 50
+    assert {archive.get(2021, f'page{number}').text
+            for number in range(50)} == {
+        f'text {number}' for number in range(50)}
+
+
+def test_reopen(archive, pages):
+    archive.put(2021, pages['boxscore'])
+    archive.put(2021, pages['play_by_play'])
+
+    reopened = PageArchive(archive.root)
+
+    assert reopened.get(2021, pages['boxscore'].url) == pages['boxscore']
+    assert len(reopened.entries(2021)) == 2
+
+
+def test_dictionary(archive, pages):
+    archive.put(2021, version('before', pages['boxscore'].text))
+    assert not archive.trained()
+
+    samples = [
+        page.text.replace('DAL', team)
+        for page in pages.values()
+        for team in ['BOS', 'MIA', 'LAL', 'NYK', 'PHI', 'UTA', 'DEN']]
+    dictionary_id = archive.train(samples, size=4096)
+
+    assert archive.trained()
+
+    archive.put(2021, version('after', pages['play_by_play'].text))
+    entries = {entry['url']: entry for entry in archive.entries(2021)}
+
+    assert entries['before']['dictionary'] == 0
+    assert entries['after']['dictionary'] == dictionary_id
+
+    # pages compressed before and after training remain readable
+    reopened = PageArchive(archive.root)
+    assert reopened.get(2021, 'before').text == pages['boxscore'].text
+    assert reopened.get(2021, 'after').text == pages['play_by_play'].text
+
+
+def test_train_archive(monkeypatch, archive, pages):
+    monkeypatch.setattr(game, 'page_archive', archive)
+    monkeypatch.setattr(game, 'archive_pages', True)
+
+    for number in range(20):
+        for table, page in pages.items():
+            archive.put(2021, version(
+                f'{table}{number}', page.text.replace('DAL', f'{number:03}')))
+
+    assert game.train_archive(sample_size=100) is None
+    assert not archive.trained()
+
+    assert game.train_archive(sample_size=60) is not None
+    assert archive.trained()
+    assert game.train_archive(sample_size=60) is None
@@ -0,0 +1,93 @@
+from datetime import date, datetime
+
+import pandas as pd
+import pytest
+import sqlalchemy
+
+from sportquery.nba.backfill import (
+    date_range, missing_games, plan_backfill, planning_database,
+    season_range, season_games)
+from sportquery.nba.dimensions import resolve_keys
+from sportquery.nba.schema import schedule, sync_ledger
+
+
+@pytest.fixture
+def database(engine):
+    """
+    Database of a played game of LAL and GSW, whose boxscore is synced, and
+    of a game of BRK yet to be played
+
+    """
+    games = pd.DataFrame({
+        'game_id': ['202012220LAL'] * 2 + ['202101100BRK'] * 2,
+        'season': 2021,
+        'datetime': [datetime(2020, 12, 22, 19, 30)] * 2
+        + [datetime(2021, 1, 10, 19, 30)] * 2,
+        'team': ['LAL', 'GSW', 'BRK', 'DAL'],
+        'opponent': ['GSW', 'LAL', 'DAL', 'BRK'],
+        'outcome': ['W', 'L', None, None]})
+    games = resolve_keys(engine, {schedule.name: games})[schedule.name]
+    games.to_sql(schedule.name, engine, if_exists='append', index=False)
+
+    with engine.begin() as transaction:
+        transaction.execute(sync_ledger.insert().values(
+            game_id='202012220LAL', dataset='boxscore', status='ok'))
+
+    return engine
+
+
+def test_arguments():
+    assert season_range('2021') == [2021]
+    assert season_range('2019-2021') == [2019, 2020, 2021]
+    assert date_range('2021-01-01:') == (date(2021, 1, 1), None)
+
+
+def test_missing_games(database):
+    games = missing_games(database, [2021])
+
+    assert games.game_id.unique().tolist() == ['202012220LAL']
+    assert games.dataset.tolist() == ['plus_minus', 'play_by_play']
+
+    games = missing_games(database, [2021], force=True)
+    assert games.dataset.tolist() == [
+        'boxscore', 'plus_minus', 'play_by_play']
+
+    assert len(missing_games(database, [2021], teams=['BRK'])) == 0
+    assert len(missing_games(
+        database, [2021], start_date=date(2020, 12, 23))) == 0
+
+
+def test_dry_run_leaves_database(database, tmp_path, monkeypatch):
+    path = tmp_path / 'nba.db'
+    database.dispose()
+    content = path.read_bytes()
+
+    monkeypatch.setenv('SPORTQUERY_DB', f'sqlite:///{path}')
+    conn = planning_database()
+
+    plan = plan_backfill(conn, [2021], datasets=['play_by_play'])
+
+    assert plan.schedules == []
+    assert plan.games.game_id.tolist() == ['202012220LAL']
+    assert plan.estimated_games == 0
+
+    with pytest.raises(sqlalchemy.exc.OperationalError):
+        conn.execute(sync_ledger.delete())
+
+    conn.dispose()
+
+    assert path.read_bytes() == content
+    assert sorted(tmp_path.iterdir()) == [path]
+
+
+def test_dry_run_missing_database(tmp_path, monkeypatch):
+    path = tmp_path / 'missing' / 'nba.db'
+
+    monkeypatch.setenv('SPORTQUERY_DB', f'sqlite:///{path}')
+    plan = plan_backfill(planning_database(), [2021])
+
+    assert plan.schedules == [2021]
+    assert len(plan.games) == 0
+    assert plan.estimated_games == season_games
+
+    assert not path.parent.exists()
@@ -0,0 +1,146 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+import requests
+
+from sportquery import client
+from sportquery.client import Client, RateLimiter, _retry_after
+
+
+class Clock:
+    """
+    Stand-in for the time module whose sleeps advance a fake monotonic clock
+
+    """
+    def __init__(self):
+        self.now = 0.
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(client, 'time', clock)
+    return clock
+
+
+def response(status_code, headers=None):
+    r = requests.Response()
+    r.status_code = status_code
+    r.headers.update(headers or {})
+    return r
+
+
+def replay(monkeypatch, session_client, *responses):
+    """
+    Make the session of `session_client` return (or raise) `responses`
+
+    """
+    responses = list(responses)
+
+    def get(url, headers=None, timeout=None):
+        r = responses.pop(0)
+        if isinstance(r, Exception):
+            raise r
+        return r
+
+    monkeypatch.setattr(session_client.session, 'get', get)
+
+
+def test_rate_limiter(clock):
+    limiter = RateLimiter(60, burst=2)
+
+    assert limiter.try_acquire() is None
+    assert limiter.try_acquire() is None
+    assert limiter.try_acquire() == pytest.approx(1.)
+
+    clock.now += .5
+    assert limiter.try_acquire() == pytest.approx(.5)
+
+    clock.now += .5
+    assert limiter.try_acquire() is None
+
+    # tokens do not accrue beyond the burst
+    clock.now += 10
+    limiter.acquire()
+    limiter.acquire()
+    limiter.acquire()
+    assert clock.sleeps == [pytest.approx(1.)]
+
+
+def test_pause(clock):
+    limiter = RateLimiter(60, burst=2)
+
+    limiter.pause(5)
+    assert limiter.try_acquire() == pytest.approx(5.)
+
+    # no tokens accrue during the pause
+    clock.now += 5
+    assert limiter.try_acquire() == pytest.approx(1.)
+
+
+def test_retry_after():
+    assert _retry_after(response(429)) is None
+    assert _retry_after(response(429, {'Retry-After': '7'})) == 7.
+    assert _retry_after(response(429, {'Retry-After': 'soon'})) is None
+
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+    delay = _retry_after(response(
+        503, {'Retry-After': format_datetime(retry_at, usegmt=True)}))
+    assert 28 < delay <= 30
+
+    past = datetime(2021, 2, 9, tzinfo=timezone.utc)
+    assert _retry_after(response(
+        503, {'Retry-After': format_datetime(past, usegmt=True)})) == 0.
+
+
+def test_retries(clock, monkeypatch):
+    session_client = Client(60, backoff=1.)
+    replay(
+        monkeypatch, session_client,
+        requests.ConnectionError(),
+        response(503, {'Retry-After': '3'}),
+        response(200))
+
+    assert session_client.get('http://localhost/').status_code == 200
+    assert session_client.stats == {'requests': 3, 'retries': 2}
+    assert 3. in clock.sleeps
+
+
+def test_throttled(clock, monkeypatch):
+    session_client = Client(60)
+    replay(
+        monkeypatch, session_client,
+        response(429, {'Retry-After': '30'}),
+        response(200))
+
+    assert session_client.get('http://localhost/').status_code == 200
+    assert session_client.stats['throttled'] == 1
+
+    # the pause holds back the next request of every thread, which then
+    # waits for a token to accrue
+    assert clock.now == pytest.approx(31.)
+
+
+def test_gives_up(clock, monkeypatch):
+    session_client = Client(60, max_retries=2)
+    replay(
+        monkeypatch, session_client,
+        response(500), response(502), response(503))
+
+    assert session_client.get('http://localhost/').status_code == 503
+
+    replay(
+        monkeypatch, session_client,
+        *[requests.Timeout()] * 3)
+
+    with pytest.raises(requests.Timeout):
+        session_client.get('http://localhost/')
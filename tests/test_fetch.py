@@ -0,0 +1,132 @@
+import time
+
+import pytest
+import requests
+
+from sportquery import client, fetch
+from sportquery.cache import PageCache
+from sportquery.fetch import _is_fresh, fetch_page
+
+url = 'https://www.basketball-reference.com/boxscores/202102090SAS.html'
+
+
+def response(status_code, text='', headers=None):
+    """
+    Server response with the specified status, body and headers
+
+    """
+    r = requests.Response()
+    r.status_code = status_code
+    r._content = text.encode()
+    r.encoding = 'utf-8'
+    r.headers.update(headers or {})
+    return r
+
+
+class Server:
+    """
+    Client replaying `responses`, recording the headers of each request
+
+    """
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, headers=None):
+        self.requests.append(headers)
+        return self.responses.pop(0)
+
+
+@pytest.fixture
+def cache(monkeypatch, tmp_path):
+    """
+    Empty page cache used by `fetch_page`
+
+    """
+    cache = PageCache(tmp_path)
+    monkeypatch.setattr(fetch, 'page_cache', cache)
+    return cache
+
+
+def test_page_cache(tmp_path):
+    cache = PageCache(tmp_path)
+
+    assert cache.get(url) is None
+    assert cache.fetched_at(url) is None
+
+    cache.put(url, '<html>é</html>', etag='"v1"')
+    page = cache.get(url)
+
+    assert page.text == '<html>é</html>'
+    assert page.etag == '"v1"'
+    assert page.last_modified is None
+    assert cache.fetched_at(url) == page.fetched_at
+
+    time.sleep(.01)
+    cache.touch(url)
+
+    assert cache.fetched_at(url) > page.fetched_at
+    assert cache.get(url).text == page.text
+
+
+def test_is_fresh():
+    now = time.time()
+
+    assert _is_fresh(now - 1e6, None)
+    assert _is_fresh(now - 10, 60)
+    assert not _is_fresh(now - 120, 60)
+
+    # copies fetched after the page became final never expire
+    assert _is_fresh(now - 120, 60, final_at=now - 180)
+    assert not _is_fresh(now - 120, 60, final_at=now - 60)
+
+
+def test_conditional_get(cache, monkeypatch):
+    server = Server(
+        response(200, 'first', {'ETag': '"v1"', 'Last-Modified': 'Tue'}),
+        response(304),
+        response(200, 'second', {'ETag': '"v2"'}))
+    monkeypatch.setattr(client, 'client', server)
+
+    assert fetch_page(url, ttl=60).text == 'first'
+    assert server.requests == [{}]
+
+    # fresh copies are served without a request
+    assert fetch_page(url, ttl=60).text == 'first'
+    assert len(server.requests) == 1
+
+    # stale copies are revalidated with the validators of the cached copy
+    fetched_at = cache.fetched_at(url)
+    page = fetch_page(url, ttl=0)
+
+    assert page.text == 'first'
+    assert server.requests[1] == {
+        'If-None-Match': '"v1"', 'If-Modified-Since': 'Tue'}
+    assert cache.fetched_at(url) >= fetched_at
+
+    page = fetch_page(url, ttl=0)
+
+    assert page.text == 'second'
+    assert cache.get(url).etag == '"v2"'
+    assert server.requests[2] == {
+        'If-None-Match': '"v1"', 'If-Modified-Since': 'Tue'}
+
+
+def test_final_page(cache, monkeypatch):
+    server = Server(response(200, 'final'))
+    monkeypatch.setattr(client, 'client', server)
+
+    fetch_page(url, ttl=0, final_at=time.time() - 60)
+
+    # fetched after the end of the game, so never revalidated
+    assert fetch_page(url, ttl=0, final_at=time.time() - 60).text == 'final'
+    assert len(server.requests) == 1
+
+
+def test_error_status(cache, monkeypatch):
+    monkeypatch.setattr(client, 'client', Server(response(404)))
+
+    with pytest.raises(requests.HTTPError):
+        fetch_page(url)
+
+    assert cache.get(url) is None
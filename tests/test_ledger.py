@@ -0,0 +1,149 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+import requests
+
+from sportquery.nba import ledger
+from sportquery.nba.game import game_tables
+from sportquery.nba.schema import metadata, schedule
+from sportquery.writer import BulkWriter
+
+from conftest import game_id
+
+
+def http_error(status_code):
+    response = requests.Response()
+    response.status_code = status_code
+
+    return requests.HTTPError(f'{status_code} error', response=response)
+
+
+def parse_error(dataset=None):
+    exc = ValueError('No table found')
+    if dataset is not None:
+        exc.dataset = dataset
+
+    return exc
+
+
+def write(engine, entries):
+    with BulkWriter(engine, metadata, upsert=True) as writer:
+        writer.add({'sync_ledger': entries})
+
+
+def statuses(engine):
+    return pd.read_sql(
+        'select dataset, status, error_count from sync_ledger '
+        'order by dataset', engine).set_index('dataset')
+
+
+@pytest.fixture
+def scheduled(engine):
+    """
+    Database scheduling a completed game
+
+    """
+    with engine.begin() as conn:
+        conn.execute(schedule.insert().values(
+            game_id=game_id, season=2021, team_key=1, outcome='W'))
+
+    return engine
+
+
+def test_failed_datasets():
+    assert ledger.failed_datasets(parse_error('plus_minus')) == [
+        'plus_minus']
+    assert ledger.failed_datasets(parse_error()) == list(game_tables)
+    assert ledger.failed_datasets(
+        parse_error('boxscore'), ['play_by_play']) == ['play_by_play']
+
+
+@pytest.mark.parametrize('exc, transient', [
+    (http_error(503), True),
+    (http_error(429), True),
+    (http_error(404), False),
+    (requests.ConnectionError(), True),
+    (requests.Timeout(), True),
+    (parse_error(), False)])
+def test_is_transient(exc, transient):
+    assert ledger.is_transient(exc) == transient
+
+
+def test_failure_entries():
+    entries = ledger.failure_entries(
+        game_id, parse_error(), 0, ['boxscore'])
+
+    assert entries.dataset.tolist() == ['boxscore']
+    assert entries.status[0] == 'error'
+    assert entries.error_count[0] == 1
+    assert entries.error[0] == 'ValueError: No table found'
+    assert entries.next_attempt[0] > datetime.now()
+
+
+def test_failure_backoff():
+    delays = [
+        ledger.failure_entries(game_id, parse_error(), errors).next_attempt[0]
+        for errors in range(3)]
+
+    assert delays[0] < delays[1] < delays[2]
+
+
+def test_quarantine():
+    entries = ledger.failure_entries(
+        game_id, parse_error(), ledger.max_attempts - 1)
+
+    assert (entries.status == 'quarantined').all()
+    assert entries.next_attempt.isna().all()
+
+
+def test_transient_errors_are_not_counted():
+    entries = ledger.failure_entries(
+        game_id, http_error(503), ledger.max_attempts - 1)
+
+    assert (entries.status == 'error').all()
+    assert (entries.error_count == ledger.max_attempts - 1).all()
+
+
+def test_ledger_round_trip(scheduled, pages):
+    assert ledger.pending_game_ids(scheduled).tolist() == [game_id]
+
+    # only the failing dataset records the error
+    failed = ledger.failed_datasets(parse_error('plus_minus'))
+    write(scheduled, ledger.failure_entries(
+        game_id, parse_error('plus_minus'),
+        ledger.error_count(scheduled, game_id, failed), failed))
+
+    assert statuses(scheduled).to_dict('index') == {
+        'plus_minus': {'status': 'error', 'error_count': 1}}
+    assert ledger.error_count(scheduled, game_id) == 1
+    assert ledger.error_count(scheduled, game_id, ['boxscore']) == 0
+
+    # the game waits for its next attempt
+    assert ledger.pending_game_ids(scheduled).tolist() == []
+    assert ledger.failed_games(scheduled).game_id.tolist() == [game_id]
+
+    assert ledger.requeue(scheduled, [game_id]) == 1
+    assert ledger.pending_game_ids(scheduled).tolist() == [game_id]
+
+    # a successful sync clears the failure
+    write(scheduled, ledger.failure_entries(game_id, parse_error(), 0))
+    write(scheduled, ledger.ledger_entries(pages, game_id))
+
+    entries = pd.read_sql('select * from sync_ledger', scheduled)
+    assert (entries.status == 'ok').all()
+    assert (entries.error_count == 0).all()
+    assert entries.error.isna().all()
+    assert entries.next_attempt.isna().all()
+    assert ledger.pending_game_ids(scheduled).tolist() == []
+
+
+def test_quarantined_games_are_skipped(scheduled):
+    write(scheduled, ledger.failure_entries(
+        game_id, parse_error(), ledger.max_attempts))
+
+    assert ledger.pending_game_ids(scheduled).tolist() == []
+
+    ledger.requeue(scheduled)
+
+    assert ledger.pending_game_ids(scheduled).tolist() == [game_id]
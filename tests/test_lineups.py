@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sportquery.nba.lineups import lineup_stints, player_columns
+
+
+def intervals(game_id='202102090SAS'):
+    """
+    Plus-minus intervals of a home team (10) substituting players 1 and 2
+    for players 6 and 7 midway through the game, three seconds apart, and
+    of an away team (20) with only four players on court after 10 minutes
+
+    """
+    rows = [
+        (10, 1, 0, 24, 3),
+        (10, 2, 0, 24, 3),
+        (10, 3, 0, 48, 1),
+        (10, 4, 0, 48, 1),
+        (10, 5, 0, 48, 1),
+        (10, 6, 24.05, 48, -2),
+        (10, 7, 24.05, 48, -2),
+        (20, 21, 0, 48, -1),
+        (20, 22, 0, 48, -1),
+        (20, 23, 0, 48, -1),
+        (20, 24, 0, 48, -1),
+        (20, 25, 0, 10, -5)]
+
+    df = pd.DataFrame(rows, columns=[
+        'team_key', 'player_key', 'subin_minute', 'subout_minute',
+        'plus_minus'])
+    df.insert(0, 'game_id', game_id)
+    df.insert(2, 'is_home', df.team_key == 10)
+
+    return df
+
+
+def plays(game_id='202102090SAS'):
+    return pd.DataFrame({
+        'game_id': game_id,
+        'play_number': [1, 2, 3],
+        'quarter': [1, 2, 4],
+        'elapsed': [600, 1400, 2880],
+        'score_away': [5, 15, 40],
+        'score_home': [10, 20, 40]})
+
+
+def test_lineup_stints():
+    stints = lineup_stints(intervals())
+
+    assert stints.team_key.tolist() == [10, 10, 20]
+    assert stints.stint.tolist() == [1, 2, 1]
+    assert stints[player_columns].values.tolist() == [
+        [1, 2, 3, 4, 5], [3, 4, 5, 6, 7], [21, 22, 23, 24, 25]]
+
+    # simultaneous substitutions share the mean of their times
+    assert stints.start_minute.tolist() == [0, pytest.approx(24.025), 0]
+    assert stints.end_minute.tolist() == [pytest.approx(24.025), 48, 10]
+
+    assert stints.plus_minus.tolist() == [3, -2, -5]
+
+
+def test_undetermined_plus_minus():
+    df = intervals()
+    df.loc[df.player_key.isin([1, 2]), 'plus_minus'] = np.nan
+
+    # the net points at the substitution follow from the later intervals
+    assert lineup_stints(df).plus_minus.tolist() == [3, -2, -5]
+
+    df.loc[df.player_key.isin([6, 7]), 'plus_minus'] = np.nan
+
+    stints = lineup_stints(df)
+
+    assert stints.plus_minus.isna().tolist() == [True, True, False]
+
+
+def test_align_plays():
+    stints = lineup_stints(intervals(), plays())
+
+    assert stints.start_elapsed.tolist() == [0, pytest.approx(1441.5), 0]
+    assert stints.points_for.tolist() == [20, 20, 5]
+    assert stints.points_against.tolist() == [15, 25, 10]
+
+
+def test_overtime():
+    overtime = plays().assign(quarter=[1, 4, 5])
+
+    stints = lineup_stints(intervals(), overtime)
+
+    # 48 minutes stretched to the 53 minutes of the game
+    assert stints.end_elapsed.iloc[1] == pytest.approx(3180)
+
+
+def test_games():
+    df = pd.concat([intervals('202102090SAS'), intervals('202102110SAS')])
+    both = pd.concat([plays('202102090SAS'), plays('202102110SAS')])
+
+    stints = lineup_stints(df, both)
+    single = lineup_stints(intervals(), plays())
+
+    assert len(stints) == 2 * len(single)
+    assert stints.stint.tolist() == 2 * single.stint.tolist()
+    assert stints.points_for.tolist() == 2 * single.points_for.tolist()
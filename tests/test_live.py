@@ -0,0 +1,105 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from sportquery.cache import CachedPage
+from sportquery.nba import schedule_timezone
+from sportquery.nba.dimensions import resolve_keys
+from sportquery.nba.live import LiveMonitor, is_final, live_game_ids
+from sportquery.nba.play_by_play import parse_play_by_play
+
+from conftest import game_id
+
+
+def last_play(event, score_away=100, score_home=98):
+    return pd.DataFrame({
+        'event': ['Jump ball', event],
+        'score_away': [0, score_away],
+        'score_home': [0, score_home]})
+
+
+def test_is_final():
+    assert is_final(last_play('End of 4th quarter'))
+    assert is_final(last_play('End of 2nd overtime'))
+    assert not is_final(last_play('End of 3rd quarter'))
+    assert not is_final(last_play('End of 4th quarter', 100, 100))
+    assert not is_final(last_play('End of 4th quarter')[:0])
+
+
+def test_live_game_ids(engine):
+    games = pd.DataFrame({
+        'game_id': ['202102090SAS', '202102090LAL', '202102090BOS',
+                    '202102090MIA'],
+        'season': 2021,
+        'datetime': pd.to_datetime([
+            '2021-02-09 20:00', '2021-02-09 22:30', '2021-02-09 16:00',
+            '2021-02-09 19:00']),
+        'team': ['SAS', 'LAL', 'BOS', 'MIA'],
+        'opponent': ['DAL', 'GSW', 'BRK', 'PHI'],
+        'outcome': [None, None, None, 'W']})
+    games = resolve_keys(engine, {'schedule': games})['schedule']
+    games.to_sql('schedule', engine, if_exists='append', index=False)
+
+    now = datetime(2021, 2, 9, 21, tzinfo=schedule_timezone)
+
+    # tipped off, not yet tipped off, unfinished for too long, finished
+    assert live_game_ids(engine, now) == ['202102090SAS']
+
+
+class Pages:
+    """
+    Growing versions of the play-by-play page of `game_id`
+
+    """
+    def __init__(self, text):
+        self.head, body = text.split('<tbody>')
+        self.rows = body.split('</tr>\n')
+
+    def page(self, rows):
+        text = '<tbody>'.join([self.head, '</tr>\n'.join(self.rows[:rows])])
+        return CachedPage('', text, None, None, 0.)
+
+
+@pytest.fixture
+def pages(fixtures):
+    return Pages((fixtures / f'play_by_play_{game_id}.html').read_text())
+
+
+def test_new_plays(engine, pages):
+    monitor = LiveMonitor(engine, write=False)
+
+    first = monitor.new_plays(game_id, pages.page(50))
+    assert first.end_game.eq(0).all()
+    assert monitor.new_plays(game_id, pages.page(50)) is None
+
+    second = monitor.new_plays(game_id, pages.page(len(pages.rows)))
+    assert second.play_number.iloc[0] == len(first)
+    assert second.end_game.iloc[-1] == 1
+    assert game_id in monitor.finished
+
+
+def test_poll(engine, pages, fixtures, monkeypatch):
+    versions = [pages.page(50), pages.page(50), pages.page(len(pages.rows))]
+    updates = []
+
+    monitor = LiveMonitor(engine, interval=0)
+    monkeypatch.setattr(monitor, '_fetch', lambda game_id: versions.pop(0))
+    monitor.subscribe(lambda game_id, plays: updates.append(len(plays)))
+
+    # the page of the second poll did not change
+    monitor.run([game_id])
+
+    expected = parse_play_by_play(
+        (fixtures / f'play_by_play_{game_id}.html').read_text(), game_id)
+    stored = pd.read_sql(
+        'select play_number, end_game from play_by_play order by play_number',
+        engine)
+
+    assert len(updates) == 2 and sum(updates) == len(expected)
+    assert stored.play_number.tolist() == expected.play_number.tolist()
+    assert stored.end_game.sum() == 1
+
+    # a restarted monitor skips the plays already stored
+    monitor = LiveMonitor(engine)
+    assert len(monitor.new_plays(game_id, pages.page(len(pages.rows)))) == 0
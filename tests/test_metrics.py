@@ -0,0 +1,61 @@
+import json
+
+from sportquery import metrics
+
+
+def test_mixed_label_values():
+    registry = metrics.Registry()
+    registry.inc('http_retries_total', reason='connection')
+    registry.inc('http_retries_total', reason=503)
+    registry.inc('http_retries_total', 2, reason=429)
+    registry.inc('http_retries_total', reason='429')
+
+    text = registry.prometheus()
+
+    assert 'sportquery_http_retries_total{reason="429"} 3' in text
+    assert 'sportquery_http_retries_total{reason="503"} 1' in text
+    assert 'sportquery_http_retries_total{reason="connection"} 1' in text
+    assert registry.summary()['http_retries_total'] == {
+        'reason=429': 3, 'reason=503': 1, 'reason=connection': 1}
+
+
+def test_histograms():
+    registry = metrics.Registry()
+    for value in [.002, .02, .2]:
+        registry.observe('parse_seconds', value, dataset='boxscore')
+
+    text = registry.prometheus()
+
+    assert (
+        'sportquery_parse_seconds_bucket{dataset="boxscore",le="0.0025"} 1'
+        in text)
+    assert (
+        'sportquery_parse_seconds_bucket{dataset="boxscore",le="+Inf"} 3'
+        in text)
+    assert 'sportquery_parse_seconds_count{dataset="boxscore"} 3' in text
+
+
+def test_merge():
+    registry, worker = metrics.Registry(), metrics.Registry()
+    registry.inc('rows_written_total', 2, table='boxscore')
+    worker.inc('rows_written_total', 3, table='boxscore')
+    worker.observe('parse_seconds', .1)
+
+    registry.merge(worker.snapshot(reset=True))
+
+    assert registry.summary()['rows_written_total'] == {'table=boxscore': 5}
+    assert registry.summary()['parse_seconds']['all']['count'] == 1
+    assert worker.summary() == {}
+
+
+def test_export(monkeypatch, tmp_path):
+    monkeypatch.setattr(metrics, 'metrics_dir', tmp_path)
+    monkeypatch.setattr(metrics, 'registry', metrics.Registry())
+    metrics.inc('http_retries_total', reason='connection')
+    metrics.inc('http_retries_total', reason=502)
+
+    summary = json.loads(metrics.export('nba', started_at=0.).read_text())
+
+    assert 'reason="502"' in (tmp_path / 'nba.prom').read_text()
+    assert summary['metrics']['http_retries_total'] == {
+        'reason=502': 1, 'reason=connection': 1}
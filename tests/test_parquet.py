@@ -0,0 +1,108 @@
+from datetime import date, datetime
+
+import pandas as pd
+import pytest
+
+from sportquery.nba import columnar
+from sportquery.nba.dimensions import resolve_keys
+from sportquery.nba.schema import schedule, sync_ledger
+from sportquery.parquet import ParquetStore, empty_marker
+
+pytest.importorskip('pyarrow')
+
+
+def schedule_rows(game_id, teams, outcome='W'):
+    """
+    Schedule rows of the game `game_id` between the two `teams`
+
+    """
+    home, away = teams
+    return pd.DataFrame({
+        'game_id': game_id,
+        'season': 2021,
+        'game_number': [1, 1],
+        'datetime': datetime.strptime(game_id[:8], '%Y%m%d'),
+        'is_home': [True, False],
+        'team': [home, away],
+        'opponent': [away, home],
+        'outcome': [outcome, 'L'],
+        'team_points': [110, 100],
+        'opponent_points': [100, 110],
+        'cumulative_wins': [1, 0],
+        'cumulative_losses': [0, 1],
+        'streak': [1, -1]})
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ParquetStore(tmp_path / 'parquet')
+
+
+def test_round_trip(store, engine):
+    first = resolve_keys(engine, {
+        'schedule': schedule_rows('202012220LAL', ['LAL', 'GSW'])})['schedule']
+    second = resolve_keys(engine, {
+        'schedule': schedule_rows('202012230GSW', ['GSW', 'BRK'])})['schedule']
+
+    store.write_partition(schedule, 2021, date(2020, 12, 22), first)
+    store.write_partition(schedule, 2021, date(2020, 12, 23), second)
+
+    assert store.partitions('schedule') == {
+        (2021, '2020-12-22'), (2021, '2020-12-23')}
+
+    df = store.read('schedule')
+
+    assert len(df) == 4
+    assert isinstance(df.game_id.dtype, pd.CategoricalDtype)
+    assert df.season.unique().tolist() == [2021]
+
+    df = store.read(
+        'schedule', columns=['game_id', 'team_points'],
+        filters=[('date', '=', date(2020, 12, 23)), ('is_home', '=', True)])
+
+    assert df.columns.tolist() == ['game_id', 'team_points']
+    assert df.game_id.tolist() == ['202012230GSW']
+
+    # partitions are replaced as a whole
+    store.write_partition(schedule, 2021, date(2020, 12, 23), second[:1])
+    assert len(store.read('schedule')) == 3
+
+
+def test_empty_partition(store, engine):
+    rows = resolve_keys(engine, {
+        'schedule': schedule_rows('202012220LAL', ['LAL', 'GSW'])})['schedule']
+    day = date(2020, 12, 22)
+    directory = store.root / 'schedule/season=2021/date=2020-12-22'
+
+    store.write_partition(schedule, 2021, day, rows)
+    store.write_partition(schedule, 2021, day, rows[:0])
+
+    assert [path.name for path in directory.iterdir()] == [empty_marker]
+    assert store.partitions('schedule') == {(2021, '2020-12-22')}
+
+    store.write_partition(schedule, 2021, date(2020, 12, 23), rows)
+    assert len(store.read('schedule')) == 2
+
+    store.write_partition(schedule, 2021, day, rows)
+    assert [path.name for path in directory.iterdir()] == ['part-0.parquet']
+
+
+def test_export_dates(store, engine, monkeypatch):
+    monkeypatch.setattr(columnar, 'parquet_store', store)
+
+    rows = resolve_keys(engine, {
+        'schedule': schedule_rows('202012220LAL', ['LAL', 'GSW'])})['schedule']
+    rows.to_sql('schedule', engine, if_exists='append', index=False)
+
+    # a synced game without rows, e.g. a postponed game
+    with engine.begin() as transaction:
+        transaction.execute(sync_ledger.insert().values(
+            game_id='202012230GSW', dataset='boxscore', status='ok'))
+
+    assert columnar.missing_dates(engine) == ['20201222', '20201223']
+
+    columnar.export_dates(engine, columnar.missing_dates(engine))
+
+    assert columnar.missing_dates(engine) == []
+    assert len(columnar.read_table('schedule')) == 2
+    assert (2021, '2020-12-23') in store.partitions('boxscore')
@@ -0,0 +1,111 @@
+import pandas as pd
+import pytest
+
+from sportquery.nba.boxscore import boxscore_dtypes, parse_boxscore
+from sportquery.nba.game import parse_game
+from sportquery.nba.plus_minus import link_players, parse_plus_minus
+
+from conftest import game_id
+
+
+def test_boxscore(pages):
+    boxscore = parse_boxscore(pages['boxscore'].text, game_id)
+
+    assert set(boxscore.team) == {'DAL', 'SAS'}
+    assert {column.lower() for column in boxscore_dtypes} <= set(
+        boxscore.columns)
+
+    # one team totals row per team, with the minutes of all players
+    totals = boxscore[boxscore.player == 'All']
+    assert len(totals) == 2
+    assert totals.player_id.isna().all()
+    assert (totals.mp == 240).all()
+
+    # names are transliterated, players who did not play have no stats
+    players = boxscore[boxscore.player != 'All'].set_index('player_id')
+    assert players.loc['doncilu01', 'player'] == 'Luka Doncic'
+    assert players.loc['marjabo01', ['mp', 'pts']].isna().all()
+
+
+def test_plus_minus(pages):
+    stints = parse_plus_minus(pages['plus_minus'].text, game_id)
+
+    assert len(stints) > 0
+    assert (stints.game_id == game_id).all()
+    assert (stints.subin_minute < stints.subout_minute).all()
+    assert stints.subout_minute.max() <= 48 + 1e-9
+
+    # the stints of a player follow each other
+    for _, player in stints.groupby('player'):
+        assert (player.subin_minute.iloc[1:].values
+                >= player.subout_minute.iloc[:-1].values - 1e-9).all()
+
+
+def test_parse_game(pages):
+    tables = parse_game(pages, game_id)
+
+    assert set(tables) == {'boxscore', 'plus_minus', 'play_by_play'}
+    for df in tables.values():
+        assert (df.game_id == game_id).all()
+
+
+def test_parse_game_tags_failing_dataset(pages):
+    pages = dict(pages, boxscore=pages['boxscore']._replace(
+        text='<html><body></body></html>'))
+
+    with pytest.raises(Exception) as error:
+        parse_game(pages, game_id)
+
+    assert error.value.dataset == 'boxscore'
+
+
+def stints(players):
+    return pd.DataFrame({
+        'game_id': game_id,
+        'player': [player for player, _ in players],
+        'player_id': [player_id for _, player_id in players],
+        'subin_minute': 0.,
+        'subout_minute': 12.,
+        'plus_minus': 1.})
+
+
+def boxscore(players):
+    return pd.DataFrame({
+        'player': [player for player, _ in players] + ['All'],
+        'player_id': [player_id for _, player_id in players] + [None]})
+
+
+def test_plus_minus_player_ids(pages):
+    plus_minus = parse_plus_minus(pages['plus_minus'].text, game_id)
+
+    linked = plus_minus.dropna(subset=['player_id'])
+    assert len(linked) > 0
+    assert linked[linked.player == 'Luka Doncic'].player_id.eq(
+        'doncilu01').all()
+
+    # players without a link are identified from the boxscore
+    tables = parse_game(pages, game_id)
+    hardaway = tables['plus_minus'].player == 'Tim Hardaway Jr.'
+    assert hardaway.any()
+    assert tables['plus_minus'].player_id[hardaway].eq('hardati02').all()
+    assert tables['plus_minus'].player_id.notna().all()
+
+
+def test_link_players_prefers_page_ids():
+    linked = link_players(
+        stints([('Tony Mitchell', 'mitchto02'), ('Tony Mitchell', None)]),
+        boxscore([('Tony Mitchell', 'mitchto02'),
+                  ('Tony Mitchell', 'mitchto03')]))
+
+    # the unlinked namesake is ambiguous and dropped
+    assert linked.player_id.tolist() == ['mitchto02']
+
+
+def test_link_players_by_name():
+    linked = link_players(
+        stints([('Tim Hardaway', None), ('Kelly Oubre', None),
+                ('Unknown Player', None)]),
+        boxscore([('Tim Hardaway Jr.', 'hardati02'),
+                  ('Kelly Oubre Jr.', 'oubreke01')]))
+
+    assert linked.player_id.tolist() == ['hardati02', 'oubreke01']
@@ -0,0 +1,80 @@
+import pytest
+
+from sportquery import metrics
+from sportquery.pipeline import run_pipeline
+
+
+def parse(payload, item):
+    """
+    Parse function of the parse processes, failing on the payload 'bad'
+
+    """
+    if payload == 'bad':
+        raise ValueError(f'cannot parse item {item}')
+
+    metrics.inc('parsed_total')
+
+    return 2 * int(payload)
+
+
+def fetch(item):
+    if item == 3:
+        raise ConnectionError('item 3 is unavailable')
+
+    return 'bad' if item == 5 else str(item)
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = metrics.Registry()
+    monkeypatch.setattr(metrics, 'registry', registry)
+    return registry
+
+
+def test_pipeline(registry):
+    batches = []
+
+    run_pipeline(
+        [1, 2, 4, 6, 7, 8, 9], fetch, parse, batches.append,
+        fetch_workers=3, parse_workers=2, batch_size=3)
+
+    assert [len(batch) for batch in batches] == [3, 3, 1]
+    assert sorted(pair for batch in batches for pair in batch) == [
+        (1, 2), (2, 4), (4, 8), (6, 12), (7, 14), (8, 16), (9, 18)]
+
+    # measurements of the parse processes are merged
+    assert registry.summary()['parsed_total'] == {'all': 7}
+
+
+def test_on_error(registry):
+    batches, errors = [], {}
+
+    run_pipeline(
+        range(10), fetch, parse, batches.append, parse_workers=2,
+        on_error=errors.__setitem__)
+
+    assert sorted(item for batch in batches for item, _ in batch) == [
+        0, 1, 2, 4, 6, 7, 8, 9]
+    assert isinstance(errors[3], ConnectionError)
+    assert isinstance(errors[5], ValueError)
+
+
+def test_error_stops_pipeline(registry):
+    batches = []
+
+    with pytest.raises((ConnectionError, ValueError)):
+        run_pipeline(
+            range(100), fetch, parse, batches.append, parse_workers=2,
+            batch_size=1)
+
+    written = {item for batch in batches for item, _ in batch}
+    assert len(written) < 98 and not written & {3, 5}
+
+
+def test_write_error():
+    def write(batch):
+        raise RuntimeError('database is locked')
+
+    with pytest.raises(RuntimeError, match='locked'):
+        run_pipeline(
+            [1, 2], fetch, parse, write, parse_workers=1, batch_size=1)
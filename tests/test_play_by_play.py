@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sportquery.nba.play_by_play import (
+    event_types, parse_new_plays, parse_play_by_play, start_position)
+
+# a regulation game and a double overtime game
+game_ids = ['202102090SAS', '202102110SAS']
+
+
+@pytest.mark.parametrize('game_id', game_ids)
+def test_legacy_parity(fixtures, game_id):
+    """
+    The compact table holds the plays parsed by the former parser, whose
+    output on the fixture pages is recorded in the legacy csv files
+
+    """
+    text = (fixtures / f'play_by_play_{game_id}.html').read_text()
+    plays = parse_play_by_play(text, game_id)
+    legacy = pd.read_csv(
+        fixtures / f'play_by_play_{game_id}_legacy.csv',
+        dtype={'game_id': str, 'time': str})
+
+    assert len(plays) == len(legacy)
+
+    for column in [
+            'game_id', 'play_number', 'quarter', 'start_quarter', 'end_game',
+            'score_away', 'score_home', 'points', 'event']:
+        assert plays[column].tolist() == legacy[column].tolist(), column
+
+    # the former parser assigned plays of neither team to either team
+    team = plays.is_home.notna().values
+    assert (plays.is_home[team].astype(int).values
+            == legacy.is_home[team].values).all()
+
+    clock = legacy.time.str.extract(r'^(\d+):(\d+\.\d+)$').astype(float)
+    remaining = 60 * clock[0] + clock[1]
+    overtime = legacy.quarter > 4
+    elapsed = np.floor(np.where(
+        overtime, 2880 + (legacy.quarter - 4) * 300, legacy.quarter * 720)
+        - remaining)
+
+    assert plays.elapsed.tolist() == elapsed.astype(int).tolist()
+
+
+@pytest.mark.parametrize('game_id', game_ids)
+def test_compact_columns(fixtures, game_id):
+    text = (fixtures / f'play_by_play_{game_id}.html').read_text()
+    plays = parse_play_by_play(text, game_id)
+
+    assert set(plays.event_type) <= set(event_types)
+    assert plays.elapsed.is_monotonic_increasing
+    assert plays.end_game.tolist() == [0] * (len(plays) - 1) + [1]
+
+    periods = plays[plays.event_type == 'period']
+    assert periods.is_home.isna().all()
+    assert periods.event.iloc[-1].startswith('End of')
+
+    shots = plays[plays.event_type.isin(['made_shot', 'missed_shot'])]
+    assert shots.player_id.notna().all()
+
+    assists = plays[plays.event.str.contains('assist by')]
+    assert assists.other_player_id.notna().all()
+
+
+@pytest.mark.parametrize('game_id', game_ids)
+@pytest.mark.parametrize('steps', [1, 3, 10])
+def test_incremental_parity(fixtures, game_id, steps):
+    """
+    Parsing growing versions of a page of a game in progress from the
+    position of the previous version yields the plays of the whole page
+
+    """
+    text = (fixtures / f'play_by_play_{game_id}.html').read_text()
+    head, body = text.split('<tbody>')
+    rows = body.split('</tr>\n')
+
+    position = start_position
+    parts = []
+    for stop in range(len(rows), 0, -len(rows) // steps)[::-1]:
+        version = '<tbody>'.join([head, '</tr>\n'.join(rows[:stop])])
+        plays, position = parse_new_plays(version, game_id, position)
+        parts.append(plays.assign(end_game=0))
+
+    plays = pd.concat(parts, ignore_index=True)
+    expected = parse_play_by_play(text, game_id).assign(end_game=0)
+
+    pd.testing.assert_frame_equal(
+        plays.astype(object), expected.astype(object))
@@ -0,0 +1,91 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from sportquery.nba import query
+from sportquery.nba.dimensions import resolve_keys
+from sportquery.nba.query import QueryCache, team_games
+from sportquery.nba.schema import metadata, sync_ledger
+from sportquery.writer import BulkWriter
+
+
+def schedule_rows(engine, game_id, outcome=None):
+    """
+    Schedule rows of a game of LAL against GSW
+
+    """
+    df = pd.DataFrame({
+        'game_id': game_id,
+        'season': 2021,
+        'datetime': datetime.strptime(game_id[:8], '%Y%m%d'),
+        'is_home': [True, False],
+        'team': ['LAL', 'GSW'],
+        'opponent': ['GSW', 'LAL'],
+        'outcome': [outcome, None if outcome is None else 'L']})
+
+    return resolve_keys(engine, {'schedule': df})['schedule']
+
+
+def frame(rows):
+    return pd.DataFrame({'value': range(rows)})
+
+
+def test_eviction():
+    size = int(frame(10).memory_usage(deep=True).sum())
+    cache = QueryCache(2 * size)
+
+    cache.put('a', frame(10), ['boxscore'])
+    cache.put('b', frame(10), ['schedule'])
+    assert cache.get('a') is not None
+
+    # the least recently used entry is evicted
+    cache.put('c', frame(10), ['schedule'])
+    assert cache.get('b') is None
+    assert cache.size == 2 * size
+
+    # results larger than the budget are not cached
+    cache.put('d', frame(100), ['schedule'])
+    assert cache.get('d') is None
+
+    cache.invalidate(['schedule'])
+    assert list(cache.entries) == ['a']
+    assert cache.size == size
+
+
+def test_invalidation(engine, monkeypatch):
+    monkeypatch.setattr(query, 'version_interval', 0)
+
+    schedule_rows(engine, '202012220LAL', 'W').to_sql(
+        'schedule', engine, if_exists='append', index=False)
+
+    games = team_games('LAL', conn=engine)
+    assert games.game_id.tolist() == ['202012220LAL']
+    assert games.opponent.tolist() == ['GSW']
+
+    # callers receive copies of the cached result
+    games.drop(index=games.index, inplace=True)
+
+    # games to be played change neither the ledger nor the completed games
+    # checked by the version, so the cached result is served
+    schedule_rows(engine, '202012230LAL').to_sql(
+        'schedule', engine, if_exists='append', index=False)
+    assert len(team_games('LAL', conn=engine)) == 1
+
+    # commits of a writer of this process invalidate the result
+    with BulkWriter(engine, metadata, upsert=True) as writer:
+        writer.add({'schedule': schedule_rows(engine, '202012240LAL')})
+    assert len(team_games('LAL', conn=engine)) == 3
+
+    # writes of other processes change the database version
+    schedule_rows(engine, '202012250LAL').to_sql(
+        'schedule', engine, if_exists='append', index=False)
+    with engine.begin() as transaction:
+        transaction.execute(sync_ledger.insert().values(
+            game_id='202012220LAL', dataset='boxscore', status='ok'))
+    assert len(team_games('LAL', conn=engine)) == 4
+
+
+def test_stints_arguments(engine):
+    with pytest.raises(ValueError):
+        query.stints(conn=engine)
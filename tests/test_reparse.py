@@ -0,0 +1,55 @@
+import pandas as pd
+import prefect
+import pytest
+
+from sportquery.archive import PageArchive
+from sportquery.nba import reparse
+
+from conftest import game_id
+
+pytest.importorskip('zstandard')
+
+
+@pytest.fixture
+def archive(monkeypatch, tmp_path, pages):
+    archive = PageArchive(tmp_path / 'archive')
+    for page in pages.values():
+        archive.put(2021, page)
+
+    monkeypatch.setattr(reparse, 'page_archive', archive)
+
+    return archive
+
+
+def test_page_game(pages):
+    for table, page in pages.items():
+        assert reparse.page_game(page.url) == (table, game_id)
+
+    url = 'https://www.basketball-reference.com/leagues/NBA_2021.html'
+    assert reparse.page_game(url) is None
+
+
+def test_archived_games(archive):
+    assert reparse.archived_games() == [game_id]
+    assert reparse.archived_games([2020]) == []
+
+
+def test_reparse_replaces_rows(archive, engine):
+    with prefect.context(logger=prefect.utilities.logging.get_logger()):
+        assert reparse.reparse(engine, parse_workers=1) == [game_id]
+
+        counts = pd.read_sql(
+            'select count(*) as n from plus_minus', engine).n[0]
+
+        # a stint which the parser no longer produces
+        engine.execute(
+            'insert into plus_minus (game_id, player_key, subin_minute) '
+            f"values ('{game_id}', 1, 47.5)")
+
+        reparse.reparse(engine, ['plus_minus'], parse_workers=1)
+
+    assert pd.read_sql(
+        'select count(*) as n from plus_minus', engine).n[0] == counts
+    assert pd.read_sql(
+        "select status from sync_ledger where dataset = 'plus_minus'",
+        engine).status.tolist() == ['ok']
@@ -0,0 +1,138 @@
+from datetime import date
+
+import pandas as pd
+import prefect
+
+from sportquery.nba import schedule, sync_database
+from sportquery.nba.schedule import (
+    league_schedule_url, month_start, parse_league_schedule,
+    parse_schedule_months, team_schedules)
+
+header = (
+    '<thead><tr><th>Date</th><th>Start (ET)</th><th>Visitor/Neutral</th>'
+    '<th>PTS</th><th>Home/Neutral</th><th>PTS</th><th>&nbsp;</th>'
+    '<th>&nbsp;</th><th>Attend.</th><th>Arena</th><th>Notes</th></tr>'
+    '</thead>')
+
+separator = '<tr class="thead"><th colspan="11">Playoffs</th></tr>'
+
+
+def game_row(day, away, home, points=(100, 110)):
+    """
+    League schedule row of a game played on `day` (datetime.date)
+
+    """
+    game_id = f'{day:%Y%m%d}0{home}'
+    return (
+        f'<tr><th data-stat="date_game">{day:%a, %b} {day.day}, {day.year}'
+        f'</th><td>7:30p</td><td><a href="/teams/{away}/2021.html">{away}'
+        f'</a></td><td>{points[0]}</td><td><a href="/teams/{home}/2021.html">'
+        f'{home}</a></td><td>{points[1]}</td><td>'
+        f'<a href="/boxscores/{game_id}.html">Box Score</a></td><td></td>'
+        f'<td>18,000</td><td>Arena</td><td></td></tr>')
+
+
+def league_page(months, rows=()):
+    """
+    League schedule page linking `months` and listing the game `rows`
+
+    """
+    links = ''.join(
+        f'<div><a href="/leagues/NBA_2021_games-{month}.html">{month}</a>'
+        '</div>' for month in months)
+    return (
+        f'<html><body><div class="filter">{links}</div>'
+        f'<table id="schedule">{header}<tbody>{"".join(rows)}</tbody>'
+        '</table></body></html>')
+
+
+def test_month_start():
+    assert month_start(2021, 'december') == date(2020, 12, 1)
+    assert month_start(2021, 'may') == date(2021, 5, 1)
+    assert month_start(2020, 'october-2019') == date(2019, 10, 1)
+
+
+def test_parse_league_schedule(fixtures):
+    text = (fixtures / 'league_schedule_2021_december.html').read_text()
+
+    assert parse_schedule_months(text, 2021) == ['december', 'january']
+
+    games = parse_league_schedule(text)
+
+    assert games.game_id.iloc[0] == '202012220LAL'
+    assert games.datetime.iloc[0] == pd.Timestamp('2020-12-22 19:30')
+    assert games[['team_away', 'team_home']].iloc[0].tolist() == [
+        'GSW', 'LAL']
+    assert games.points_home.notna().all()
+    assert not games.playoffs.any()
+
+
+def test_playoffs_across_months(monkeypatch):
+    april = [
+        game_row(date(2021, 4, 20), 'BRK', 'LAL'),
+        game_row(date(2021, 4, 21), 'GSW', 'BRK'),
+        separator,
+        game_row(date(2021, 4, 30), 'LAL', 'BRK')]
+    may = [
+        game_row(date(2021, 5, 2), 'BRK', 'LAL'),
+        game_row(date(2021, 5, 4), 'LAL', 'BRK')]
+
+    pages = {
+        league_schedule_url(2021): league_page(['april', 'may']),
+        league_schedule_url(2021, 'april'): league_page(['april'], april),
+        league_schedule_url(2021, 'may'): league_page(['may'], may)}
+
+    class EmptyCache:
+        def get(self, url):
+            return None
+
+    monkeypatch.setattr(schedule, 'page_cache', EmptyCache())
+    monkeypatch.setattr(
+        schedule, 'get_page', lambda url, **lifetime: pages[url])
+
+    games = schedule.get_league_schedule(2021)
+
+    assert games.playoffs.tolist() == [False, False, True, True, True]
+
+    teams = team_schedules(games)
+
+    assert len(teams) == 4
+    assert teams.groupby('team').game_number.max().to_dict() == {
+        'BRK': 2, 'GSW': 1, 'LAL': 1}
+
+
+def test_sync_schedule(engine, monkeypatch):
+    games = pd.DataFrame({
+        'game_id': ['202012220LAL', '202012230GSW'],
+        'datetime': pd.to_datetime(['2020-12-22 19:30', '2020-12-23 19:30']),
+        'team_away': ['GSW', 'BRK'],
+        'team_home': ['LAL', 'GSW'],
+        'points_away': [94., None],
+        'points_home': [106., None],
+        'playoffs': [False, False]})
+
+    monkeypatch.setattr(
+        sync_database, 'get_league_schedule', lambda season: games)
+
+    def sync():
+        with prefect.context(logger=prefect.utilities.logging.get_logger()):
+            return sync_database.sync_schedule(engine, 2021)
+
+    def stored():
+        return pd.read_sql(
+            'select game_id, team_points from schedule '
+            'order by game_id, team_key', engine)
+
+    assert sync() == ['202012220LAL', '202012230GSW']
+    assert len(stored()) == 4
+
+    # unchanged rows are not rewritten
+    assert sync() == []
+
+    # the played game is upserted and the rescheduled game removed
+    games = games.iloc[1:].assign(points_away=[120.], points_home=[118.])
+    assert sync() == ['202012220LAL', '202012230GSW']
+
+    rows = stored()
+    assert rows.game_id.tolist() == ['202012230GSW'] * 2
+    assert sorted(rows.team_points) == [118, 120]
@@ -0,0 +1,86 @@
+import itertools
+import threading
+
+import pytest
+
+from sportquery.nba import stream
+from sportquery.nba.game import game_pages
+from sportquery.nba.stream import iter_boxscores, iter_games, iter_table
+
+
+@pytest.fixture
+def fetched(monkeypatch, pages):
+    """
+    Serve the recorded pages for every game id, failing on ids starting with
+    'bad', and record the fetched game ids
+
+    """
+    fetched = []
+    lock = threading.Lock()
+
+    def fetch_game(game_id, datasets):
+        with lock:
+            fetched.append(game_id)
+        if game_id.startswith('bad'):
+            raise ConnectionError(f'{game_id} is unavailable')
+        return {table: pages[table] for table in game_pages(datasets)}
+
+    monkeypatch.setattr(stream, 'fetch_game', fetch_game)
+
+    return fetched
+
+
+game_ids = [f'20210209{number}SAS' for number in range(6)]
+
+
+def test_iter_games(fetched):
+    games = list(iter_games(game_ids, datasets=['plus_minus']))
+
+    assert [game_id for game_id, _ in games] == game_ids
+    for game_id, tables in games:
+        # the boxscore is only fetched to identify the players
+        assert list(tables) == ['plus_minus']
+        assert (tables['plus_minus'].game_id == game_id).all()
+
+
+def test_unordered(fetched):
+    games = iter_games(game_ids, fetch_workers=3, ordered=False)
+
+    assert sorted(game_id for game_id, _ in games) == game_ids
+
+
+def test_prefetch(fetched):
+    games = iter_games(
+        (f'game{number}' for number in itertools.count()),
+        datasets=['boxscore'], fetch_workers=2, prefetch=3)
+
+    for _ in range(5):
+        next(games)
+    games.close()
+
+    # games are only requested as fast as they are consumed
+    assert len(fetched) <= 5 + 3
+
+
+def test_errors(fetched):
+    ids = game_ids[:2] + ['bad1'] + game_ids[2:]
+
+    with pytest.raises(ConnectionError):
+        list(iter_games(ids, datasets=['boxscore']))
+
+    errors = {}
+    games = iter_games(
+        ids, datasets=['boxscore'], on_error=errors.__setitem__)
+
+    assert [game_id for game_id, _ in games] == game_ids
+    assert list(errors) == ['bad1']
+
+
+def test_batches(fetched):
+    batches = list(iter_table('boxscore', game_ids, batch_size=4))
+
+    assert [df.game_id.nunique() for df in batches] == [4, 2]
+
+    (game_id, boxscore), *_ = iter_boxscores(game_ids)
+    assert game_id == game_ids[0]
+    assert (boxscore.game_id == game_id).all()
@@ -0,0 +1,100 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import prefect
+import pytest
+
+from sportquery.nba import work_queue
+from sportquery.nba.work_queue import (
+    claim, complete, enqueue, queue_status, release, renew, run_worker)
+
+game_ids = [f'2021020{day}0SAS' for day in range(10, 30)]
+
+# leases which are already expired when claimed
+expired = timedelta(seconds=-1)
+
+
+def test_claim(engine):
+    assert enqueue(engine, game_ids[:10]) == 10
+    assert enqueue(engine, game_ids) == 10
+
+    first, claimed = claim(engine, 'a', limit=15)
+    assert claimed == game_ids[:15]
+
+    second, claimed = claim(engine, 'b', limit=15)
+    assert claimed == game_ids[15:]
+
+    assert claim(engine, 'c')[1] == []
+    assert renew(engine, first) == 15
+
+    assert complete(engine, second) == 5
+    assert release(engine, first) == 15
+
+    status = queue_status(engine)
+    assert status.game_id.tolist() == game_ids[:15]
+    assert status.lease_owner.isna().all()
+    assert status.claim_count.tolist() == [1] * 15
+
+
+def test_expired_lease(engine):
+    enqueue(engine, game_ids[:5])
+
+    lost, claimed = claim(engine, 'crashed', lease=expired)
+    assert len(claimed) == 5
+
+    lease_id, claimed = claim(engine, 'b')
+    assert claimed == game_ids[:5]
+
+    # the crashed worker no longer holds the games
+    assert renew(engine, lost) == 0
+    assert complete(engine, lost) == 0
+
+    status = queue_status(engine)
+    assert status.lease_owner.tolist() == ['b'] * 5
+    assert status.claim_count.tolist() == [2] * 5
+
+
+def test_concurrent_claims(engine):
+    enqueue(engine, game_ids)
+
+    with ThreadPoolExecutor(4) as pool:
+        claims = list(pool.map(
+            lambda owner: claim(engine, owner, limit=5)[1], 'abcd'))
+
+    claimed = [game_id for games in claims for game_id in games]
+    assert sorted(claimed) == game_ids
+
+
+def test_run_worker(engine, monkeypatch):
+    batches = []
+
+    def sync_games(conn, games, *args):
+        batches.append(list(games))
+        return list(games)
+
+    monkeypatch.setattr(work_queue, 'sync_games', sync_games)
+    enqueue(engine, game_ids)
+
+    with prefect.context(logger=prefect.utilities.logging.get_logger()):
+        synced = run_worker(engine, owner='a', claim_size=8)
+
+    assert synced == game_ids
+    assert [len(batch) for batch in batches] == [8, 8, 4]
+    assert len(queue_status(engine)) == 0
+
+
+def test_failed_worker(engine, monkeypatch):
+    def sync_games(conn, games, *args):
+        raise RuntimeError('database is locked')
+
+    monkeypatch.setattr(work_queue, 'sync_games', sync_games)
+    enqueue(engine, game_ids[:5])
+
+    with prefect.context(logger=prefect.utilities.logging.get_logger()):
+        with pytest.raises(RuntimeError):
+            run_worker(engine, owner='a')
+
+    # the games return to the queue without waiting for the lease to expire
+    status = queue_status(engine)
+    assert len(status) == 5
+    assert status.lease_id.isna().all()
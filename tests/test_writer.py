@@ -0,0 +1,166 @@
+import pandas as pd
+import pytest
+import sqlalchemy
+
+from sportquery.nba.dimensions import resolve_keys
+from sportquery.nba.game import game_tables
+from sportquery.nba.ledger import ingest_game
+from sportquery.nba.schema import metadata as nba_metadata
+from sportquery.writer import BulkWriter, commit_listeners
+
+from conftest import game_id
+
+metadata = sqlalchemy.MetaData()
+
+plays = sqlalchemy.Table(
+    'plays', metadata,
+    sqlalchemy.Column('game_id', sqlalchemy.types.Text, primary_key=True),
+    sqlalchemy.Column('play_number', sqlalchemy.types.Integer,
+                      primary_key=True),
+    sqlalchemy.Column('points', sqlalchemy.types.Integer),
+    sqlalchemy.Column('event', sqlalchemy.types.Text))
+
+
+@pytest.fixture
+def conn(tmp_path):
+    engine = sqlalchemy.create_engine(f'sqlite:///{tmp_path / "test.db"}')
+    metadata.create_all(engine)
+
+    yield engine
+
+    engine.dispose()
+
+
+def game(game_id, events, points=2):
+    return pd.DataFrame({
+        'game_id': game_id,
+        'play_number': range(len(events)),
+        'points': points,
+        'event': events})
+
+
+def read(conn):
+    return pd.read_sql(
+        'select * from plays order by game_id, play_number', conn)
+
+
+def test_round_trip(conn):
+    games = [game('a', ['x', 'y', None]), game('b', ['z'])]
+
+    with BulkWriter(conn, metadata, batch_size=1) as writer:
+        for df in games:
+            writer.add({'plays': df})
+
+    pd.testing.assert_frame_equal(
+        read(conn), pd.concat(games, ignore_index=True))
+
+
+def test_batches(conn):
+    writer = BulkWriter(conn, metadata, batch_size=2)
+
+    writer.add({'plays': game('a', ['x'])})
+    assert len(read(conn)) == 0
+
+    writer.add({'plays': game('b', ['y'])})
+    assert len(read(conn)) == 2
+
+
+def test_exception_discards_batch(conn):
+    with pytest.raises(RuntimeError):
+        with BulkWriter(conn, metadata) as writer:
+            writer.add({'plays': game('a', ['x'])})
+            raise RuntimeError
+
+    assert len(read(conn)) == 0
+
+
+def test_upsert(conn):
+    with BulkWriter(conn, metadata) as writer:
+        writer.add({'plays': game('a', ['x', 'y'])})
+
+    with BulkWriter(conn, metadata, upsert=True) as writer:
+        writer.add({'plays': game('a', ['z'], points=3)})
+
+    assert read(conn).event.tolist() == ['z', 'y']
+    assert read(conn).points.tolist() == [3, 2]
+
+
+def test_chunked_inserts(conn, monkeypatch):
+    monkeypatch.setattr('sportquery.writer.sqlite_max_variables', 10)
+    events = [f'event {number}' for number in range(100)]
+
+    with BulkWriter(conn, metadata, upsert=True) as writer:
+        writer.add({'plays': game('a', events)})
+
+    assert read(conn).event.tolist() == events
+
+
+def test_max_delay(conn, monkeypatch):
+    clock = [0.]
+    monkeypatch.setattr('sportquery.writer.time.monotonic', lambda: clock[0])
+    writer = BulkWriter(conn, metadata, batch_size=100, max_delay=10)
+
+    writer.add({'plays': game('a', ['x'])})
+    clock[0] = 5.
+    writer.add({'plays': game('b', ['y'])})
+    assert len(read(conn)) == 0
+
+    clock[0] = 10.
+    writer.add({'plays': game('c', ['z'])})
+    assert len(read(conn)) == 3
+
+
+def test_replace(conn):
+    with BulkWriter(conn, metadata) as writer:
+        writer.add({'plays': game('a', ['x', 'y'])})
+        writer.add({'plays': game('b', ['x', 'y'])})
+
+    replace = {'plays': 'game_id'}
+    with BulkWriter(conn, metadata, upsert=True, replace=replace) as writer:
+        writer.add({'plays': game('a', ['z'])})
+
+    assert read(conn).game_id.tolist() == ['a', 'b', 'b']
+    assert read(conn).event.tolist() == ['z', 'x', 'y']
+
+
+def test_commit_listeners(conn):
+    committed = []
+    commit_listeners.append(committed.append)
+
+    try:
+        with BulkWriter(conn, metadata) as writer:
+            writer.add({'plays': game('a', ['x'])})
+    finally:
+        commit_listeners.remove(committed.append)
+
+    assert committed == [frozenset(['plays'])]
+
+
+def test_game_round_trip(engine, pages):
+    """
+    Syncing a game twice leaves the rows of a single sync
+
+    """
+    replace = {table: 'game_id' for table in game_tables}
+    tables = ingest_game(pages, game_id)
+
+    counts = []
+    for _ in range(2):
+        with BulkWriter(engine, nba_metadata, upsert=True,
+                        replace=replace) as writer:
+            writer.add(resolve_keys(engine, tables))
+
+        counts.append({
+            table: pd.read_sql(f'select * from {table}', engine).shape[0]
+            for table in tables})
+
+    assert counts[0] == counts[1]
+    assert counts[0] == {table: len(df) for table, df in tables.items()}
+
+    boxscore = pd.read_sql(
+        'select p.player_id, b.pts from boxscore b '
+        'join players p using (player_key) where p.player_id is not null',
+        engine)
+    expected = tables['boxscore'].dropna(subset=['player_id'])
+
+    assert sorted(boxscore.player_id) == sorted(expected.player_id)